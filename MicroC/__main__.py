@@ -1,4 +1,5 @@
 import argparse
+import sys
 
 from . import eval as MicroC_eval
 
@@ -38,11 +39,176 @@ def make_argparser():
         action="store_true",
         help="Executa a análise semântica.",
     )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Executa com o profiler e imprime tempos por função e execuções por statement.",
+    )
+    parser.add_argument(
+        "--profile-json",
+        metavar="ARQ",
+        help="Salva o relatório do profiler em JSON no arquivo indicado (implica --profile).",
+    )
+    parser.add_argument(
+        "--flame",
+        metavar="ARQ",
+        help="Executa com o profiler por amostragem e salva as pilhas MicroC no formato collapsed (flamegraph).",
+    )
+    parser.add_argument(
+        "--time",
+        action="store_true",
+        help="Mostra o tempo de cada fase (parse, transformação, análise e execução).",
+    )
+    parser.add_argument(
+        "--time-json",
+        metavar="ARQ",
+        help="Salva o tempo de cada fase em JSON no arquivo indicado (implica --time).",
+    )
+    parser.add_argument(
+        "--mem-report",
+        action="store_true",
+        help="Mostra o pico e a memória retida de cada fase do pipeline e os objetos vivos por tipo.",
+    )
+    parser.add_argument(
+        "--mem-report-json",
+        metavar="ARQ",
+        help="Salva o relatório de memória em JSON no arquivo indicado (implica --mem-report).",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=["tree", "stack", "jit", "parallel"],
+        default="tree",
+        help=(
+            "Interpretador: tree (recursivo, padrão), stack (pilhas explícitas, sem limite de "
+            "aninhamento), jit (compila laços e funções quentes para Python) ou parallel "
+            "(executa chamadas puras independentes em vários processos)."
+        ),
+    )
+    parser.add_argument(
+        "--lazy",
+        action="store_true",
+        help="Só lê e verifica as funções alcançáveis a partir de main.",
+    )
+    parser.add_argument(
+        "--max-frames",
+        type=int,
+        metavar="N",
+        help="Tamanho máximo da pilha de chamadas MicroC no engine stack (padrão: 1000000).",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        metavar="N",
+        help="Processos simultâneos no engine parallel (padrão: número de CPUs).",
+    )
+    parser.add_argument(
+        "--max-steps",
+        type=int,
+        metavar="N",
+        help="Interrompe a execução após N passos (iterações de laço e chamadas).",
+    )
+    parser.add_argument(
+        "--max-depth",
+        type=int,
+        metavar="N",
+        help="Limita a profundidade de chamadas de função a N.",
+    )
     return parser
 
-def main():
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+
+    # Subcomandos: microc serve / microc client / microc build / microc repl
+    if argv and argv[0] == "serve":
+        from .server import serve_main
+        return serve_main(argv[1:])
+    if argv and argv[0] == "client":
+        from .server import client_main
+        return client_main(argv[1:])
+    if argv and argv[0] == "build":
+        from .codegen import build_main
+        return build_main(argv[1:])
+    if argv and argv[0] == "repl":
+        from .repl import repl_main
+        return repl_main(argv[1:])
+
     parser = make_argparser()
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
+    if args.max_frames is not None and args.engine != "stack":
+        parser.error("--max-frames só vale com --engine stack")
+    if args.workers is not None and args.engine != "parallel":
+        parser.error("--workers só vale com --engine parallel")
+    modes = [
+        flag for flag, enabled in (
+            ("--profile", args.profile or args.profile_json),
+            ("--flame", args.flame),
+            ("--mem-report", args.mem_report or args.mem_report_json),
+            ("--time", args.time or args.time_json),
+        )
+        if enabled
+    ]
+    if len(modes) > 1:
+        parser.error(f"{modes[0]} e {modes[1]} não podem ser usados juntos")
+    # Os profilers estendem o interpretador recursivo
+    if modes and modes[0] in ("--profile", "--flame") and args.engine != "tree":
+        parser.error(f"{modes[0]} só vale com --engine tree")
+
+    # Tokens e CST são produzidos direto do arquivo mapeado em memória (mmap),
+    # sem ler o código-fonte inteiro: a saída começa imediatamente e o uso de
+    # memória não cresce com o tamanho do arquivo.
+    if args.cst:
+        from . import parser
+        try:
+            tree = parser.parse_file(args.file)
+        except FileNotFoundError:
+            print(f"Arquivo {args.file} não encontrado.")
+            exit(1)
+        if tree:
+            print(tree.pretty())
+        return
+
+    if args.lex:
+        from lark import UnexpectedInput
+        from .lexer import TOKEN_TYPES, tokenize_file
+        try:
+            for type_id, _, _, _, text in tokenize_file(args.file):
+                print(f"{TOKEN_TYPES[type_id]}: {text}")
+        except FileNotFoundError:
+            print(f"Arquivo {args.file} não encontrado.")
+            exit(1)
+        except UnexpectedInput as e:
+            print('Erro léxico:', e)
+            exit(1)
+        return
+
+    # Memória por fase: a leitura do arquivo também é medida
+    if args.mem_report or args.mem_report_json:
+        from .memreport import memory_report
+        engine_options = {}
+        if args.max_frames is not None:
+            engine_options["max_frames"] = args.max_frames
+        if args.workers is not None:
+            engine_options["workers"] = args.workers
+        try:
+            report = memory_report(
+                path=args.file,
+                engine=args.engine,
+                lazy=args.lazy,
+                max_steps=args.max_steps,
+                max_depth=args.max_depth,
+                **engine_options,
+            )
+        except FileNotFoundError:
+            print(f"Arquivo {args.file} não encontrado.")
+            exit(1)
+        if report.error is None:
+            print(report.result)
+        print(report.format_table(), file=sys.stderr)
+        if args.mem_report_json:
+            report.dump_json(args.mem_report_json)
+        if report.error is not None:
+            exit(1)
+        return
 
     # Lê arquivo de entrada
     try:
@@ -52,14 +218,6 @@ def main():
         print(f"Arquivo {args.file} não encontrado.")
         exit(1)
 
-    # Imprime a árvore sintática concreta (CST) se solicitado
-    if args.cst:
-        from . import parser
-        tree = parser.parse_source(source)
-        if tree:
-            print(tree.pretty())
-        return
-
     # Imprime a árvore sintática abstrata (AST) se solicitado
     if args.ast:
         from . import parser
@@ -72,36 +230,80 @@ def main():
             print(ast.accept(printer))
         return
 
-    # Imprime os tokens do lexer se solicitado
-    if args.lex:
-        from lark import Lark
-        from . import parser as microc_parser
-        # Reutiliza a gramática já carregada
-        l = Lark(microc_parser.GRAMMAR, parser='lalr', lexer='standard')
-        tokens = list(l.lex(source))
-        for token in tokens:
-            print(f"{token.type}: {token.value}")
-        return
-    
     # testa se a análise semântica está correta
     if args.sem:
         from . import parser
         from .transformer import MicroCTransformer
-        from .semantic import SemanticAnalyzer # ou como for nomeado
+        from .eval import analyze
         tree = parser.parse_source(source)
         if tree:
             ast = MicroCTransformer().transform(tree)
-            analyzer = SemanticAnalyzer()
             try:
-                analyzer.visit_program(ast)
+                analyze(ast, strict=True, path=args.file)
                 print("Análise semântica concluída com sucesso.")
             except Exception as e:
                 print(f"Erro semântico: {e}")
         return
 
+    # Executa com o profiler de funções/statements MicroC
+    if args.profile or args.profile_json:
+        from .profiler import profile
+        try:
+            result, report = profile(
+                source, path=args.file, lazy=args.lazy, max_steps=args.max_steps, max_depth=args.max_depth
+            )
+        except Exception as e:
+            on_error(e, args.pm)
+            return
+        print(result)
+        print(report.format_table(), file=sys.stderr)
+        if args.profile_json:
+            report.dump_json(args.profile_json)
+        return
+
+    # Amostras das pilhas de chamadas MicroC, para flamegraph.pl e afins
+    if args.flame:
+        from .sampler import sample
+        try:
+            result, sampler = sample(
+                source, path=args.file, lazy=args.lazy, max_steps=args.max_steps, max_depth=args.max_depth
+            )
+        except Exception as e:
+            on_error(e, args.pm)
+            return
+        print(result)
+        sampler.write_collapsed(args.flame)
+        print(f"{sum(sampler.samples.values())} amostras salvas em {args.flame}", file=sys.stderr)
+        return
+
     if not args.ast and not args.cst and not args.lex and not args.sem:
         try:
-            MicroC_eval(source)
+            engine_options = {}
+            if args.max_frames is not None:
+                engine_options["max_frames"] = args.max_frames
+            if args.workers is not None:
+                engine_options["workers"] = args.workers
+            pipeline = None
+            if args.time or args.time_json:
+                from .pipeline import Pipeline
+                pipeline = Pipeline()
+            try:
+                MicroC_eval(
+                    source,
+                    max_steps=args.max_steps,
+                    max_depth=args.max_depth,
+                    engine=args.engine,
+                    path=args.file,
+                    lazy=args.lazy,
+                    pipeline=pipeline,
+                    **engine_options,
+                )
+            finally:
+                # Também quando uma fase falha: mostra as que rodaram
+                if pipeline is not None:
+                    print(pipeline.format_table(), file=sys.stderr)
+                    if args.time_json:
+                        pipeline.dump_json(args.time_json)
         except Exception as e:
             on_error(e, args.pm)
 
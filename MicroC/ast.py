@@ -12,6 +12,15 @@ from dataclasses import dataclass
 
 class ASTNode(ABC):
     """Classe base para todos os nós da AST."""
+
+    # Posição no código-fonte (preenchida pelo transformer a partir do Lark).
+    # Não são campos do dataclass, logo não entram em __eq__ nem __repr__.
+    line: Optional[int] = None
+    column: Optional[int] = None
+    # Hash estrutural, guardado nos nós compartilhados (ver interning.py)
+    structural_hash: Optional[int] = None
+    # Se o bloco/for declara variáveis, calculado pelo Interpreter (ver eval.py)
+    scoped: Optional[bool] = None
     
     @abstractmethod
     def accept(self, visitor):
@@ -47,6 +56,17 @@ class VarDecl(Declaration):
         return visitor.visit_var_decl(self)
 
 
+@dataclass
+class ArrayDecl(Declaration):
+    """Declaração de vetor: tipo nome[tamanho];"""
+    type: str
+    name: str
+    size: int
+
+    def accept(self, visitor):
+        return visitor.visit_array_decl(self)
+
+
 @dataclass
 class FunDecl(Declaration):
     """Declaração de função: tipo nome(params) { body }"""
@@ -59,6 +79,15 @@ class FunDecl(Declaration):
         return visitor.visit_fun_decl(self)
 
 
+@dataclass
+class ImportDecl(Declaration):
+    """Importação de módulo: import "caminho.mc";"""
+    path: str
+
+    def accept(self, visitor):
+        return visitor.visit_import_decl(self)
+
+
 @dataclass
 class Param(ASTNode):
     """Parâmetro de função: tipo nome"""
@@ -116,6 +145,18 @@ class WhileStmt(Statement):
         return visitor.visit_while_stmt(self)
 
 
+@dataclass
+class ForStmt(Statement):
+    """Statement for: for (init; condition; update) body"""
+    init: Optional[ASTNode]  # VarDecl ou expressão
+    condition: Optional['Expression']
+    update: Optional['Expression']
+    body: Statement
+
+    def accept(self, visitor):
+        return visitor.visit_for_stmt(self)
+
+
 @dataclass
 class ReturnStmt(Statement):
     """Statement return: return [expression];"""
@@ -143,6 +184,39 @@ class Assignment(Expression):
         return visitor.visit_assignment(self)
 
 
+@dataclass
+class CompoundAssignment(Expression):
+    """Atribuição composta: id op= expression (op é '+', '-', '*' ou '/')"""
+    name: str
+    operator: str
+    value: Expression
+
+    def accept(self, visitor):
+        return visitor.visit_compound_assignment(self)
+
+
+@dataclass
+class Increment(Expression):
+    """Incremento/decremento: ++id, --id, id++, id--"""
+    name: str
+    operator: str  # '++' ou '--'
+    prefix: bool
+
+    def accept(self, visitor):
+        return visitor.visit_increment(self)
+
+
+@dataclass
+class ArrayAssignment(Expression):
+    """Atribuição a elemento de vetor: id[index] = expression"""
+    name: str
+    index: Expression
+    value: Expression
+
+    def accept(self, visitor):
+        return visitor.visit_array_assignment(self)
+
+
 @dataclass
 class BinaryOp(Expression):
     """Expressão binária: left op right"""
@@ -193,6 +267,16 @@ class Variable(Expression):
 
 
 
+@dataclass
+class ArrayIndex(Expression):
+    """Acesso a elemento de vetor: id[index]"""
+    name: str
+    index: Expression
+
+    def accept(self, visitor):
+        return visitor.visit_array_index(self)
+
+
 @dataclass
 class IntLiteral(Expression):
     """Literal inteiro: 42"""
@@ -212,8 +296,62 @@ class BoolLiteral(Expression):
 
 # ==================== VISITOR PATTERN ====================
 
+# Sufixo do método de cada classe de nó (visit_<sufixo>)
+NODE_METHODS = {
+    Program: "program",
+    VarDecl: "var_decl",
+    ArrayDecl: "array_decl",
+    FunDecl: "fun_decl",
+    ImportDecl: "import_decl",
+    Param: "param",
+    Block: "block",
+    ExprStmt: "expr_stmt",
+    IfStmt: "if_stmt",
+    WhileStmt: "while_stmt",
+    ForStmt: "for_stmt",
+    ReturnStmt: "return_stmt",
+    Assignment: "assignment",
+    CompoundAssignment: "compound_assignment",
+    Increment: "increment",
+    ArrayAssignment: "array_assignment",
+    BinaryOp: "binary_op",
+    UnaryOp: "unary_op",
+    FunctionCall: "function_call",
+    PrintCall: "print_call",
+    Variable: "variable",
+    ArrayIndex: "array_index",
+    IntLiteral: "int_literal",
+    BoolLiteral: "bool_literal",
+}
+
+
+def dispatch_table(visitor, prefix="visit_"):
+    """
+    Tabela classe do nó -> método `prefix + sufixo` já ligado ao visitor.
+    Montada uma vez, troca `node.accept(visitor)` (duas chamadas por nó) por
+    `table[type(node)](node)`. Classes sem o método ficam de fora.
+    """
+    table = {}
+    for cls, suffix in NODE_METHODS.items():
+        method = getattr(visitor, prefix + suffix, None)
+        if method is not None:
+            table[cls] = method
+    return table
+
+
 class ASTVisitor(ABC):
-    """Interface para visitantes da AST."""
+    """
+    Interface para visitantes da AST. `visit(node)` despacha pela tabela de
+    `dispatch_table`, criada no primeiro uso; visitantes em que o despacho é
+    caminho quente guardam a tabela em `self._dispatch` no construtor.
+    """
+
+    def visit(self, node):
+        try:
+            table = self._dispatch
+        except AttributeError:
+            table = self._dispatch = dispatch_table(self)
+        return table[type(node)](node)
     
     @abstractmethod
     def visit_program(self, node: Program): pass
@@ -221,9 +359,15 @@ class ASTVisitor(ABC):
     @abstractmethod
     def visit_var_decl(self, node: VarDecl): pass
     
+    @abstractmethod
+    def visit_array_decl(self, node: ArrayDecl): pass
+    
     @abstractmethod
     def visit_fun_decl(self, node: FunDecl): pass
     
+    @abstractmethod
+    def visit_import_decl(self, node: ImportDecl): pass
+    
     @abstractmethod
     def visit_param(self, node: Param): pass
     
@@ -239,12 +383,24 @@ class ASTVisitor(ABC):
     @abstractmethod
     def visit_while_stmt(self, node: WhileStmt): pass
     
+    @abstractmethod
+    def visit_for_stmt(self, node: ForStmt): pass
+    
     @abstractmethod
     def visit_return_stmt(self, node: ReturnStmt): pass
     
     @abstractmethod
     def visit_assignment(self, node: Assignment): pass
     
+    @abstractmethod
+    def visit_compound_assignment(self, node: CompoundAssignment): pass
+    
+    @abstractmethod
+    def visit_increment(self, node: Increment): pass
+    
+    @abstractmethod
+    def visit_array_assignment(self, node: ArrayAssignment): pass
+    
     @abstractmethod
     def visit_binary_op(self, node: BinaryOp): pass
     
@@ -260,6 +416,9 @@ class ASTVisitor(ABC):
     @abstractmethod
     def visit_variable(self, node: Variable): pass
     
+    @abstractmethod
+    def visit_array_index(self, node: ArrayIndex): pass
+    
     @abstractmethod
     def visit_int_literal(self, node: IntLiteral): pass
 
@@ -268,88 +427,194 @@ class ASTVisitor(ABC):
 
 
 # ==================== UTILITÁRIOS ====================
+def expression_children(node):
+    """
+    Subexpressões de uma expressão, na ordem em que são avaliadas. Usado pelos
+    visitantes que percorrem a árvore com pilha explícita.
+    """
+    if isinstance(node, BinaryOp):
+        return (node.left, node.right)
+    if isinstance(node, (Assignment, CompoundAssignment)):
+        return (node.value,)
+    if isinstance(node, ArrayAssignment):
+        return (node.index, node.value)
+    if isinstance(node, UnaryOp):
+        return (node.operand,)
+    if isinstance(node, FunctionCall):
+        return node.args
+    if isinstance(node, PrintCall):
+        return (node.expression,)
+    if isinstance(node, ArrayIndex):
+        return (node.index,)
+    return ()
+
+
+def declares(statements):
+    """
+    Indica se os statements declaram variáveis no escopo em que executam,
+    inclusive em if/while sem chaves (`if (c) int x = 1;`). Blocos e for têm
+    escopo próprio e não contam. Um bloco (ou for) cujos statements não
+    declaram nada não precisa de escopo próprio na execução.
+    """
+    pending = [stmt for stmt in statements if stmt is not None]
+    while pending:
+        stmt = pending.pop()
+        if isinstance(stmt, (VarDecl, ArrayDecl)):
+            return True
+        if isinstance(stmt, IfStmt):
+            pending.append(stmt.then_stmt)
+            if stmt.else_stmt is not None:
+                pending.append(stmt.else_stmt)
+        elif isinstance(stmt, WhileStmt):
+            pending.append(stmt.body)
+    return False
+
+
+# Marcadores usados pelos moldes do ASTPrinter
+_INDENT = object()
+_DEDENT = object()
+_NEWLINE = object()
+
+
 class ASTPrinter(ASTVisitor):
-    def visit_bool_literal(self, node):
-        return f"BoolLiteral({str(node.value).lower()})"
-    """Visitor para imprimir a AST de forma legível."""
+    """
+    Visitor para imprimir a AST de forma legível.
+
+    Cada nó é descrito por um molde: uma lista de textos, nós filhos e
+    marcadores de indentação. O molde é expandido com uma pilha explícita,
+    então árvores muito profundas (ex.: `a + a + ... + a`) não esbarram no
+    limite de recursão do Python e o texto é montado em tempo linear.
+    """
+
     def __init__(self):
         self.indent_level = 0
+        self._templates = dispatch_table(self, "_")
 
     def _indent(self):
         return "  " * self.indent_level
 
-    def visit_program(self, node: Program):
-        result = "Program:\n"
-        self.indent_level += 1
+    def format(self, node):
+        """Retorna o texto de `node` e de toda a subárvore."""
+        out = []
+        stack = [node]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, str):
+                out.append(item)
+            elif item is _NEWLINE:
+                out.append("\n" + self._indent())
+            elif item is _INDENT:
+                self.indent_level += 1
+            elif item is _DEDENT:
+                self.indent_level -= 1
+            else:
+                template = self._templates[type(item)](item)
+                stack.extend(reversed(template))
+        return "".join(out)
+
+    def _visit(self, node):
+        return self.format(node)
+
+    visit_program = visit_var_decl = visit_array_decl = visit_fun_decl = visit_import_decl = _visit
+    visit_param = visit_block = visit_expr_stmt = visit_if_stmt = _visit
+    visit_while_stmt = visit_for_stmt = visit_return_stmt = visit_assignment = _visit
+    visit_compound_assignment = visit_increment = visit_array_assignment = _visit
+    visit_binary_op = visit_unary_op = visit_function_call = visit_print_call = _visit
+    visit_variable = visit_array_index = visit_int_literal = visit_bool_literal = _visit
+
+    def _program(self, node: Program):
+        parts = ["Program:", _INDENT]
         for decl in node.declarations:
-            result += self._indent() + str(decl.accept(self)) + "\n"
-        self.indent_level -= 1
-        return result.rstrip()
-
-    def visit_var_decl(self, node: VarDecl):
-        return f"VarDecl({node.type} {node.name})"
-
-    def visit_fun_decl(self, node: FunDecl):
-        params_str = ", ".join([param.accept(self) for param in node.params])
-        result = f"FunDecl({node.type} {node.name}({params_str}))"
-        self.indent_level += 1
-        result += "\n" + self._indent() + node.body.accept(self)
-        self.indent_level -= 1
-        return result
-
-    def visit_param(self, node: Param):
-        return f"{node.type} {node.name}"
-
-    def visit_block(self, node: Block):
-        result = "Block:"
-        self.indent_level += 1
+            parts += [_NEWLINE, decl]
+        return parts + [_DEDENT]
+
+    def _var_decl(self, node: VarDecl):
+        return [f"VarDecl({node.type} {node.name})"]
+
+    def _array_decl(self, node: ArrayDecl):
+        return [f"ArrayDecl({node.type} {node.name}[{node.size}])"]
+
+    def _fun_decl(self, node: FunDecl):
+        params_str = ", ".join(f"{param.type} {param.name}" for param in node.params)
+        return [f"FunDecl({node.type} {node.name}({params_str}))", _INDENT, _NEWLINE, node.body, _DEDENT]
+
+    def _import_decl(self, node: ImportDecl):
+        return [f'ImportDecl("{node.path}")']
+
+    def _param(self, node: Param):
+        return [f"{node.type} {node.name}"]
+
+    def _block(self, node: Block):
+        parts = ["Block:", _INDENT]
         for stmt in node.statements:
-            result += "\n" + self._indent() + str(stmt.accept(self))
-        self.indent_level -= 1
-        return result
+            parts += [_NEWLINE, stmt]
+        return parts + [_DEDENT]
 
-    def visit_expr_stmt(self, node: ExprStmt):
-        return f"ExprStmt({node.expression.accept(self)})"
+    def _expr_stmt(self, node: ExprStmt):
+        return ["ExprStmt(", node.expression, ")"]
 
-    def visit_if_stmt(self, node: IfStmt):
-        result = f"IfStmt({node.condition.accept(self)})"
-        self.indent_level += 1
-        result += "\n" + self._indent() + "Then: " + node.then_stmt.accept(self)
+    def _if_stmt(self, node: IfStmt):
+        parts = ["IfStmt(", node.condition, ")", _INDENT, _NEWLINE, "Then: ", node.then_stmt]
         if node.else_stmt:
-            result += "\n" + self._indent() + "Else: " + node.else_stmt.accept(self)
-        self.indent_level -= 1
-        return result
-
-    def visit_while_stmt(self, node: WhileStmt):
-        result = f"WhileStmt({node.condition.accept(self)})"
-        self.indent_level += 1
-        result += "\n" + self._indent() + node.body.accept(self)
-        self.indent_level -= 1
-        return result
-
-    def visit_return_stmt(self, node: ReturnStmt):
+            parts += [_NEWLINE, "Else: ", node.else_stmt]
+        return parts + [_DEDENT]
+
+    def _while_stmt(self, node: WhileStmt):
+        return ["WhileStmt(", node.condition, ")", _INDENT, _NEWLINE, node.body, _DEDENT]
+
+    def _for_stmt(self, node: ForStmt):
+        parts = ["ForStmt("]
+        for i, part in enumerate((node.init, node.condition, node.update)):
+            if i:
+                parts.append("; ")
+            if part is not None:
+                parts.append(part)
+        return parts + [")", _INDENT, _NEWLINE, node.body, _DEDENT]
+
+    def _return_stmt(self, node: ReturnStmt):
         if node.expression:
-            return f"ReturnStmt({node.expression.accept(self)})"
-        return "ReturnStmt()"
+            return ["ReturnStmt(", node.expression, ")"]
+        return ["ReturnStmt()"]
 
-    def visit_assignment(self, node: Assignment):
-        return f"Assignment({node.name} = {node.value.accept(self)})"
+    def _assignment(self, node: Assignment):
+        return [f"Assignment({node.name} = ", node.value, ")"]
 
-    def visit_binary_op(self, node: BinaryOp):
-        return f"BinaryOp({node.left.accept(self)} {node.operator} {node.right.accept(self)})"
+    def _compound_assignment(self, node: CompoundAssignment):
+        return [f"CompoundAssignment({node.name} {node.operator}= ", node.value, ")"]
 
-    def visit_unary_op(self, node: UnaryOp):
-        return f"UnaryOp({node.operator} {node.operand.accept(self)})"
+    def _increment(self, node: Increment):
+        if node.prefix:
+            return [f"Increment({node.operator}{node.name})"]
+        return [f"Increment({node.name}{node.operator})"]
 
-    def visit_function_call(self, node: FunctionCall):
-        args_str = ", ".join([arg.accept(self) for arg in node.args])
-        return f"FunctionCall({node.name}({args_str}))"
-    
-    def visit_print_call(self, node: PrintCall):
-        return f"PrintCall({node.expression.accept(self)})"
+    def _array_assignment(self, node: ArrayAssignment):
+        return [f"ArrayAssignment({node.name}[", node.index, "] = ", node.value, ")"]
+
+    def _binary_op(self, node: BinaryOp):
+        return ["BinaryOp(", node.left, f" {node.operator} ", node.right, ")"]
+
+    def _unary_op(self, node: UnaryOp):
+        return [f"UnaryOp({node.operator} ", node.operand, ")"]
+
+    def _function_call(self, node: FunctionCall):
+        parts = [f"FunctionCall({node.name}("]
+        for i, arg in enumerate(node.args):
+            if i:
+                parts.append(", ")
+            parts.append(arg)
+        return parts + ["))"]
+
+    def _print_call(self, node: PrintCall):
+        return ["PrintCall(", node.expression, ")"]
+
+    def _variable(self, node: Variable):
+        return [f"Variable({node.name})"]
+
+    def _array_index(self, node: ArrayIndex):
+        return [f"ArrayIndex({node.name}[", node.index, "])"]
 
-    def visit_variable(self, node: Variable):
-        return f"Variable({node.name})"
+    def _int_literal(self, node: IntLiteral):
+        return [f"IntLiteral({node.value})"]
 
-    def visit_int_literal(self, node: IntLiteral):
-        return f"IntLiteral({node.value})"
\ No newline at end of file
+    def _bool_literal(self, node: BoolLiteral):
+        return [f"BoolLiteral({str(node.value).lower()})"]
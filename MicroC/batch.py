@@ -0,0 +1,392 @@
+"""
+Avaliação vetorizada de uma função MicroC sobre muitos argumentos (NumPy).
+
+`run_batch(programa, "f", args)` calcula f para cada linha de `args` de uma
+vez, com um array NumPy por variável (uma posição, ou "lane", por chamada):
+
+- Expressões viram operações sobre arrays inteiros.
+- if/while/for executam com uma máscara das lanes ativas: cada ramo só
+  altera as lanes em que a condição vale, e o laço continua enquanto alguma
+  lane ativa tiver a condição verdadeira.
+- return grava o resultado das lanes que chegaram nele e as tira da máscara
+  do resto da função.
+- Chamadas (inclusive recursivas) executam o corpo da função chamada com a
+  máscara de quem chamou.
+
+Lanes que o caminho vetorizado não reproduz exatamente (conta que pode sair
+de 64 bits, divisão por zero, recursão muito funda) são separadas e
+recalculadas pelo Interpreter, uma a uma. Funções com efeitos colaterais
+(print, vetores, escrita em globais) rodam inteiras pelo Interpreter, uma
+chamada por linha, na ordem.
+
+Requer o NumPy (`pip install microc[batch]`).
+"""
+
+try:
+    import numpy as np
+except ImportError as e:
+    raise ImportError("MicroC.batch precisa do NumPy: instale com `pip install microc[batch]`.") from e
+
+from .ast import *
+from .eval import Interpreter
+from .output import BufferedWriter
+
+
+INT64_MIN = np.iinfo(np.int64).min
+INT64_MAX = np.iinfo(np.int64).max
+# Produtos com módulo acima disto (estimado em float) vão para o Interpreter
+_PRODUCT_LIMIT = float(2 ** 62)
+# Profundidade de chamadas acima da qual as lanes vão para o Interpreter
+MAX_DEPTH = 200
+
+
+class Unsupported(Exception):
+    """Construção que o caminho vetorizado não executa."""
+
+
+class _Scope:
+    def __init__(self, parent=None):
+        self.vars = {}
+        self.parent = parent
+
+    def resolve(self, name):
+        scope = self
+        while scope is not None:
+            if name in scope.vars:
+                return scope
+            scope = scope.parent
+        raise Unsupported(f"variável '{name}' não encontrada")
+
+
+class _Frame:
+    """Resultado e lanes já retornadas de uma chamada."""
+
+    def __init__(self, size, type_name):
+        self.result = np.zeros(size, dtype=bool if type_name == "bool" else np.int64)
+        self.done = np.zeros(size, dtype=bool)
+
+
+class BatchEvaluator:
+    """
+    Avalia funções de `program` em lote. Os inicializadores globais rodam uma
+    vez, no Interpreter usado também para as lanes separadas. Depois de
+    `run`, `vectorized` diz se o caminho vetorizado foi usado e `fallback`
+    quantas lanes foram recalculadas pelo Interpreter.
+    """
+
+    def __init__(self, program, output=None):
+        self.output = output if output is not None else BufferedWriter()
+        self.interpreter = Interpreter(program, output=self.output)
+        for decl in program.declarations:
+            if not isinstance(decl, FunDecl):
+                self.interpreter.visit(decl)
+        self.functions = self.interpreter.functions
+        self.vectorized = False
+        self.fallback = 0
+        self._dispatch = dispatch_table(self, "_")
+
+    def run(self, name, args):
+        func = self.functions.get(name)
+        if func is None:
+            raise ValueError(f"Função '{name}' não declarada.")
+        if func.type == "void":
+            raise ValueError(f"Função '{name}' não retorna valor.")
+        if any(param.type.endswith("[]") for param in func.params):
+            raise ValueError(f"Função '{name}' recebe vetores, que não podem vir de um lote.")
+        columns = self._columns(func, args)
+        size = len(columns[0]) if columns else len(np.asarray(args))
+
+        try:
+            result, spilled = self._run_vectorized(func, columns, size)
+            self.vectorized = True
+        except Unsupported:
+            result, spilled = np.zeros(size, dtype=bool if func.type == "bool" else np.int64), np.ones(size, dtype=bool)
+            self.vectorized = False
+
+        lanes = np.flatnonzero(spilled)
+        self.fallback = len(lanes)
+        for lane in lanes:
+            values = [column[lane].item() for column in columns]
+            value = self.interpreter.run(name, values)
+            if result.dtype == np.int64 and not INT64_MIN <= value <= INT64_MAX:
+                # Os inteiros do MicroC não têm limite: o resultado passa a ser de objetos
+                result = result.astype(object)
+            elif result.dtype == bool and type(value) is not bool:
+                # 1/0 de um operador: o array só é bool se todos vêm de literais
+                result = result.astype(np.int64)
+            result[lane] = value
+        self.output.flush()
+        return result
+
+    def _columns(self, func, args):
+        """Um array por parâmetro, com o tipo dele."""
+        args = np.asarray(args)
+        if args.ndim == 1 and len(func.params) == 1:
+            args = args[:, None]
+        if args.ndim != 2 or args.shape[1] != len(func.params):
+            raise ValueError(
+                f"Função '{func.name}' recebe {len(func.params)} argumento(s); "
+                f"esperado um array com formato (n, {len(func.params)})."
+            )
+        return [
+            args[:, index].astype(bool if param.type == "bool" else np.int64)
+            for index, param in enumerate(func.params)
+        ]
+
+    # ---------------------------------------------------------------- execução
+
+    def _run_vectorized(self, func, columns, size):
+        self.size = size
+        self.spilled = np.zeros(size, dtype=bool)
+        self.depth = 0
+        self.globals = _Scope()
+        for key, value in self.interpreter.globals.vars.items():
+            if isinstance(value, (bool, int)):
+                self.globals.vars[key] = np.full(size, value, dtype=bool if isinstance(value, bool) else np.int64)
+        self.frame = None
+        self.scope = self.globals
+        result = self._invoke(func, columns, np.ones(size, dtype=bool))
+        return result, self.spilled
+
+    def _spill(self, lanes):
+        self.spilled |= lanes
+
+    def _live(self, mask):
+        return mask & ~self.frame.done & ~self.spilled
+
+    def _invoke(self, func, args, mask):
+        frame = _Frame(self.size, func.type)
+        if not mask.any():
+            return frame.result
+        if self.depth >= MAX_DEPTH:
+            self._spill(mask)
+            return frame.result
+
+        scope = _Scope(self.globals)
+        for param, value in zip(func.params, args):
+            scope.vars[param.name] = value
+        saved = self.frame, self.scope
+        self.frame, self.scope = frame, scope
+        self.depth += 1
+        try:
+            self._statements(func.body.statements, mask)
+            # Fim do corpo sem return: o Interpreter devolve None (e o erro, se
+            # houver, aparece em quem usa o valor)
+            if func.type != "void":
+                self._spill(self._live(mask))
+        finally:
+            self.frame, self.scope = saved
+            self.depth -= 1
+        return frame.result
+
+    def _statements(self, statements, mask):
+        for stmt in statements:
+            live = self._live(mask)
+            if not live.any():
+                return
+            self._method(stmt)(stmt, live)
+
+    def _execute(self, stmt, mask):
+        self._statements([stmt], mask)
+
+    def _evaluate(self, node, mask):
+        return self._method(node)(node, mask)
+
+    def _method(self, node):
+        method = self._dispatch.get(type(node))
+        if method is None:
+            raise Unsupported(type(node).__name__)
+        return method
+
+    def _in_scope(self, statements, mask):
+        saved = self.scope
+        self.scope = _Scope(saved)
+        try:
+            self._statements(statements, mask)
+        finally:
+            self.scope = saved
+
+    # ---------------------------------------------------------------- statements
+
+    def _block(self, node, mask):
+        self._in_scope(node.statements, mask)
+
+    def _var_decl(self, node, mask):
+        if node.initializer is None:
+            value = np.zeros(self.size, dtype=np.int64)  # valor padrão, 0 também para bool
+        else:
+            value = self._evaluate(node.initializer, mask)
+            value = np.where(mask, value, np.zeros(self.size, dtype=value.dtype))
+        self.scope.vars[node.name] = value
+
+    def _expr_stmt(self, node, mask):
+        self._evaluate(node.expression, mask)
+
+    def _if_stmt(self, node, mask):
+        condition = self._evaluate(node.condition, mask).astype(bool)
+        self._execute(node.then_stmt, mask & condition)
+        if node.else_stmt is not None:
+            self._execute(node.else_stmt, mask & ~condition)
+
+    def _while_stmt(self, node, mask):
+        while True:
+            mask = self._live(mask)
+            if not mask.any():
+                return
+            mask = mask & self._evaluate(node.condition, mask).astype(bool)
+            if not mask.any():
+                return
+            self._execute(node.body, mask)
+
+    def _for_stmt(self, node, mask):
+        saved = self.scope
+        self.scope = _Scope(saved)
+        try:
+            if node.init is not None:
+                self._execute(node.init, mask) if isinstance(node.init, VarDecl) else self._evaluate(node.init, mask)
+            while True:
+                mask = self._live(mask)
+                if not mask.any():
+                    return
+                if node.condition is not None:
+                    mask = mask & self._evaluate(node.condition, mask).astype(bool)
+                    if not mask.any():
+                        return
+                self._execute(node.body, mask)
+                mask = self._live(mask)
+                if node.update is not None:
+                    self._evaluate(node.update, mask)
+        finally:
+            self.scope = saved
+
+    def _return_stmt(self, node, mask):
+        frame = self.frame
+        if node.expression is not None:
+            value = self._evaluate(node.expression, mask)
+            frame.result = np.where(mask, value, frame.result)
+        frame.done |= mask
+
+    # ---------------------------------------------------------------- expressões
+
+    def _int_literal(self, node, mask):
+        if not INT64_MIN <= node.value <= INT64_MAX:
+            raise Unsupported("literal fora de 64 bits")
+        return np.full(self.size, node.value, dtype=np.int64)
+
+    def _bool_literal(self, node, mask):
+        return np.full(self.size, node.value, dtype=bool)
+
+    def _variable(self, node, mask):
+        return self.scope.resolve(node.name).vars[node.name]
+
+    def _store(self, name, value, mask):
+        scope = self.scope.resolve(name)
+        if scope is self.globals:
+            raise Unsupported(f"escrita na global '{name}'")
+        scope.vars[name] = np.where(mask, value, scope.vars[name])
+
+    def _assignment(self, node, mask):
+        value = self._evaluate(node.value, mask)
+        self._store(node.name, value, mask)
+        return value
+
+    def _compound_assignment(self, node, mask):
+        value = self._evaluate(node.value, mask)
+        current = self.scope.resolve(node.name).vars[node.name]
+        result = self._arithmetic(node.operator, current, value, mask)
+        self._store(node.name, result, mask)
+        return result
+
+    def _increment(self, node, mask):
+        old = self.scope.resolve(node.name).vars[node.name]
+        limit = INT64_MAX if node.operator == '++' else INT64_MIN
+        self._spill(mask & (old == limit))
+        new = old + 1 if node.operator == '++' else old - 1
+        self._store(node.name, new, mask)
+        return new if node.prefix else old
+
+    def _binary_op(self, node, mask):
+        operator = node.operator
+        left = self._evaluate(node.left, mask)
+        # && e || avaliam os dois lados em todas as lanes, como o Interpreter:
+        # erros do lado direito (divisão por zero) valem mesmo com o esquerdo decidido
+        right = self._evaluate(node.right, mask)
+        # Comparações e operadores lógicos dão 1/0, como no Interpreter
+        if operator == '&&':
+            return (left.astype(bool) & right.astype(bool)).astype(np.int64)
+        if operator == '||':
+            return (left.astype(bool) | right.astype(bool)).astype(np.int64)
+        comparison = _COMPARISONS.get(operator)
+        if comparison is not None:
+            return comparison(left, right).astype(np.int64)
+        return self._arithmetic(operator, left, right, mask)
+
+    def _arithmetic(self, operator, left, right, mask):
+        """Operação inteira; lanes que sairiam de 64 bits vão para o Interpreter."""
+        if operator == '+':
+            result = left + right
+            overflow = ((left ^ result) & (right ^ result)) < 0
+        elif operator == '-':
+            result = left - right
+            overflow = ((left ^ right) & (left ^ result)) < 0
+        elif operator == '*':
+            result = left * right
+            overflow = np.abs(left.astype(np.float64) * right) >= _PRODUCT_LIMIT
+        elif operator == '/':
+            # Divisão por zero: o Interpreter gera o erro da lane
+            overflow = (right == 0) | ((left == INT64_MIN) & (right == -1))
+            result = np.floor_divide(left, np.where(overflow, 1, right))
+        else:
+            raise Unsupported(f"operador {operator}")
+        self._spill(mask & overflow)
+        return result
+
+    def _unary_op(self, node, mask):
+        operand = self._evaluate(node.operand, mask)
+        if node.operator == '!':
+            return (~operand.astype(bool)).astype(np.int64)
+        if node.operator == '-':
+            self._spill(mask & (operand == INT64_MIN))
+            return -operand
+        return operand
+
+    def _function_call(self, node, mask):
+        func = self.functions.get(node.name)
+        if func is None or len(func.params) != len(node.args):
+            raise Unsupported(f"chamada de '{node.name}'")
+        if any(param.type.endswith("[]") for param in func.params):
+            raise Unsupported("vetor como argumento")
+        args = [self._evaluate(arg, mask) for arg in node.args]
+        return self._invoke(func, args, mask)
+
+    def _print_call(self, node, mask):
+        raise Unsupported("print")
+
+    def _array_decl(self, node, mask):
+        raise Unsupported("vetor")
+
+    _array_index = _array_assignment = _array_decl
+
+
+_COMPARISONS = {
+    '==': np.equal,
+    '!=': np.not_equal,
+    '<': np.less,
+    '>': np.greater,
+    '<=': np.less_equal,
+    '>=': np.greater_equal,
+}
+
+
+def run_batch(program, name, args, output=None):
+    """
+    Avalia a função `name` de `program` (AST já verificada) para cada linha
+    de `args`, um array NumPy de formato (n, número de parâmetros) (ou (n,)
+    para funções de um parâmetro). Retorna um array com os n resultados
+    (int64; de objetos se algum resultado não cabe em 64 bits).
+
+    Os valores são os do Interpreter: em funções bool, comparações, &&, ||
+    e ! dão 1/0 e só os literais dão True/False. O array é bool quando todos
+    os resultados vêm de literais; senão é int64, e um True vira 1.
+    """
+    return BatchEvaluator(program, output).run(name, args)
@@ -0,0 +1,655 @@
+"""
+Back-end C do MicroC.
+
+Traduz um `Program` já verificado pela análise semântica para C99 portável e
+chama o compilador C instalado (`cc`) para gerar um executável nativo:
+
+    int   -> int64_t             bool  -> mc_bool (int)
+    int[] -> mc_array (ponteiro + tamanho, com verificação de limites)
+    função f -> static f_f(...)  print -> printf
+
+O executável reproduz a saída do interpretador: imprime o que o programa
+imprime e, ao final, o valor retornado por main. Algumas diferenças
+inevitáveis: inteiros têm 64 bits (com -fwrapv o estouro dá a volta, em vez
+de crescer como no Python) e a recursão é limitada pela pilha nativa.
+
+No interpretador, os literais `true`/`false` são bools do Python (print
+mostra True/False), mas comparações, &&, || e ! devolvem 1 ou 0, e um bool
+sem inicializador vale 0. Para imprimir o mesmo, um mc_bool guarda também a
+origem do valor: 0 e 1 vêm de operadores, 2 (MC_FALSE) e 3 (MC_TRUE) de
+literais. O valor lógico é sempre o bit menos significativo.
+
+main executa no escopo global, como no interpretador: uma declaração no
+corpo de main com o nome de uma global do mesmo tipo vira atribuição a ela.
+
+O C deixa sem ordem definida a avaliação de operandos e argumentos, enquanto
+o interpretador avalia da esquerda para a direita. Quando uma expressão tem
+efeitos colaterais (chamadas, atribuições, print, acessos que podem falhar),
+os operandos são calculados antes, em temporários, na ordem do MicroC.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+from .ast import *
+from .eval import compile_source
+
+
+CFLAGS = ["-std=c99", "-O2", "-fwrapv"]
+
+C_TYPES = {"int": "int64_t", "bool": "mc_bool", "void": "void", "int[]": "mc_array"}
+
+INT64_MAX = 2 ** 63 - 1
+
+RUNTIME = r'''#include <inttypes.h>
+#include <stdint.h>
+#include <stdio.h>
+#include <stdlib.h>
+
+/* 0/1: resultado de operador; MC_FALSE/MC_TRUE: literal (bit 0 = valor lógico) */
+typedef int mc_bool;
+#define MC_FALSE 2
+#define MC_TRUE 3
+
+typedef struct {
+    int64_t *data;
+    int64_t size;
+} mc_array;
+
+static void mc_fail(int line, const char *msg)
+{
+    fflush(stdout);
+    fprintf(stderr, "Erro de execução (linha %d): %s\n", line, msg);
+    exit(1);
+}
+
+static int64_t mc_div(int64_t a, int64_t b, int line)
+{
+    int64_t q;
+    if (b == 0)
+        mc_fail(line, "divisão por zero.");
+    if (b == -1)
+        return (int64_t)(0 - (uint64_t)a);
+    /* Arredonda para baixo, como o // do Python */
+    q = a / b;
+    if (a % b != 0 && ((a < 0) != (b < 0)))
+        q--;
+    return q;
+}
+
+static int64_t *mc_at(mc_array a, int64_t i, const char *name, int line)
+{
+    if (i < 0 || i >= a.size) {
+        char msg[160];
+        snprintf(msg, sizeof msg, "Índice %" PRId64 " fora dos limites do vetor '%s' (tamanho %" PRId64 ").",
+                 i, name, a.size);
+        mc_fail(line, msg);
+    }
+    return &a.data[i];
+}
+
+static int64_t mc_print_int(int64_t v)
+{
+    printf("%" PRId64 "\n", v);
+    return v;
+}
+
+static mc_bool mc_print_bool(mc_bool v)
+{
+    static const char *const text[] = {"0", "1", "False", "True"};
+    puts(text[v]);
+    return v;
+}
+
+static void mc_missing_return(const char *name)
+{
+    char msg[160];
+    snprintf(msg, sizeof msg, "função '%s' terminou sem return.", name);
+    mc_fail(0, msg);
+}
+'''
+
+
+class BuildError(Exception):
+    """Erro ao gerar código C ou ao compilá-lo."""
+
+
+def _c_string(text):
+    return '"' + text.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+_EFFECTS = (Assignment, CompoundAssignment, Increment, ArrayAssignment, FunctionCall, PrintCall, ArrayIndex)
+
+
+def _effect(node):
+    # Efeito do próprio nó, sem olhar as subexpressões
+    return isinstance(node, _EFFECTS) or (isinstance(node, BinaryOp) and node.operator == '/')
+
+
+def _has_effects(node):
+    """Diz se avaliar `node` pode alterar estado, imprimir ou falhar."""
+    pending = [node]
+    while pending:
+        current = pending.pop()
+        if _effect(current):
+            return True
+        pending.extend(expression_children(current))
+    return False
+
+
+def _effects(node):
+    """id de cada subexpressão de `node` -> _has_effects dela, numa só passada."""
+    table = {}
+    stack = [(node, False)]
+    while stack:
+        current, ready = stack.pop()
+        children = expression_children(current)
+        if children and not ready:
+            stack.append((current, True))
+            stack.extend((child, False) for child in children)
+            continue
+        table[id(current)] = _effect(current) or any(table[id(child)] for child in children)
+    return table
+
+
+def _mentions(node, name):
+    """Diz se a expressão lê ou escreve a variável `name`."""
+    pending = [node]
+    while pending:
+        current = pending.pop()
+        if getattr(current, "name", None) == name and not isinstance(current, FunctionCall):
+            return True
+        pending.extend(expression_children(current))
+    return False
+
+
+class CGenerator(ASTVisitor):
+    """
+    Gera C a partir da AST. Statements são emitidos em `self.lines`; as
+    visitas de expressões retornam o código C da expressão e acrescentam em
+    `self.pre` os temporários que precisam ser calculados antes dela.
+    """
+
+    def __init__(self):
+        self.lines = []
+        self.level = 0
+        self.pre = []
+        self.temps = 0
+        self.scopes = [{}]  # nome -> tipo MicroC
+        self.functions = {}  # nome -> FunDecl
+        self.function = None
+        self.main_globals = set()  # globais redeclaradas no corpo de main
+        self.private = {}  # global privada de módulo -> número no nome C
+
+        # tipo do nó -> monta o código C a partir dos códigos dos filhos
+        self._expression_code = {
+            IntLiteral: self._int_literal,
+            BoolLiteral: self._bool_literal,
+            Variable: self._variable,
+            Assignment: self._assignment,
+            CompoundAssignment: self._compound_assignment,
+            Increment: self._increment,
+            ArrayIndex: self._array_index,
+            ArrayAssignment: self._array_assignment,
+            BinaryOp: self._binary_op,
+            UnaryOp: self._unary_op,
+            FunctionCall: self._function_call,
+            PrintCall: self._print_call,
+        }
+
+    # ---------------------------------------------------------------- utilidades
+
+    def emit(self, line):
+        self.lines.append("    " * self.level + line)
+
+    def _flush_pre(self):
+        for line in self.pre:
+            self.emit(line)
+        self.pre = []
+
+    def _temp(self, type_name, code):
+        self.temps += 1
+        name = f"mc_t{self.temps}"
+        self.pre.append(f"{C_TYPES[type_name]} {name} = {code};")
+        return name
+
+    def _var(self, name, prefix="v"):
+        """
+        Nome C de uma variável. Globais privadas de módulos (`caminho::nome`,
+        ver modules.py) viram `v<n>_nome`, que não colide com `v_<nome>`.
+        """
+        if "::" not in name:
+            return f"{prefix}_{name}"
+        number = self.private.setdefault(name, len(self.private) + 1)
+        return f"{prefix}{number}_{name.rsplit('::', 1)[1]}"
+
+    def _declare(self, name, type_name):
+        self.scopes[-1][name] = type_name
+
+    def _lookup(self, name):
+        for scope in reversed(self.scopes):
+            if name in scope:
+                return scope[name]
+        raise BuildError(f"Variável '{name}' não declarada.")
+
+    def _expr(self, node):
+        if isinstance(node, (IntLiteral, BoolLiteral, Variable)):
+            return node.accept(self)
+        return f"({node.accept(self)})"
+
+    def _cond(self, node):
+        return f"({self._expr(node)} & 1)"
+
+    def _operand(self, parent, children, i, code, effects):
+        """
+        Código do filho `i` de `parent`, já gerado. Em operações, índices e
+        argumentos, se algum operando tem efeitos, todos menos o último vão
+        para temporários, fixando a ordem esquerda-direita.
+        """
+        child = children[i]
+        if not isinstance(parent, PrintCall) and not isinstance(child, (IntLiteral, BoolLiteral, Variable)):
+            code = f"({code})"
+        if (isinstance(parent, (BinaryOp, ArrayAssignment, FunctionCall)) and i < len(children) - 1
+                and not isinstance(child, (IntLiteral, BoolLiteral))
+                and any(effects[id(c)] for c in children)):
+            code = self._temp(self.type_of(child), code)
+        return code
+
+    def _statement_body(self, stmt):
+        # Corpos de if/while/for sempre entre chaves: os temporários de um
+        # statement simples precisam ficar dentro do corpo
+        if isinstance(stmt, Block):
+            stmt.accept(self)
+        else:
+            self.emit("{")
+            self.level += 1
+            stmt.accept(self)
+            self.level -= 1
+            self.emit("}")
+
+    def type_of(self, node):
+        """Tipo MicroC de uma expressão (o programa já foi verificado)."""
+        if isinstance(node, IntLiteral):
+            return "int"
+        if isinstance(node, BoolLiteral):
+            return "bool"
+        if isinstance(node, (Variable, Assignment)):
+            return self._lookup(node.name)
+        if isinstance(node, (CompoundAssignment, Increment, ArrayIndex, ArrayAssignment)):
+            return "int"
+        if isinstance(node, BinaryOp):
+            return "int" if node.operator in ('+', '-', '*', '/') else "bool"
+        if isinstance(node, UnaryOp):
+            return "bool" if node.operator == '!' else "int"
+        if isinstance(node, FunctionCall):
+            return self.functions[node.name].type
+        if isinstance(node, PrintCall):
+            while isinstance(node, PrintCall):
+                node = node.expression
+            return self.type_of(node)
+        raise BuildError(f"Expressão não suportada: {type(node).__name__}")
+
+    # ---------------------------------------------------------------- declarações
+
+    def visit_program(self, node):
+        for decl in node.declarations:
+            if isinstance(decl, FunDecl):
+                self.functions[decl.name] = decl
+            elif isinstance(decl, ImportDecl):
+                self.visit_import_decl(decl)
+        main = self.functions.get("main")
+        if main is None:
+            raise BuildError("Função 'main' não definida.")
+        if main.params:
+            raise BuildError("A função 'main' não pode ter parâmetros.")
+
+        self.lines.append(RUNTIME)
+        self.lines.append("/* Variáveis globais */")
+        init = []
+        for decl in node.declarations:
+            if isinstance(decl, VarDecl):
+                self._declare(decl.name, decl.type)
+                self.lines.append(f"static {C_TYPES[decl.type]} {self._var(decl.name)};")
+                if decl.initializer is not None:
+                    value = self._expr(decl.initializer)
+                    init.extend("    " + line for line in self.pre)
+                    self.pre = []
+                    init.append(f"    {self._var(decl.name)} = {value};")
+            elif isinstance(decl, ArrayDecl):
+                self._declare(decl.name, "int[]")
+                self.lines.append(f"static int64_t {self._var(decl.name, 'a')}[{decl.size}];")
+                self.lines.append(f"static mc_array {self._var(decl.name)} = {{{self._var(decl.name, 'a')}, {decl.size}}};")
+        self.main_globals = {
+            stmt.name for stmt in main.body.statements
+            if isinstance(stmt, (VarDecl, ArrayDecl)) and stmt.name in self.scopes[0]
+        }
+
+        self.lines.append("")
+        self.lines.append("/* Protótipos */")
+        for fun in self.functions.values():
+            self.lines.append(self._signature(fun) + ";")
+
+        for decl in node.declarations:
+            if isinstance(decl, FunDecl):
+                self.lines.append("")
+                decl.accept(self)
+
+        self.lines.append("")
+        self.lines.append("static void mc_init(void)")
+        self.lines.append("{")
+        self.lines.extend(init)
+        self.lines.append("}")
+        self.lines.append("")
+        self.lines.append("int main(void)")
+        self.lines.append("{")
+        self.lines.append("    mc_init();")
+        if main.type == "void":
+            self.lines.append("    f_main();")
+            self.lines.append('    puts("None");')
+        else:
+            self.lines.append(f"    mc_print_{main.type}(f_main());")
+        self.lines.append("    return 0;")
+        self.lines.append("}")
+        return "\n".join(self.lines) + "\n"
+
+    def _signature(self, fun):
+        params = ", ".join(f"{C_TYPES[p.type]} {self._var(p.name)}" for p in fun.params) or "void"
+        return f"static {C_TYPES[fun.type]} f_{fun.name}({params})"
+
+    def visit_fun_decl(self, node):
+        self.function = node
+        self.temps = 0
+        self.lines.append(self._signature(node))
+        self.scopes.append({p.name: p.type for p in node.params})
+        # O corpo é um escopo filho dos parâmetros; em C isso só importa se ele
+        # redeclara um parâmetro, caso em que o bloco fica aninhado
+        params = {p.name for p in node.params}
+        shadows = any(isinstance(s, (VarDecl, ArrayDecl)) and s.name in params
+                      for s in node.body.statements)
+        if shadows:
+            self.emit("{")
+            self.level += 1
+        node.body.accept(self)
+        if shadows:
+            self.level -= 1
+            self.emit("}")
+        statements = node.body.statements
+        if node.type != "void" and not (statements and isinstance(statements[-1], ReturnStmt)):
+            # Caminho sem return: insere a falha antes da chave final do corpo
+            closing = self.lines.pop()
+            self.emit(f'    mc_missing_return("{node.name}");')
+            self.lines.append(closing)
+        self.scopes.pop()
+        self.function = None
+
+    def visit_import_decl(self, node):
+        raise BuildError(f"Import de '{node.path}' não resolvido: o programa não foi ligado.")
+
+    def visit_param(self, node):
+        pass
+
+    def _in_main_scope(self, node):
+        """Diz se `node` é uma declaração no corpo de main que altera uma global."""
+        return (self.function is not None and self.function.name == "main"
+                and len(self.scopes) == 3 and node.name in self.scopes[0])
+
+    def visit_var_decl(self, node):
+        ctype = C_TYPES[node.type]
+        if self._in_main_scope(node):
+            # main roda no escopo global: a declaração substitui o valor da global
+            if self.scopes[0][node.name] != node.type:
+                raise BuildError(f"Declaração de '{node.name}' em main muda o tipo da variável global.")
+            value = self._expr(node.initializer) if node.initializer is not None else "0"
+            self._flush_pre()
+            self.emit(f"{self._var(node.name)} = {value};")
+            return
+        if node.initializer is None:
+            value = "0"
+        else:
+            value = self._expr(node.initializer)
+            # Em C o novo nome já é visível no próprio inicializador
+            if _mentions(node.initializer, node.name) and not isinstance(node.initializer, (IntLiteral, BoolLiteral)):
+                value = self._temp(node.type, value)
+        self._flush_pre()
+        self._declare(node.name, node.type)
+        self.emit(f"{ctype} {self._var(node.name)} = {value};")
+
+    def visit_array_decl(self, node):
+        if self._in_main_scope(node):
+            raise BuildError(f"Declaração de '{node.name}' em main redeclara uma variável global.")
+        self._declare(node.name, "int[]")
+        self.emit(f"int64_t {self._var(node.name, 'a')}[{node.size}] = {{0}};")
+        self.emit(f"mc_array {self._var(node.name)} = {{{self._var(node.name, 'a')}, {node.size}}};")
+
+    # ---------------------------------------------------------------- statements
+
+    def visit_block(self, node):
+        self.emit("{")
+        self.level += 1
+        self.scopes.append({})
+        for stmt in node.statements:
+            stmt.accept(self)
+        self.scopes.pop()
+        self.level -= 1
+        self.emit("}")
+
+    def visit_expr_stmt(self, node):
+        code = node.expression.accept(self)
+        self._flush_pre()
+        self.emit(f"{code};")
+
+    def visit_if_stmt(self, node):
+        cond = self._cond(node.condition)
+        self._flush_pre()
+        self.emit(f"if {cond}")
+        self._statement_body(node.then_stmt)
+        if node.else_stmt is not None:
+            self.emit("else")
+            self._statement_body(node.else_stmt)
+
+    def _loop(self, condition, body, update=None):
+        """Emite um laço; condições com temporários viram while (1) + break."""
+        cond = self._cond(condition) if condition is not None else "(1)"
+        pre, self.pre = self.pre, []
+        if pre:
+            self.emit("while (1) {")
+            self.level += 1
+            for line in pre:
+                self.emit(line)
+            self.emit(f"if (!{cond}) break;")
+        else:
+            self.emit(f"while {cond} {{")
+            self.level += 1
+        self._statement_body(body)
+        if update is not None:
+            code = update.accept(self)
+            self._flush_pre()
+            self.emit(f"{code};")
+        self.level -= 1
+        self.emit("}")
+
+    def visit_while_stmt(self, node):
+        self._loop(node.condition, node.body)
+
+    def visit_for_stmt(self, node):
+        # for (init; cond; update) body  =>  { init; while (cond) { body update; } }
+        self.emit("{")
+        self.level += 1
+        self.scopes.append({})
+        if isinstance(node.init, VarDecl):
+            node.init.accept(self)
+        elif node.init is not None:
+            code = node.init.accept(self)
+            self._flush_pre()
+            self.emit(f"{code};")
+        self._loop(node.condition, node.body, node.update)
+        self.scopes.pop()
+        self.level -= 1
+        self.emit("}")
+
+    def visit_return_stmt(self, node):
+        if node.expression is None:
+            self.emit("return;")
+            return
+        code = self._expr(node.expression)
+        self._flush_pre()
+        self.emit(f"return {code};")
+
+    # ---------------------------------------------------------------- expressões
+
+    def visit_expression(self, node):
+        """
+        Código C de uma expressão, sem recursão (expressões geradas podem ter
+        milhares de níveis). Como em SemanticAnalyzer.visit_expression, cada
+        nó é montado quando os códigos dos filhos já estão na pilha; cada
+        filho passa por `_operand` assim que fica pronto, antes do próximo.
+        """
+        code_of = self._expression_code
+        effects = _effects(node)
+        codes = []
+        stack = [(node, 0)]
+        while stack:
+            current, done = stack.pop()
+            children = expression_children(current)
+            if done:
+                codes[-1] = self._operand(current, children, done - 1, codes[-1], effects)
+            if done < len(children):
+                stack.append((current, done + 1))
+                stack.append((children[done], 0))
+                continue
+            operands = codes[len(codes) - len(children):]
+            del codes[len(codes) - len(children):]
+            codes.append(code_of[type(current)](current, *operands))
+        return codes[0]
+
+    visit_assignment = visit_compound_assignment = visit_increment = visit_expression
+    visit_array_assignment = visit_binary_op = visit_unary_op = visit_expression
+    visit_function_call = visit_print_call = visit_variable = visit_expression
+    visit_array_index = visit_int_literal = visit_bool_literal = visit_expression
+
+    def _assignment(self, node, value):
+        if _has_effects(node.value) and _mentions(node.value, node.name):
+            value = self._temp(self._lookup(node.name), value)
+        return f"{self._var(node.name)} = {value}"
+
+    def _compound_assignment(self, node, value):
+        if _has_effects(node.value):
+            value = self._temp("int", value)  # o interpretador lê a variável depois
+        if node.operator == '/':
+            return f"{self._var(node.name)} = mc_div({self._var(node.name)}, {value}, {node.line or 0})"
+        return f"{self._var(node.name)} {node.operator}= {value}"
+
+    def _increment(self, node):
+        if node.prefix:
+            return f"{node.operator}{self._var(node.name)}"
+        return f"{self._var(node.name)}{node.operator}"
+
+    def _element(self, name, index, node):
+        return f'*mc_at({self._var(name)}, {index}, {_c_string(name)}, {node.line or 0})'
+
+    def _array_assignment(self, node, index, value):
+        if _has_effects(node.value):
+            # O limite é verificado depois de avaliar o valor
+            value = self._temp("int", value)
+        return f"{self._element(node.name, index, node)} = {value}"
+
+    def _array_index(self, node, index):
+        return self._element(node.name, index, node)
+
+    def _binary_op(self, node, left, right):
+        op = node.operator
+        if op == '/':
+            return f"mc_div({left}, {right}, {node.line or 0})"
+        # && e || avaliam os dois lados, como no interpretador, e dão 0 ou 1
+        if op == '&&':
+            return f"{left} & {right} & 1"
+        if op == '||':
+            return f"({left} | {right}) & 1"
+        return f"{left} {op} {right}"
+
+    def _unary_op(self, node, operand):
+        if node.operator == '!':
+            return f"({operand} & 1) ^ 1"
+        return f"{node.operator}{operand}"
+
+    def _function_call(self, node, *args):
+        if node.name == "main" and self.main_globals:
+            # Chamada por outra função, main tem escopo próprio
+            raise BuildError("Chamada de 'main' não suportada quando main redeclara variáveis globais.")
+        return f"f_{node.name}({', '.join(args)})"
+
+    def _print_call(self, node, value):
+        value_type = self.type_of(node.expression)
+        if value_type not in ("int", "bool"):
+            raise BuildError(f"print não aceita valores do tipo '{value_type}'.")
+        return f"mc_print_{value_type}({value})"
+
+    def _variable(self, node):
+        return self._var(node.name)
+
+    def _int_literal(self, node):
+        if node.value > INT64_MAX:
+            raise BuildError(f"Literal {node.value} não cabe em 64 bits.")
+        return f"INT64_C({node.value})"
+
+    def _bool_literal(self, node):
+        return "MC_TRUE" if node.value else "MC_FALSE"
+
+def generate_c(program):
+    """Retorna o código C equivalente a `program` (código-fonte ou AST)."""
+    if not isinstance(program, Program):
+        program = compile_source(program, strict=True)
+    return CGenerator().visit_program(program)
+
+
+def build(program, output, cc="cc", cflags=None, c_file=None):
+    """
+    Gera o C de `program` e o compila com `cc`, produzindo o executável
+    `output`. Se `c_file` for dado, o código C é mantido nesse arquivo.
+    """
+    code = generate_c(program)
+    flags = CFLAGS if cflags is None else cflags
+    with tempfile.TemporaryDirectory(prefix="microc-") as tmp:
+        path = c_file or os.path.join(tmp, "programa.c")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(code)
+        try:
+            proc = subprocess.run([cc, *flags, "-o", output, path], capture_output=True, text=True)
+        except FileNotFoundError:
+            raise BuildError(f"Compilador C '{cc}' não encontrado.")
+    if proc.returncode != 0:
+        raise BuildError(f"{cc} falhou:\n{proc.stderr}")
+    return output
+
+
+def make_argparser():
+    parser = argparse.ArgumentParser(prog="microc build", description="Compila MicroC para código nativo via C")
+    parser.add_argument("file", help="Arquivo de entrada")
+    parser.add_argument("-o", "--output", help="Executável gerado (padrão: nome do arquivo sem extensão).")
+    parser.add_argument("--emit-c", metavar="ARQ", help="Salva o código C gerado no arquivo indicado.")
+    parser.add_argument("--cc", default=os.environ.get("CC", "cc"), help="Compilador C (padrão: $CC ou cc).")
+    parser.add_argument("--run", action="store_true", help="Executa o programa após compilar.")
+    return parser
+
+
+def build_main(argv):
+    args = make_argparser().parse_args(argv)
+    try:
+        with open(args.file, "r") as f:
+            source = f.read()
+    except FileNotFoundError:
+        print(f"Arquivo {args.file} não encontrado.")
+        exit(1)
+
+    output = args.output or os.path.splitext(os.path.basename(args.file))[0]
+    try:
+        program = compile_source(source, strict=True, path=args.file)
+        build(program, output, cc=args.cc, c_file=args.emit_c)
+    except Exception as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        exit(1)
+    if args.run:
+        exit(subprocess.run([os.path.abspath(output)]).returncode)
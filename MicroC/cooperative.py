@@ -0,0 +1,139 @@
+"""
+Execução cooperativa de programas MicroC dentro de um event loop asyncio.
+
+O interpretador é recursivo, então não dá para suspendê-lo no meio de uma
+expressão com `await`. Em vez disso cada programa roda em uma thread própria
+que só avança quando o event loop lhe entrega a vez: a cada `slice_steps`
+passos (iterações de laço e chamadas, os mesmos do orçamento de passos) ela
+devolve o controle ao loop, que pode então atender outras tarefas e outros
+programas. Só uma das duas threads roda de cada vez, então a execução é
+determinística e vários programas se intercalam de forma justa.
+"""
+
+import asyncio
+import inspect
+import threading
+
+from .ast import Program
+from .runtime_errors import StepLimitError
+from .eval import Interpreter, compile_source
+from .output import ListCollector
+
+
+class _Cancelled(BaseException):
+    """Interrompe a thread do interpretador quando a tarefa é cancelada."""
+
+
+class _Worker:
+    """Thread que executa `target` em fatias, alternando com quem a retoma."""
+
+    def __init__(self, target):
+        self._to_worker = threading.Semaphore(0)
+        self._to_caller = threading.Semaphore(0)
+        self.cancelled = False
+        self.done = False
+        self.result = None
+        self.error = None
+        self._thread = threading.Thread(target=self._main, args=(target,), daemon=True)
+        self._thread.start()
+
+    def _main(self, target):
+        self._to_worker.acquire()
+        try:
+            if self.cancelled:
+                raise _Cancelled()
+            self.result = target()
+        except _Cancelled:
+            pass
+        except BaseException as e:
+            self.error = e
+        finally:
+            self.done = True
+            self._to_caller.release()
+
+    def resume(self):
+        """Executa a próxima fatia (chamado pelo event loop)."""
+        self._to_worker.release()
+        self._to_caller.acquire()
+
+    def pause(self):
+        """Devolve o controle ao event loop (chamado pelo interpretador)."""
+        self._to_caller.release()
+        self._to_worker.acquire()
+        if self.cancelled:
+            raise _Cancelled()
+
+    def cancel(self):
+        if not self.done:
+            self.cancelled = True
+            self.resume()
+
+
+class CooperativeInterpreter(Interpreter):
+    """
+    Interpretador que pausa a cada `slice_steps` passos. A saída de print fica
+    em um ListCollector até a próxima pausa.
+    """
+
+    def __init__(self, program, slice_steps=1000, max_steps=None, max_depth=None):
+        self.slice_steps = slice_steps
+        self.remaining = max_steps  # orçamento total ainda não distribuído
+        self.worker = None
+        super().__init__(program, max_steps=max_steps, max_depth=max_depth, output=ListCollector())
+        self.fuel = self._next_slice()
+
+    def _next_slice(self):
+        if self.remaining is None:
+            return self.slice_steps
+        steps = min(self.slice_steps, self.remaining)
+        self.remaining -= steps
+        return steps
+
+    def _refuel(self, node):
+        if self.remaining == 0:
+            raise StepLimitError(self.max_steps, node, self.function)
+        # O passo atual já foi descontado da nova fatia
+        self.fuel = self._next_slice() - 1
+        if self.worker is not None:
+            self.worker.pause()
+
+
+async def _emit(on_output, values):
+    for value in values:
+        if on_output is None:
+            print(value)
+            continue
+        result = on_output(value)
+        if inspect.isawaitable(result):
+            await result
+
+
+async def run_async(program, *, slice_steps=1000, on_output=None, max_steps=None,
+                    max_depth=None, entry="main", args=()):
+    """
+    Executa um programa MicroC sem bloquear o event loop.
+
+    `program` pode ser o código-fonte ou um `Program` já compilado. Os valores
+    impressos com print são entregues a `on_output` (função comum ou async);
+    sem callback, vão para a saída padrão. Retorna o valor da função de entrada.
+    """
+    if not isinstance(program, Program):
+        program = compile_source(program)
+    interpreter = CooperativeInterpreter(program, slice_steps, max_steps, max_depth)
+    worker = _Worker(lambda: interpreter.visit_program(program, entry, args))
+    interpreter.worker = worker
+
+    try:
+        while True:
+            worker.resume()
+            await _emit(on_output, interpreter.output.drain())
+            if worker.done:
+                break
+            await asyncio.sleep(0)
+    except BaseException:
+        worker.cancel()
+        raise
+
+    if worker.error is not None:
+        raise worker.error
+    return worker.result
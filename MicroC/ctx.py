@@ -1,26 +1,63 @@
 from .erros import UndefinedVariableError
 
 class Environment:
+    __slots__ = ("vars", "parent")
+
     def __init__(self, parent=None):
         self.vars = {}
         self.parent = parent
 
     def get(self, name):
-        if name in self.vars:
-            return self.vars[name]
-        elif self.parent:
-            return self.parent.get(name)
-        else:
-            raise UndefinedVariableError(name)
+        # Busca iterativa: cadeias de escopos podem ser muito profundas
+        env = self
+        while env is not None:
+            if name in env.vars:
+                return env.vars[name]
+            env = env.parent
+        raise UndefinedVariableError(name)
+
+    def resolve(self, name):
+        """Retorna o dicionário do escopo onde `name` está definida."""
+        env = self
+        while env is not None:
+            if name in env.vars:
+                return env.vars
+            env = env.parent
+        raise UndefinedVariableError(name)
 
     def set(self, name, value):
         self.vars[name] = value
 
     def update(self, name, value):
-        if name in self.vars:
-            self.vars[name] = value
-        elif self.parent:
-            self.parent.update(name, value)
-        else:
-            raise UndefinedVariableError(name)
+        self.resolve(name)[name] = value
+
+
+
+class EnvironmentPool:
+    """
+    Reaproveita escopos do interpretador. Um escopo devolvido com `release`
+    tem as variáveis apagadas e volta a ser entregue por `acquire`, em vez de
+    alocar um Environment (e um dicionário) a cada bloco e a cada chamada.
+    Só devolva escopos que ninguém mais referencia.
+    """
+
+    def __init__(self, limit=1024):
+        self.free = []
+        self.limit = limit  # escopos livres guardados no máximo
+        self.created = 0  # escopos alocados (estatística)
+        self.reused = 0  # escopos entregues a partir do pool
+
+    def acquire(self, parent):
+        if self.free:
+            env = self.free.pop()
+            env.parent = parent
+            self.reused += 1
+            return env
+        self.created += 1
+        return Environment(parent)
 
+    def release(self, env):
+        if len(self.free) < self.limit:
+            env.vars.clear()
+            env.parent = None
+            self.free.append(env)
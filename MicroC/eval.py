@@ -1,6 +1,11 @@
+import os
+from array import array
+
 from .ast import *
 from .ctx import *
 from .erros import *
+from .runtime_errors import *
+from .output import BufferedWriter
 
 class ReturnValue(Exception):
     def __init__(self, value):
@@ -9,39 +14,61 @@ class ReturnValue(Exception):
 class Interpreter(ASTVisitor):
     def visit_bool_literal(self, node):
         return node.value
-    def __init__(self, program):
+    def __init__(self, program, max_steps=None, max_depth=None, output=None):
         self.program = program
 
         self.env = Environment() #nosso contexto, vem de ctx
+        self.globals = self.env  # pai do escopo de toda função (escopo léxico)
+        # Escopos de blocos e chamadas são reaproveitados (ver ctx.EnvironmentPool)
+        self.scopes = EnvironmentPool()
+
+        # Destino dos prints (ver output.py); por padrão, stdout com buffer
+        self.output = output if output is not None else BufferedWriter()
+        self._write = self.output.write
+
+        # Limites de execução. Cada iteração de laço e cada chamada de função
+        # consome um passo de `fuel`; None significa sem limite.
+        self.max_steps = max_steps
+        self.max_depth = max_depth
+        self.fuel = max_steps
+        self.depth = 0
+        self.function = None  # função em execução (para mensagens de erro)
 
         self.functions = {}
         self._register_functions(program)
 
+        # Classe do nó -> visit_* ligado (ver ast.dispatch_table). Os métodos
+        # abaixo despacham os filhos por ela em vez de node.accept(self).
+        self._dispatch = dispatch_table(self)
+
     def _register_functions(self, program):
         for decl in program.declarations:
             if isinstance(decl, FunDecl):
                 self.functions[decl.name] = decl
-            elif isinstance(decl, VarDecl):
-                # Avalia o inicializador se existir
-                if decl.initializer is not None:
-                    # Precisamos usar um interpretador temporário para avaliar
-                    value = decl.initializer.accept(self) if hasattr(decl.initializer, 'accept') else decl.initializer
-                else:
-                    value = 0
-                self.env.set(decl.name, value)
 
-    def run(self):
+    def run(self, entry='main', args=()):
+        if entry != 'main' or args:
+            # Outro ponto de entrada: chamada comum, com escopo próprio
+            return self._call_function(entry, list(args))
         if 'main' not in self.functions:
             raise UndefinedFunctionError('main')
         # Ao chamar main, use o ambiente global diretamente
         func = self.functions['main']
+        self.function = 'main'
         try:
             result = self._eval_block(func.body, self.env)
         except ReturnValue as rv:
             result = rv.value
         return result
 
-    def _call_function(self, name, args):
+    def _refuel(self, node):
+        """
+        Chamado quando `fuel` fica negativo. Subclasses podem reabastecer e
+        continuar; por padrão o orçamento de passos acabou.
+        """
+        raise StepLimitError(self.max_steps, node, self.function)
+
+    def _call_function(self, name, args, node=None):
         func = self.functions.get(name)
         if not func:
             raise UndefinedFunctionError(name)
@@ -49,92 +76,217 @@ class Interpreter(ASTVisitor):
         # Verifica se o número de argumentos está correto
         if len(args) != len(func.params):
             raise ArgumentCountError(name, len(func.params), len(args))
+
+        if self.fuel is not None or self.max_depth is not None:
+            return self._call_limited(func, args, node)
             
-        local_env = Environment(self.env)
+        local_env = self.scopes.acquire(self.globals)
+        scope = local_env.vars
         for param, arg in zip(func.params, args):
-            local_env.set(param.name, arg)
+            scope[param.name] = arg
         try:
             result = self._eval_block(func.body, local_env)
             return result
         except ReturnValue as rv:
             return rv.value
+        finally:
+            self.scopes.release(local_env)
+
+    def _call_limited(self, func, args, node):
+        # Caminho de chamada com contabilidade de passos e de profundidade
+        if self.fuel is not None:
+            self.fuel -= 1
+            if self.fuel < 0:
+                self._refuel(node)
+        if self.max_depth is not None and self.depth >= self.max_depth:
+            raise CallDepthError(self.max_depth, node, self.function)
+
+        local_env = self.scopes.acquire(self.globals)
+        scope = local_env.vars
+        for param, arg in zip(func.params, args):
+            scope[param.name] = arg
+        prev_function = self.function
+        self.function = func.name
+        self.depth += 1
+        try:
+            return self._eval_block(func.body, local_env)
+        except ReturnValue as rv:
+            return rv.value
+        finally:
+            self.depth -= 1
+            self.function = prev_function
+            self.scopes.release(local_env)
 
     def _eval_block(self, block, env):
         prev_env = self.env
         self.env = env
+        dispatch = self._dispatch
         try:
             for stmt in block.statements:
-                stmt.accept(self)
-        except ReturnValue as rv:
-            raise rv  # Propaga para cima
+                dispatch[type(stmt)](stmt)
         finally:
             self.env = prev_env
 
-    def visit_program(self, node):
-        # Executa comandos e declarações globais (ex: global = 5;)
-        for decl in node.declarations:
-            if isinstance(decl, FunDecl):
-                self.functions[decl.name] = decl
-            elif isinstance(decl, VarDecl):
-                value = decl.initializer if decl.initializer is not None else 0
-                self.env.set(decl.name, value)
-            else:
-                decl.accept(self)
+    def visit_program(self, node, entry='main', args=()):
+        try:
+            # Executa comandos e declarações globais (ex: global = 5;).
+            # Cada inicializador é avaliado uma única vez, em ordem.
+            for decl in node.declarations:
+                if isinstance(decl, FunDecl):
+                    self.functions[decl.name] = decl
+                else:
+                    self.visit(decl)
 
-        return self.run()
+            return self.run(entry, args)
+        finally:
+            self.output.flush()
 
     def visit_var_decl(self, node):
         # Avalia o inicializador se existir
-        if node.initializer is not None:
-            value = node.initializer.accept(self)
+        initializer = node.initializer
+        if initializer is not None:
+            value = self._dispatch[type(initializer)](initializer)
         else:
             value = 0  # valor padrão
         self.env.set(node.name, value)
 
+    def visit_array_decl(self, node):
+        # Vetores são buffers contíguos de inteiros de 64 bits, zerados
+        self.env.set(node.name, array('q', bytes(8 * node.size)))
+
     def visit_fun_decl(self, node):
         pass  # já registrado
 
+    def visit_import_decl(self, node):
+        # Programas com import são executados depois de ligados (modules.py)
+        raise MicroCRuntimeError(f"Import de '{node.path}' não resolvido: o programa não foi ligado.", node)
+
     def visit_param(self, node):
         pass
 
-    def visit_block(self, node):
-        # Só cria novo escopo se não for o corpo de uma função
-        new_env = Environment(self.env)
+    def _needs_scope(self, node):
+        """Se o bloco ou for declara variáveis (e precisa de escopo próprio)."""
+        scoped = node.scoped
+        if scoped is None:
+            statements = node.statements if isinstance(node, Block) else (node.init, node.body)
+            scoped = node.scoped = declares(statements)
+        return scoped
 
-        # Se o escopo atual já é de função (ou global), apenas executa no escopo atual
-        # self._eval_block(node, new_env)
+    def visit_block(self, node):
+        # Bloco sem declarações executa direto no escopo atual
+        if not self._needs_scope(node):
+            dispatch = self._dispatch
+            for stmt in node.statements:
+                dispatch[type(stmt)](stmt)
+            return
+        new_env = self.scopes.acquire(self.env)
         try:
             self._eval_block(node, new_env)
-        except ReturnValue as rv:
-            # Propaga o retorno para cima
-            raise rv
+        finally:
+            self.scopes.release(new_env)
 
     def visit_expr_stmt(self, node):
-        node.expression.accept(self)
+        expression = node.expression
+        self._dispatch[type(expression)](expression)
 
     def visit_if_stmt(self, node):
-        cond = node.condition.accept(self)
-        if cond:
-            node.then_stmt.accept(self)
+        dispatch = self._dispatch
+        condition = node.condition
+        if dispatch[type(condition)](condition):
+            dispatch[type(node.then_stmt)](node.then_stmt)
         elif node.else_stmt:
-            node.else_stmt.accept(self)
+            dispatch[type(node.else_stmt)](node.else_stmt)
 
     def visit_while_stmt(self, node):
-        while node.condition.accept(self):
-            node.body.accept(self)
+        condition, body = node.condition, node.body
+        test = self._dispatch[type(condition)]
+        run = self._dispatch[type(body)]
+        if self.fuel is None:
+            while test(condition):
+                run(body)
+            return
+        # Com orçamento: consome um passo a cada volta do laço
+        while test(condition):
+            run(body)
+            self.fuel -= 1
+            if self.fuel < 0:
+                self._refuel(node)
+
+    def visit_for_stmt(self, node):
+        # A inicialização do for tem escopo próprio (se declarar algo)
+        prev_env = self.env
+        scope = self.scopes.acquire(prev_env) if self._needs_scope(node) else None
+        if scope is not None:
+            self.env = scope
+        try:
+            dispatch = self._dispatch
+            if node.init is not None:
+                dispatch[type(node.init)](node.init)
+            condition, body, update = node.condition, node.body, node.update
+            run = dispatch[type(body)]
+            while condition is None or dispatch[type(condition)](condition):
+                run(body)
+                if self.fuel is not None:
+                    self.fuel -= 1
+                    if self.fuel < 0:
+                        self._refuel(node)
+                if update is not None:
+                    dispatch[type(update)](update)
+        finally:
+            self.env = prev_env
+            if scope is not None:
+                self.scopes.release(scope)
 
     def visit_return_stmt(self, node):
-        value = node.expression.accept(self) if node.expression else 0
+        expression = node.expression
+        value = self._dispatch[type(expression)](expression) if expression else 0
         raise ReturnValue(value)
 
     def visit_assignment(self, node):
-        value = node.value.accept(self)
+        value = node.value
+        value = self._dispatch[type(value)](value)
         self.env.update(node.name, value)
         return value
 
+    def visit_compound_assignment(self, node):
+        # Operação fundida: resolve o escopo da variável uma única vez
+        value = node.value
+        value = self._dispatch[type(value)](value)
+        scope = self.env.resolve(node.name)
+        current = scope[node.name]
+        op = node.operator
+        if op == '+': result = current + value
+        elif op == '-': result = current - value
+        elif op == '*': result = current * value
+        elif op == '/': result = current // value
+        else: raise Exception(f"Operador de atribuição não suportado: {op}=")
+        scope[node.name] = result
+        return result
+
+    def visit_increment(self, node):
+        scope = self.env.resolve(node.name)
+        old = scope[node.name]
+        new = old + 1 if node.operator == '++' else old - 1
+        scope[node.name] = new
+        return new if node.prefix else old
+
+    def visit_array_assignment(self, node):
+        values = self.env.get(node.name)
+        dispatch = self._dispatch
+        index = dispatch[type(node.index)](node.index)
+        value = dispatch[type(node.value)](node.value)
+        if index < 0 or index >= len(values):
+            raise IndexOutOfBoundsError(node.name, index, len(values), node)
+        try:
+            values[index] = value
+        except OverflowError:
+            raise MicroCRuntimeError(f"Valor {value} não cabe em um elemento de '{node.name}' (64 bits).", node)
+        return value
+
     def visit_binary_op(self, node):
-        left = node.left.accept(self)
-        right = node.right.accept(self)
+        dispatch = self._dispatch
+        left = dispatch[type(node.left)](node.left)
+        right = dispatch[type(node.right)](node.right)
         op = node.operator
         if op == '+': return left + right
         if op == '-': return left - right
@@ -151,7 +303,8 @@ class Interpreter(ASTVisitor):
         raise Exception(f"Operador binário não suportado: {op}")
 
     def visit_unary_op(self, node):
-        operand = node.operand.accept(self)
+        operand = node.operand
+        operand = self._dispatch[type(operand)](operand)
         op = node.operator
         if op == '-':
             return -operand
@@ -163,47 +316,107 @@ class Interpreter(ASTVisitor):
         raise Exception(f"Operador unário não suportado: {op}")
 
     def visit_function_call(self, node):
-        args = [arg.accept(self) for arg in node.args]
-        return self._call_function(node.name, args)
+        dispatch = self._dispatch
+        args = [dispatch[type(arg)](arg) for arg in node.args]
+        return self._call_function(node.name, args, node)
     
     def visit_print_call(self, node):
-        value = node.expression.accept(self)
-        print(value)
+        value = node.expression
+        value = self._dispatch[type(value)](value)
+        self._write(value)
         return value  # print retorna o valor impresso
 
     def visit_variable(self, node):
-        value = self.env.get(node.name)
+        return self.env.get(node.name)
 
-        # Se o valor ainda for um nó da AST (não avaliado), avalia ele
-        while hasattr(value, "accept"):
-            value = value.accept(self)
-
-        return value
+    def visit_array_index(self, node):
+        values = self.env.get(node.name)
+        index = node.index
+        index = self._dispatch[type(index)](index)
+        if index < 0 or index >= len(values):
+            raise IndexOutOfBoundsError(node.name, index, len(values), node)
+        return values[index]
 
     def visit_int_literal(self, node):
         return node.value
 
-def eval(source):
-    from .parser import parse_source
-    from .transformer import MicroCTransformer
+def compile_source(source, strict=False, path=None, modules=None):
+    """
+    Executa o front-end (parse, transformação e análise semântica) e retorna a AST.
+    Com `strict`, erros semânticos são propagados em vez de apenas impressos.
+    `path` é o arquivo do código-fonte, base dos imports (ver `analyze`).
+    As fases medidas e com hooks estão em pipeline.Pipeline.
+    """
+    from .pipeline import Pipeline
+    return Pipeline().compile(source, strict, path, modules)
+
+def analyze(ast, strict=False, path=None, modules=None):
+    """
+    Análise semântica de `ast`. Se o programa tem imports, os módulos são
+    carregados relativos a `path` (ou ao diretório atual) pelo
+    ModuleCompiler `modules` e o programa retornado já vem ligado a eles.
+    """
     from .semantic import SemanticAnalyzer
 
-    tree = parse_source(source)
-    if not tree:
-        raise Exception("Erro de sintaxe.")
-    
-    ast = MicroCTransformer().transform(tree)
+    imports = None
+    if any(isinstance(decl, ImportDecl) for decl in ast.declarations):
+        from .modules import ModuleCompiler
+        modules = modules if modules is not None else ModuleCompiler()
+        base_dir = os.path.dirname(os.path.abspath(path)) if path else os.getcwd()
+        imports = modules.imports_for(ast, base_dir)
 
     #testando semântica
-    analyzer = SemanticAnalyzer()
+    analyzer = SemanticAnalyzer(imports={text: module.exports for text, module in (imports or {}).items()})
     try:
         analyzer.visit_program(ast)
     except Exception as e:
+        if strict:
+            raise
         print(f"Erro semântico: {e}")
 
-    interpreter = Interpreter(ast)
-
-    result = interpreter.visit_program(ast)
-
-    print(result)
+    if imports is not None:
+        ast = modules.link(ast, imports, os.path.abspath(path) if path else None)
+    return ast
+
+def interpreter_class(engine):
+    """
+    Classe do interpretador para `engine`: "tree" (recursivo, padrão),
+    "stack" (pilhas explícitas, para programas muito aninhados), "jit"
+    (compila laços e funções quentes para Python) ou "parallel" (divide
+    chamadas puras independentes entre processos).
+    """
+    if engine == "tree":
+        return Interpreter
+    if engine == "stack":
+        from .machine import StackInterpreter
+        return StackInterpreter
+    if engine == "jit":
+        from .jit import JITInterpreter
+        return JITInterpreter
+    if engine == "parallel":
+        from .parallel import ParallelInterpreter
+        return ParallelInterpreter
+    raise ValueError(f"Engine desconhecida: {engine}")
+
+def eval(source, max_steps=None, max_depth=None, output=None, quiet=False, engine="tree", path=None,
+         lazy=False, pipeline=None, **engine_options):
+    """
+    Compila e executa o programa. `output` é o sink dos prints (ver
+    output.py); com `quiet=True` o valor de retorno de main não é impresso.
+    `engine` escolhe o interpretador (ver `interpreter_class`) e
+    `engine_options` vão para o construtor dele (ex.: max_frames). `path`
+    é o arquivo do código-fonte, base dos imports. Com `lazy=True` só as
+    funções alcançáveis a partir de main são construídas e verificadas
+    (ver lazy.py). As fases rodam em `pipeline` (ver pipeline.py), que
+    guarda o tempo de cada uma e avisa os hooks assinados.
+    """
+    from .pipeline import Pipeline
+
+    pipeline = pipeline if pipeline is not None else Pipeline()
+    ast = pipeline.compile(source, path=path, lazy=lazy)
+    result = pipeline.execute(ast, engine, max_steps=max_steps, max_depth=max_depth, output=output,
+                              **engine_options)
+
+    if not quiet:
+        print(result)
     return result
@@ -0,0 +1,136 @@
+"""
+Hash-consing de nós de expressão da AST.
+
+Programas gerados repetem os mesmos literais, variáveis e pequenas expressões
+milhares de vezes. O Interner devolve sempre o mesmo objeto para expressões
+estruturalmente iguais e sem efeitos colaterais, e interna os nomes de
+identificadores (sys.intern), então cada forma distinta ocupa memória uma vez.
+
+Só são compartilhados nós imutáveis cuja posição no código não aparece em
+erros de execução: IntLiteral, BoolLiteral, Variable e BinaryOp/UnaryOp cujos
+operandos também foram compartilhados. Chamadas, atribuições, print, acesso a
+vetor (que gera IndexOutOfBoundsError com a linha do nó) e divisão (o backend C
+informa a linha da divisão por zero) continuam distintos, assim como qualquer
+expressão que os contenha. Um nó compartilhado guarda a posição da primeira
+ocorrência; quem precisa de posições deve ignorar nós com `structural_hash`.
+
+Cada nó compartilhado recebe `structural_hash`, igual para subárvores
+estruturalmente iguais; entre nós compartilhados, igualdade estrutural é o
+mesmo que identidade (`a is b`), o que otimizadores podem usar para achar
+subexpressões comuns sem comparar árvores.
+"""
+
+import sys
+from dataclasses import fields
+
+from .ast import *
+
+
+class Interner:
+    """Tabela de nós canônicos de um ou mais programas."""
+
+    def __init__(self):
+        self.table = {}  # chave estrutural -> nó canônico
+        self.requests = 0  # pedidos de nós (estatística)
+
+    def name(self, text):
+        """Identificador internado (uma única string por nome)."""
+        return sys.intern(str(text))
+
+    def _canonical(self, key, make):
+        self.requests += 1
+        node = self.table.get(key)
+        if node is None:
+            node = self.table[key] = make()
+            # Os filhos já têm o hash guardado: o cálculo só olha este nó
+            node.structural_hash = structural_hash(node)
+        return node
+
+    def int_literal(self, value):
+        return self._canonical(("int", value), lambda: IntLiteral(value))
+
+    def bool_literal(self, value):
+        return self._canonical(("bool", value), lambda: BoolLiteral(value))
+
+    def variable(self, name):
+        name = self.name(name)
+        return self._canonical(("var", name), lambda: Variable(name))
+
+    def is_canonical(self, node):
+        return node.structural_hash is not None and self.table.get(_key(node)) is node
+
+    def binary_op(self, left, operator, right):
+        if operator == '/' or not (self.is_canonical(left) and self.is_canonical(right)):
+            return BinaryOp(left, operator, right)
+        key = ("bin", operator, id(left), id(right))
+        return self._canonical(key, lambda: BinaryOp(left, operator, right))
+
+    def unary_op(self, operator, operand):
+        if not self.is_canonical(operand):
+            return UnaryOp(operator, operand)
+        key = ("un", operator, id(operand))
+        return self._canonical(key, lambda: UnaryOp(operator, operand))
+
+
+def _key(node):
+    # Chave do nó na tabela do Interner (nós canônicos têm filhos canônicos)
+    if isinstance(node, IntLiteral):
+        return ("int", node.value)
+    if isinstance(node, BoolLiteral):
+        return ("bool", node.value)
+    if isinstance(node, Variable):
+        return ("var", node.name)
+    if isinstance(node, BinaryOp):
+        return ("bin", node.operator, id(node.left), id(node.right))
+    if isinstance(node, UnaryOp):
+        return ("un", node.operator, id(node.operand))
+    return None
+
+
+def structural_hash(node):
+    """
+    Hash estrutural de qualquer subárvore: igual para subárvores iguais
+    (pela igualdade dos dataclasses). Usa o valor guardado nos nós
+    compartilhados e calcula os demais sem recursão.
+    """
+    hashes = {}
+    stack = [(node, False)]
+    while stack:
+        current, ready = stack.pop()
+        if current.structural_hash is not None:
+            hashes[id(current)] = current.structural_hash
+            continue
+        values = [getattr(current, field.name) for field in fields(current)]
+        children = [v for value in values for v in (value if isinstance(value, list) else [value])
+                    if isinstance(v, ASTNode)]
+        if not ready:
+            stack.append((current, True))
+            stack.extend((child, False) for child in children)
+            continue
+        parts = []
+        for value in values:
+            if isinstance(value, list):
+                parts.append(tuple(hashes[id(v)] if isinstance(v, ASTNode) else v for v in value))
+            elif isinstance(value, ASTNode):
+                parts.append(hashes[id(value)])
+            else:
+                parts.append(value)
+        hashes[id(current)] = hash((type(current).__name__, tuple(parts)))
+    return hashes[id(node)]
+
+
+def count_nodes(node):
+    """Retorna (nós visitados na árvore, objetos distintos entre eles)."""
+    total, distinct = 0, set()
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        total += 1
+        distinct.add(id(current))
+        for field in fields(current):
+            value = getattr(current, field.name)
+            if isinstance(value, list):
+                stack.extend(v for v in value if isinstance(v, ASTNode))
+            elif isinstance(value, ASTNode):
+                stack.append(value)
+    return total, len(distinct)
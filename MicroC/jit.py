@@ -0,0 +1,619 @@
+"""
+JIT de laços e funções quentes para MicroC.
+
+O JITInterpreter executa como o Interpreter, mas conta as voltas de cada laço
+(while/for) e as chamadas de cada função:
+
+- Laço quente: depois de `hot_loop` voltas o interpretador grava as próximas
+  `record_loop` voltas, anotando o lado tomado em cada if, e compila o laço
+  para uma função Python (um trace). Os ifs que só foram para um lado viram
+  guardas: se a condição mudar, o trace sai (saída lateral) e o interpretador
+  termina a volta a partir daquele ponto. Chamadas dentro do trace ganham uma
+  guarda de identidade da função chamada, conferida na entrada.
+- Função quente: depois de `hot_calls` chamadas o corpo inteiro é compilado
+  (com os dois lados de cada if) e as chamadas seguintes vão direto para ele.
+
+O código gerado usa variáveis locais do Python no lugar dos escopos
+(Environment): variáveis do próprio trecho compilado e variáveis locais da
+função ao redor do laço viram locais; globais continuam no dicionário do
+escopo global, porque funções chamadas podem alterá-las. Passos e
+profundidade são contados como no Interpreter, então `max_steps`/`max_depth`
+valem igualmente.
+"""
+
+from array import array
+
+from .ast import *
+from .ctx import Environment
+from .erros import *
+from .runtime_errors import *
+from .eval import Interpreter, ReturnValue
+
+
+# Limiares padrão (ver JITInterpreter)
+HOT_LOOP = 50
+RECORD_LOOP = 10
+HOT_CALLS = 50
+# Saídas laterais toleradas antes de recompilar o trace com os novos lados
+RETRACE_EXITS = 8
+MAX_RETRACES = 4
+
+_THEN, _ELSE = 1, 2
+_WRITEBACK = object()  # marcador de linha: devolve as variáveis do laço aos escopos
+
+
+def _undefined(name):
+    raise UndefinedVariableError(name)
+
+
+def _rfloordiv(value, current):
+    return current // value
+
+
+def _load(values, index, node):
+    if index < 0 or index >= len(values):
+        raise IndexOutOfBoundsError(node.name, index, len(values), node)
+    return values[index]
+
+
+def _store(values, index, value, node):
+    if index < 0 or index >= len(values):
+        raise IndexOutOfBoundsError(node.name, index, len(values), node)
+    try:
+        values[index] = value
+    except OverflowError:
+        raise MicroCRuntimeError(f"Valor {value} não cabe em um elemento de '{node.name}' (64 bits).", node)
+    return value
+
+
+def _new_array(size):
+    return array('q', bytes(8 * size))
+
+
+class _Unsupported(Exception):
+    """Nó que o compilador não traduz: o trecho fica no interpretador."""
+
+
+class CompiledCode:
+    """Função Python gerada para um laço ou uma função MicroC."""
+
+    def __init__(self, fn, source, node):
+        self.fn = fn
+        self.source = source  # código Python gerado (para depuração)
+        self.node = node
+        self.exits = []  # saídas laterais: (if, lado, ramo, continuação)
+        self.callees = []  # guardas de identidade: (nome, FunDecl)
+        self.side_exits = 0
+        self.arity = len(node.params) if isinstance(node, FunDecl) else 0
+
+
+class _Compiler:
+    """
+    Traduz um laço (modo trace, com `env` = escopo do laço) ou uma função
+    (modo função, `env` = None) para código Python.
+    """
+
+    def __init__(self, interp, env=None, branches=None):
+        self.interp = interp
+        self.env = env
+        self.branches = branches if branches is not None else {}
+        self.globals = interp.globals.vars
+        self.namespace = {
+            "I": interp,
+            "G": self.globals,
+            "ReturnValue": ReturnValue,
+            "_undefined": _undefined,
+            "_rfloordiv": _rfloordiv,
+            "_load": _load,
+            "_store": _store,
+            "_new_array": _new_array,
+            "_setg": _setg_for(self.globals),
+            "_print": interp._print_value,
+            "call": interp._call_function,
+        }
+        self.lines = []  # (indentação, texto)
+        self.indent = 1
+        self.scopes = []  # um dicionário nome -> local Python por bloco
+        self.counter = 0
+        self.outer = {}  # variáveis de fora do laço mantidas em locais
+        self.assigned = set()  # ... e quais delas o laço altera
+        self.path = []  # continuação de cada bloco no caminho do trace: [lista, próximo índice]
+        self.guards = env is not None  # ifs viram guardas só no corpo do laço quente
+        self.exits = []
+        self.callees = {}
+
+    # ------------------------------------------------------------ utilidades
+
+    def emit(self, text):
+        self.lines.append((self.indent, text))
+
+    def const(self, value):
+        name = f"K{len(self.namespace)}"
+        self.namespace[name] = value
+        return name
+
+    def fresh(self, name):
+        self.counter += 1
+        return f"v_{name}_{self.counter}"
+
+    def declare(self, name):
+        local = self.scopes[-1][name] = self.fresh(name)
+        return local
+
+    def resolve(self, name):
+        """Retorna ('local', nome Python), ('global', None) ou ('undefined', None)."""
+        for scope in reversed(self.scopes):
+            if name in scope:
+                return "local", scope[name]
+        if name in self.outer:
+            return "local", self.outer[name]
+        if self.env is not None:
+            try:
+                scope = self.env.resolve(name)
+            except UndefinedVariableError:
+                return "undefined", None
+            if scope is self.globals:
+                return "global", None
+            local = self.outer[name] = f"o_{name}"
+            return "local", local
+        if name in self.globals:
+            return "global", None
+        return "undefined", None
+
+    def assign(self, name, value, make):
+        """Código que grava `make(atual)` em `name` e vale o novo valor."""
+        kind, local = self.resolve(name)
+        if kind == "local":
+            if name in self.outer and self.outer[name] == local:
+                self.assigned.add(name)
+            return f"({local} := {make(local)})"
+        if kind == "global":
+            return f"_setg({name!r}, {make(f'G[{name!r}]')})"
+        return f"({value}, _undefined({name!r}))[1]" if value else f"_undefined({name!r})"
+
+    # ------------------------------------------------------------ expressões
+
+    def expr(self, node):
+        method = getattr(self, "expr_" + type(node).__name__, None)
+        if method is None:
+            raise _Unsupported(type(node).__name__)
+        return method(node)
+
+    def expr_IntLiteral(self, node):
+        return repr(node.value)
+
+    def expr_BoolLiteral(self, node):
+        return repr(bool(node.value))
+
+    def expr_Variable(self, node):
+        kind, local = self.resolve(node.name)
+        if kind == "local":
+            return local
+        if kind == "global":
+            return f"G[{node.name!r}]"
+        return f"_undefined({node.name!r})"
+
+    def expr_BinaryOp(self, node):
+        left, right, op = self.expr(node.left), self.expr(node.right), node.operator
+        if op == "&&":
+            return f"int(bool({left}) & bool({right}))"
+        if op == "||":
+            return f"int(bool({left}) | bool({right}))"
+        if op in ("==", "!=", "<", ">", "<=", ">="):
+            return f"int({left} {op} {right})"
+        if op == "/":
+            op = "//"
+        elif op not in ("+", "-", "*"):
+            raise _Unsupported(op)
+        return f"({left} {op} {right})"
+
+    def expr_UnaryOp(self, node):
+        operand, op = self.expr(node.operand), node.operator
+        if op == "!":
+            return f"int(not {operand})"
+        if op in ("-", "+"):
+            return f"({op}{operand})"
+        raise _Unsupported(op)
+
+    def expr_Assignment(self, node):
+        value = self.expr(node.value)
+        return self.assign(node.name, value, lambda current: value)
+
+    def expr_CompoundAssignment(self, node):
+        # O Interpreter avalia o valor antes de ler a variável
+        value, op = self.expr(node.value), node.operator
+        makers = {
+            "+": lambda current: f"{value} + {current}",
+            "*": lambda current: f"{value} * {current}",
+            "-": lambda current: f"-{value} + {current}",
+            "/": lambda current: f"_rfloordiv({value}, {current})",
+        }
+        if op not in makers:
+            raise _Unsupported(op + "=")
+        return self.assign(node.name, value, makers[op])
+
+    def expr_Increment(self, node):
+        delta = "+ 1" if node.operator == "++" else "- 1"
+        new = self.assign(node.name, None, lambda current: f"{current} {delta}")
+        if node.prefix:
+            return new
+        undo = "- 1" if node.operator == "++" else "+ 1"
+        return f"({new} {undo})"
+
+    def expr_ArrayIndex(self, node):
+        values = self.expr_Variable(node)
+        return f"_load({values}, {self.expr(node.index)}, {self.const(node)})"
+
+    def expr_ArrayAssignment(self, node):
+        values = self.expr_Variable(node)
+        return f"_store({values}, {self.expr(node.index)}, {self.expr(node.value)}, {self.const(node)})"
+
+    def expr_FunctionCall(self, node):
+        args = ", ".join(self.expr(arg) for arg in node.args)
+        decl = self.interp.functions.get(node.name)
+        if decl is not None:
+            self.callees[node.name] = decl
+        return f"call({node.name!r}, [{args}], {self.const(node)})"
+
+    def expr_PrintCall(self, node):
+        return f"_print({self.expr(node.expression)})"
+
+    # ------------------------------------------------------------ statements
+
+    def stmt(self, node):
+        method = getattr(self, "stmt_" + type(node).__name__, None)
+        if method is None:
+            raise _Unsupported(type(node).__name__)
+        method(node)
+
+    def statements(self, statements):
+        # Cada bloco é um nível da continuação das saídas laterais
+        self.path.append([statements, 0])
+        for index, stmt in enumerate(statements):
+            self.path[-1][1] = index + 1
+            self.stmt(stmt)
+        self.path.pop()
+
+    def stmt_Block(self, node):
+        self.scopes.append({})
+        if not node.statements:
+            self.emit("pass")
+        self.statements(node.statements)
+        self.scopes.pop()
+
+    def stmt_VarDecl(self, node):
+        if node.initializer is not None:
+            value = self.expr(node.initializer)
+        else:
+            value = "0"
+        self.emit(f"{self.declare(node.name)} = {value}")
+
+    def stmt_ArrayDecl(self, node):
+        self.emit(f"{self.declare(node.name)} = _new_array({node.size!r})")
+
+    def stmt_ExprStmt(self, node):
+        self.emit(self.expr(node.expression))
+
+    def stmt_IfStmt(self, node):
+        condition = self.expr(node.condition)
+        taken = self.branches.get(id(node), 0) if self.guards else 0
+        if taken == _THEN or taken == _ELSE:
+            # Guarda: o lado não observado vira uma saída lateral
+            if taken == _THEN:
+                self.emit(f"if not {condition}:")
+                exit_branch, stay = node.else_stmt, node.then_stmt
+            else:
+                self.emit(f"if {condition}:")
+                exit_branch, stay = node.then_stmt, node.else_stmt
+            self.indent += 1
+            self.side_exit(node, _ELSE if taken == _THEN else _THEN, exit_branch)
+            self.indent -= 1
+            if stay is not None:
+                self.stmt(stay)
+            return
+        self.emit(f"if {condition}:")
+        self.indented(node.then_stmt)
+        if node.else_stmt is not None:
+            self.emit("else:")
+            self.indented(node.else_stmt)
+
+    def indented(self, node):
+        self.indent += 1
+        size = len(self.lines)
+        self.stmt(node)
+        if len(self.lines) == size:
+            self.emit("pass")
+        self.indent -= 1
+
+    def side_exit(self, node, side, branch):
+        levels = ", ".join(
+            "{" + ", ".join(f"{name!r}: {local}" for name, local in scope.items()) + "}"
+            for scope in self.scopes
+        )
+        continuation = [(statements, index) for statements, index in self.path]
+        self.exits.append((node, side, branch, continuation))
+        self.lines.append((self.indent, _WRITEBACK))
+        self.emit(f"return ({len(self.exits) - 1}, ({levels}{',' if self.scopes else ''}))")
+
+    def loop_body(self, node, body, update):
+        # Laços internos são compilados inteiros, sem guardas
+        guards, self.guards = self.guards, False
+        self.indented(body)
+        self.indent += 1
+        self.tick(node)
+        if update is not None:
+            self.emit(self.expr(update))
+        self.indent -= 1
+        self.guards = guards
+
+    def tick(self, node):
+        if self.interp.fuel is not None:
+            self.emit("I.fuel -= 1")
+            self.emit(f"if I.fuel < 0: I._refuel({self.const(node)})")
+
+    def stmt_WhileStmt(self, node):
+        self.emit(f"while {self.expr(node.condition)}:")
+        self.loop_body(node, node.body, None)
+
+    def stmt_ForStmt(self, node):
+        self.scopes.append({})
+        if isinstance(node.init, VarDecl):
+            self.stmt(node.init)
+        elif node.init is not None:
+            self.emit(self.expr(node.init))
+        condition = self.expr(node.condition) if node.condition is not None else "True"
+        self.emit(f"while {condition}:")
+        self.loop_body(node, node.body, node.update)
+        self.scopes.pop()
+
+    def stmt_ReturnStmt(self, node):
+        value = self.expr(node.expression) if node.expression is not None else "0"
+        if self.env is None:
+            self.emit(f"return {value}")
+            return
+        self.emit(f"_result = {value}")
+        self.lines.append((self.indent, _WRITEBACK))
+        self.emit("raise ReturnValue(_result)")
+
+    # ------------------------------------------------------------ montagem
+
+    def render(self, header, prologue=()):
+        writeback = [f"S_{name}[{name!r}] = {self.outer[name]}" for name in sorted(self.assigned)]
+        out = [header]
+        out.extend("    " + line for line in prologue)
+        for indent, text in self.lines:
+            if text is _WRITEBACK:
+                out.extend("    " * indent + line for line in writeback)
+            else:
+                out.append("    " * indent + text)
+        return "\n".join(out) + "\n"
+
+    def build(self, source, name, node):
+        code = compile(source, f"<jit {name}>", "exec")
+        exec(code, self.namespace)
+        compiled = CompiledCode(self.namespace[name], source, node)
+        compiled.exits = self.exits
+        compiled.callees = list(self.callees.items())
+        return compiled
+
+
+def _setg_for(scope):
+    def _setg(name, value):
+        scope[name] = value
+        return value
+    return _setg
+
+
+def compile_loop(interp, node, env, branches):
+    """Compila o laço `node` (while ou for, sem a inicialização) em `env`."""
+    compiler = _Compiler(interp, env, branches)
+    condition = node.condition
+    update = node.update if isinstance(node, ForStmt) else None
+    compiler.emit("while True:")
+    compiler.indent = 2
+    if condition is not None:
+        compiler.emit(f"if not {compiler.expr(condition)}: break")
+    compiler.stmt(node.body)
+    compiler.guards = False
+    compiler.tick(node)
+    if update is not None:
+        compiler.emit(compiler.expr(update))
+    compiler.indent = 1
+    compiler.lines.append((1, _WRITEBACK))
+
+    prologue = []
+    for name, local in sorted(compiler.outer.items()):
+        prologue.append(f"S_{name} = env.resolve({name!r})")
+        prologue.append(f"{local} = S_{name}[{name!r}]")
+    source = compiler.render("def trace(env):", prologue)
+    return compiler.build(source, "trace", node)
+
+
+def compile_function(interp, func):
+    """Compila o corpo da função `func` (todos os caminhos, sem guardas)."""
+    compiler = _Compiler(interp)
+    # Parâmetros e corpo dividem o escopo da função, como no Interpreter
+    compiler.scopes.append({})
+    params = [compiler.declare(param.name) for param in func.params]
+    compiler.statements(func.body.statements)
+    compiler.emit("return None")
+    source = compiler.render(f"def function({', '.join(params)}):")
+    return compiler.build(source, "function", func)
+
+
+class JITInterpreter(Interpreter):
+    """
+    Interpretador com JIT de laços e funções quentes (ver o topo do módulo).
+    `hot_loop`, `record_loop` e `hot_calls` ajustam os limiares; `traces`
+    e `compiled` guardam o código gerado (útil para inspecionar o JIT).
+    """
+
+    def __init__(self, program, hot_loop=HOT_LOOP, record_loop=RECORD_LOOP, hot_calls=HOT_CALLS, **options):
+        self.hot_loop = hot_loop
+        self.record_loop = record_loop
+        self.hot_calls = hot_calls
+        self.traces = {}  # id do laço -> CompiledCode (False: não compilável)
+        self.compiled = {}  # nome da função -> CompiledCode (False: não compilável)
+        self._loop_counts = {}
+        self._call_counts = {}
+        self._retraces = {}
+        self._branches = {}  # id do if -> lados observados durante a gravação
+        self._recording = 0
+        self.side_exits = 0  # total de saídas laterais (estatística)
+        super().__init__(program, **options)
+
+    def _print_value(self, value):
+        self._write(value)
+        return value
+
+    # ------------------------------------------------------------ funções
+
+    def _call_function(self, name, args, node=None):
+        code = self.compiled.get(name)
+        func = self.functions.get(name)
+        if code is None or (code and code.node is not func):
+            count = self._call_counts.get(name, 0) + 1
+            self._call_counts[name] = count
+            if func is None or count < self.hot_calls:
+                return super()._call_function(name, args, node)
+            code = self.compiled[name] = self._compile(compile_function, func)
+        if not code:
+            return super()._call_function(name, args, node)
+        if len(args) != code.arity:
+            raise ArgumentCountError(name, code.arity, len(args))
+        if self.fuel is None and self.max_depth is None:
+            return code.fn(*args)
+
+        if self.fuel is not None:
+            self.fuel -= 1
+            if self.fuel < 0:
+                self._refuel(node)
+        if self.max_depth is not None and self.depth >= self.max_depth:
+            raise CallDepthError(self.max_depth, node, self.function)
+        prev_function = self.function
+        self.function = name
+        self.depth += 1
+        try:
+            return code.fn(*args)
+        finally:
+            self.depth -= 1
+            self.function = prev_function
+
+    def _compile(self, compiler, *args):
+        try:
+            return compiler(self, *args)
+        except (_Unsupported, RecursionError, SyntaxError, MemoryError):
+            # Ex.: expressões aninhadas demais para o compilador do Python
+            return False
+
+    # ------------------------------------------------------------ laços
+
+    def visit_if_stmt(self, node):
+        dispatch = self._dispatch
+        cond = dispatch[type(node.condition)](node.condition)
+        if self._recording:
+            self._branches[id(node)] = self._branches.get(id(node), 0) | (_THEN if cond else _ELSE)
+        if cond:
+            dispatch[type(node.then_stmt)](node.then_stmt)
+        elif node.else_stmt:
+            dispatch[type(node.else_stmt)](node.else_stmt)
+
+    def visit_while_stmt(self, node):
+        self._loop(node, node.condition, None)
+
+    def visit_for_stmt(self, node):
+        prev_env = self.env
+        scope = self.scopes.acquire(prev_env) if self._needs_scope(node) else None
+        if scope is not None:
+            self.env = scope
+        try:
+            if node.init is not None:
+                self.visit(node.init)
+            self._loop(node, node.condition, node.update)
+        finally:
+            self.env = prev_env
+            if scope is not None:
+                self.scopes.release(scope)
+
+    def _loop(self, node, condition, update):
+        env = self.env
+        key = id(node)
+        count = self._loop_counts.get(key, 0)
+        test = self._dispatch[type(condition)] if condition is not None else None
+        run = self._dispatch[type(node.body)]
+        hot, recorded = self.hot_loop, self.hot_loop + self.record_loop
+        recording = False
+        try:
+            while True:
+                trace = self.traces.get(key)
+                if trace and not self._callees_unchanged(trace):
+                    # Guarda de identidade falhou: volta a interpretar e grava de novo
+                    trace = self.traces[key] = None
+                    count = 0
+                if trace:
+                    exit = trace.fn(env)
+                    if exit is None:
+                        return
+                    self._side_exit(node, trace, env, *exit)
+                elif test is not None and not test(condition):
+                    return
+                else:
+                    if trace is None:
+                        count += 1
+                        if count == hot + 1:
+                            recording = True
+                            self._recording += 1
+                        elif count == recorded + 1:
+                            recording = False
+                            self._recording -= 1
+                            self.traces[key] = self._compile(compile_loop, node, env, self._branches)
+                    run(node.body)
+                if self.fuel is not None:
+                    self.fuel -= 1
+                    if self.fuel < 0:
+                        self._refuel(node)
+                if update is not None:
+                    self.visit(update)
+        finally:
+            if recording:
+                self._recording -= 1
+            self._loop_counts[key] = count
+
+    def _callees_unchanged(self, trace):
+        functions = self.functions
+        for name, decl in trace.callees:
+            if functions.get(name) is not decl:
+                return False
+        return True
+
+    def _side_exit(self, node, trace, env, index, levels):
+        """Termina, no interpretador, a volta em que uma guarda falhou."""
+        if_node, side, branch, continuation = trace.exits[index]
+        self._branches[id(if_node)] = self._branches.get(id(if_node), 0) | side
+        trace.side_exits += 1
+        self.side_exits += 1
+        if trace.side_exits >= RETRACE_EXITS:
+            retraces = self._retraces[id(node)] = self._retraces.get(id(node), 0) + 1
+            self.traces[id(node)] = (
+                self._compile(compile_loop, node, env, self._branches) if retraces <= MAX_RETRACES else False
+            )
+
+        # Reconstrói os escopos dos blocos abertos no ponto da saída
+        scopes = []
+        scope = env
+        for values in levels:
+            scope = Environment(scope)
+            scope.vars.update(values)
+            scopes.append(scope)
+        prev_env = self.env
+        try:
+            self.env = scopes[-1] if scopes else env
+            if branch is not None:
+                self.visit(branch)
+            for depth in reversed(range(len(continuation))):
+                statements, start = continuation[depth]
+                self.env = scopes[depth]
+                for stmt in statements[start:]:
+                    self.visit(stmt)
+        finally:
+            self.env = prev_env
@@ -0,0 +1,274 @@
+"""
+Front-end sob demanda: só constrói e verifica as funções que o programa usa.
+
+O front-end normal (eval.compile_source) faz o parse do arquivo inteiro,
+transforma cada fun_decl em AST e verifica todos os corpos, mesmo quando a
+execução usa poucas funções de uma biblioteca grande. Aqui:
+
+1. Uma varredura por expressão regular acha as declarações de nível superior
+   e o intervalo `{ ... }` do corpo de cada função (pulando comentários e
+   strings).
+2. O Lark faz o parse de um esqueleto do arquivo, em que o conteúdo dos
+   corpos foi trocado por espaços (mantendo as quebras de linha, logo as
+   posições). Isso dá, já no começo, as globais, os imports e a assinatura
+   de cada função, que vira um LazyFunDecl.
+3. Globais, imports e assinaturas passam pela análise semântica de imediato.
+   O corpo de uma função só é lido, transformado e verificado no primeiro
+   acesso a `decl.body`: quando `reachable` percorre o grafo de chamadas a
+   partir de main ou quando um interpretador chama a função. O resultado fica
+   no próprio nó, que passa a ser um FunDecl comum.
+
+Um corpo é verificado com o mesmo contexto do front-end normal: as globais e
+funções declaradas antes dele. Erros em funções que nunca são usadas (de
+sintaxe ou semânticos) não aparecem.
+"""
+
+import re
+
+from .ast import *
+from .semantic import ArrayType, SemanticAnalyzer, is_array
+
+
+# Pedaços do código que importam para achar os corpos: comentários e strings
+# (pulados inteiros) e os caracteres { } ;
+_STRUCTURE = re.compile(r'/\*.*?\*/|//[^\n]*|"[^"\n]*"|[{};]', re.S)
+# Espaços e comentários entre duas declarações
+_SPACE = re.compile(r'(?:\s+|/\*.*?\*/|//[^\n]*)*', re.S)
+
+
+class LazyFunDecl(FunDecl):
+    """
+    FunDecl cujo corpo só é construído no primeiro acesso a `body`. Depois
+    disso o nó vira um FunDecl comum (a classe é trocada), sem custo extra
+    nos acessos seguintes.
+    """
+
+    def __init__(self, type, name, params, unit, index):
+        self.type = type
+        self.name = name
+        self.params = params
+        self._unit = unit
+        self._index = index  # posição entre as declarações do arquivo
+
+    def __getattr__(self, name):
+        # Só chamado para atributos ausentes: `body` enquanto não foi construído
+        if name != "body":
+            raise AttributeError(name)
+        return self._unit.materialize(self)
+
+
+# Visitantes despacham um LazyFunDecl como fun_decl (ver ast.dispatch_table)
+NODE_METHODS[LazyFunDecl] = NODE_METHODS[FunDecl]
+
+
+def signature(decl):
+    """Assinatura no formato de SemanticAnalyzer.functions."""
+    return (decl.type, [param.type for param in decl.params])
+
+
+class _SignatureAnalyzer(SemanticAnalyzer):
+    """Análise do esqueleto: funções entram só pela assinatura."""
+
+    def visit_fun_decl(self, node):
+        if node.name in self.functions:
+            self.error(f"Função '{node.name}' já declarada.")
+        for param in node.params:
+            if is_array(param.type) and param.type != "int[]":
+                self.error(f"Parâmetro vetor '{param.name}' deve ser do tipo 'int[]'.")
+        self.functions[node.name] = signature(node)
+
+
+class LazyUnit:
+    """
+    Um arquivo compilado sob demanda: código-fonte, declarações do esqueleto
+    e o intervalo de cada corpo. `materialized` lista as funções construídas,
+    na ordem em que foram pedidas.
+    """
+
+    def __init__(self, source, interner, strict=False, exports=None):
+        self.source = source
+        self.interner = interner  # compartilhado por todos os corpos do arquivo
+        self.strict = strict
+        self.exports = exports or {}  # texto do import -> assinaturas exportadas
+        self.declarations = []
+        self.spans = {}  # id do LazyFunDecl -> (início da declaração, fim do corpo)
+        self.materialized = []
+
+    def materialize(self, decl):
+        """Lê, transforma e verifica o corpo de `decl`; devolve o Block."""
+        from .parser import parse_source
+        from .transformer import MicroCTransformer
+
+        start, end = self.spans[id(decl)]
+        # Quebras de linha e espaços antes do trecho dão ao Lark as mesmas
+        # posições que ele teria no arquivo inteiro
+        lines = self.source.count("\n", 0, start)
+        column = start - self.source.rfind("\n", 0, start) - 1
+        tree = parse_source("\n" * lines + " " * column + self.source[start:end])
+        if not tree:
+            raise Exception("Erro de sintaxe.")
+        fun = MicroCTransformer(self.interner).transform(tree).declarations[0]
+
+        analyzer = SemanticAnalyzer()
+        for previous in self.declarations[:decl._index]:
+            if isinstance(previous, ImportDecl):
+                analyzer.functions.update(self.exports.get(previous.path, {}))
+            elif isinstance(previous, FunDecl):
+                analyzer.functions[previous.name] = signature(previous)
+            elif isinstance(previous, ArrayDecl):
+                analyzer.env.set(previous.name, ArrayType(previous.type, previous.size))
+            else:
+                analyzer.env.set(previous.name, previous.type)
+
+        # A partir daqui o nó é um FunDecl comum, também se a verificação falhar
+        decl.body = fun.body
+        decl.__class__ = FunDecl
+        del decl._unit, decl._index
+        del self.spans[id(decl)]
+        self.materialized.append(decl.name)
+        try:
+            analyzer.visit_program(Program([fun]))
+        except Exception as e:
+            if self.strict:
+                raise
+            print(f"Erro semântico: {e}")
+        return decl.body
+
+
+def scan(source):
+    """
+    Intervalos das funções de nível superior: lista de (início da declaração,
+    abertura do corpo, fim do corpo). Texto desbalanceado é deixado para o
+    parser do esqueleto acusar.
+    """
+    spans = []
+    search = _STRUCTURE.search
+    start = _SPACE.match(source, 0).end()
+    depth, opening = 0, None
+    match = search(source, start)
+    while match:
+        char = match.group()
+        pos = match.end()
+        if char == ";" and depth == 0:
+            start = _SPACE.match(source, pos).end()
+        elif char == "{":
+            if depth == 0:
+                opening = match.start()
+            depth += 1
+        elif char == "}":
+            if depth == 0:
+                break
+            depth -= 1
+            if depth == 0:
+                spans.append((start, opening, pos))
+                start = _SPACE.match(source, pos).end()
+        match = search(source, pos)
+    return spans
+
+
+def skeleton(source, spans):
+    """`source` com o conteúdo dos corpos trocado por espaços, nas mesmas posições."""
+    parts, last = [], 0
+    for _, opening, end in spans:
+        body = source[opening + 1:end - 1]
+        newlines = body.count("\n")
+        tail = len(body) - body.rfind("\n") - 1 if newlines else len(body)
+        parts.append(source[last:opening + 1])
+        parts.append("\n" * newlines + " " * tail)
+        last = end - 1
+    parts.append(source[last:])
+    return "".join(parts)
+
+
+def calls(node):
+    """Nomes das funções chamadas dentro de `node`."""
+    names = []
+    seen = set()
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        # Nós compartilhados (ver interning.py) nunca contêm chamadas
+        if current.structural_hash is not None or id(current) in seen:
+            continue
+        seen.add(id(current))
+        if isinstance(current, FunctionCall):
+            names.append(current.name)
+        for value in vars(current).values():
+            if isinstance(value, list):
+                stack.extend(v for v in value if isinstance(v, ASTNode))
+            elif isinstance(value, ASTNode):
+                stack.append(value)
+    return names
+
+
+def reachable(program, entry="main"):
+    """
+    Constrói os corpos de todas as funções alcançáveis a partir de `entry`
+    e dos inicializadores de globais. Retorna os nomes alcançados.
+    """
+    functions = {decl.name: decl for decl in program.declarations if isinstance(decl, FunDecl)}
+    pending = [entry]
+    for decl in program.declarations:
+        if isinstance(decl, VarDecl) and decl.initializer is not None:
+            pending.extend(calls(decl.initializer))
+    seen, order = set(), []
+    while pending:
+        name = pending.pop()
+        decl = functions.get(name)
+        if decl is None or name in seen:
+            continue
+        seen.add(name)
+        order.append(name)
+        pending.extend(reversed(calls(decl.body)))
+    return order
+
+
+def compile_lazy(source, strict=False, path=None, modules=None, entry="main"):
+    """
+    Como eval.compile_source, mas os corpos das funções ficam para depois.
+    Com `entry`, as funções alcançáveis a partir dela são construídas e
+    verificadas já aqui (erros aparecem antes da execução); com entry=None,
+    cada uma é construída na primeira chamada.
+    """
+    import os
+    from .parser import parse_source
+    from .transformer import MicroCTransformer
+
+    spans = scan(source)
+    tree = parse_source(skeleton(source, spans))
+    if not tree:
+        raise Exception("Erro de sintaxe.")
+    transformer = MicroCTransformer()
+    program = transformer.transform(tree)
+
+    imports = None
+    if any(isinstance(decl, ImportDecl) for decl in program.declarations):
+        from .modules import ModuleCompiler
+        modules = modules if modules is not None else ModuleCompiler()
+        base_dir = os.path.dirname(os.path.abspath(path)) if path else os.getcwd()
+        imports = modules.imports_for(program, base_dir)
+
+    unit = LazyUnit(source, transformer.interner, strict, {text: module.exports for text, module in (imports or {}).items()})
+    functions = iter(spans)
+    for index, decl in enumerate(program.declarations):
+        if isinstance(decl, FunDecl):
+            lazy = LazyFunDecl(decl.type, decl.name, decl.params, unit, index)
+            lazy.line, lazy.column = decl.line, decl.column
+            start, _, end = next(functions)
+            unit.spans[id(lazy)] = (start, end)
+            program.declarations[index] = decl = lazy
+        unit.declarations.append(decl)
+
+    analyzer = _SignatureAnalyzer(imports=unit.exports)
+    try:
+        analyzer.visit_program(program)
+    except Exception as e:
+        if strict:
+            raise
+        print(f"Erro semântico: {e}")
+
+    if imports is not None:
+        program = modules.link(program, imports, os.path.abspath(path) if path else None)
+    if entry is not None:
+        reachable(program, entry)
+    return program
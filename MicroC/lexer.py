@@ -0,0 +1,237 @@
+"""
+Tokenizador em streaming para MicroC.
+
+Trabalha direto sobre bytes (em geral um arquivo mapeado com mmap), sem ler
+o arquivo inteiro para uma string, e produz os tokens sob demanda como tuplas
+compactas `(tipo, início, fim, linha)`:
+
+- tipo: índice em TOKEN_TYPES (ex.: TOKEN_TYPES[tipo] == "ID");
+- início/fim: deslocamentos em bytes; o texto é `dados[início:fim]`;
+- linha: linha do início do token, a partir de 1.
+
+Já os Tokens do `StreamingLexer` (e portanto as posições de `parse_file`)
+usam deslocamentos e colunas em caracteres, como o lexer do Lark sobre a
+string: depois de um comentário com acentos continuam iguais aos de
+`parse_source`. As colunas dos erros de sintaxe também contam caracteres.
+
+Os terminais, a ordem de prioridade e o tratamento de palavras-chave (ex.:
+"if" casa com ID mas vira IF) são os mesmos do lexer do Lark, derivados da
+gramática. `StreamingLexer` adapta o tokenizador como lexer do parser Lark,
+escolhendo os terminais aceitos em cada estado como o lexer contextual.
+"""
+
+import mmap
+import re
+from contextlib import contextmanager
+
+from lark import Lark, Token
+from lark.exceptions import UnexpectedCharacters
+from lark.lexer import Lexer, PatternStr
+
+from .parser import GRAMMAR, parser
+
+
+def _has_newline(regexp):
+    # Mesmo critério do Lark para terminais que podem conter quebras de linha
+    return '\n' in regexp or '\\n' in regexp or '\\s' in regexp or '[^' in regexp or ('(?s' in regexp and '.' in regexp)
+
+
+TERMINALS = {t.name: t for t in parser.lexer_conf.terminals}
+TOKEN_TYPES = tuple(TERMINALS)
+TOKEN_IDS = {name: i for i, name in enumerate(TOKEN_TYPES)}
+IGNORED = frozenset(TOKEN_IDS[name] for name in parser.lexer_conf.ignore)
+NEWLINE_TYPES = frozenset(
+    TOKEN_IDS[t.name] for t in TERMINALS.values() if _has_newline(t.pattern.to_regexp())
+)
+
+
+class Scanner:
+    """
+    Reconhece um conjunto de terminais com uma única regex sobre bytes.
+
+    Como no Lark, as alternativas seguem (prioridade, largura máxima,
+    tamanho do padrão, nome) e a primeira que casa vence. Terminais string
+    que também casam com um terminal regex (palavras-chave e ID) saem da
+    regex e são resolvidos pelo texto do token (`keywords`).
+    """
+
+    def __init__(self, names):
+        terminals = [TERMINALS[name] for name in names]
+        strings = [t for t in terminals if isinstance(t.pattern, PatternStr)]
+        self.keywords = {}  # id do terminal regex -> {texto: id da palavra-chave}
+        embedded = set()
+        for t in terminals:
+            if isinstance(t.pattern, PatternStr):
+                continue
+            regexp = re.compile(t.pattern.to_regexp())
+            found = {}
+            for s in strings:
+                if s.priority <= t.priority and regexp.fullmatch(s.pattern.value):
+                    found[s.pattern.value.encode()] = TOKEN_IDS[s.name]
+                    if s.pattern.flags <= t.pattern.flags:
+                        embedded.add(s.name)
+            if found:
+                self.keywords[TOKEN_IDS[t.name]] = found
+
+        terminals = [t for t in terminals if t.name not in embedded]
+        terminals.sort(key=lambda t: (-t.priority, -t.pattern.max_width, -len(t.pattern.value), t.name))
+        self.names = [t.name for t in terminals]
+        self.regex = re.compile(
+            b"|".join(b"(?P<%s>%s)" % (t.name.encode(), t.pattern.to_regexp().encode()) for t in terminals)
+        )
+
+    def scan(self, data, pos):
+        """Retorna (id do tipo, fim) do token que começa em `pos`, ou None."""
+        m = self.regex.match(data, pos)
+        if m is None:
+            return None
+        type_id = TOKEN_IDS[m.lastgroup]
+        end = m.end()
+        keywords = self.keywords.get(type_id)
+        if keywords is not None:
+            type_id = keywords.get(data[pos:end], type_id)
+        return type_id, end
+
+
+_scanners = {}
+
+
+def _scanner(names):
+    key = frozenset(names)
+    scanner = _scanners.get(key)
+    if scanner is None:
+        scanner = _scanners[key] = Scanner(key)
+    return scanner
+
+
+def _chars(text):
+    # Número de caracteres de um trecho UTF-8 (trechos ASCII não são decodificados)
+    return len(text) if text.isascii() else len(text.decode("utf-8", "replace"))
+
+
+def _unexpected(data, pos, line, line_start, allowed=None, state=None, stream_pos=None):
+    # O Lark monta o contexto do erro a partir de bytes; basta uma janela
+    start = max(pos - 40, 0)
+    window = bytes(data[start:pos + 40])
+    column = _chars(bytes(data[line_start:pos])) + 1
+    error = UnexpectedCharacters(window, pos - start, line, column, allowed=allowed, state=state,
+                                 terminals_by_name=TERMINALS)
+    error.pos_in_stream = pos if stream_pos is None else stream_pos
+    return error
+
+
+def tokenize(data, include_ignored=False):
+    """
+    Gera as tuplas (tipo, início, fim, linha) de `data` (bytes, bytearray,
+    memoryview ou mmap). Espaços e comentários só aparecem com
+    `include_ignored=True`.
+    """
+    scanner = _scanner(TOKEN_TYPES)
+    scan = scanner.scan
+    pos, line, line_start, size = 0, 1, 0, len(data)
+    while pos < size:
+        found = scan(data, pos)
+        if found is None:
+            raise _unexpected(data, pos, line, line_start)
+        type_id, end = found
+        if include_ignored or type_id not in IGNORED:
+            yield type_id, pos, end, line
+        if type_id in NEWLINE_TYPES:
+            text = data[pos:end]
+            newlines = text.count(b"\n")
+            if newlines:
+                line += newlines
+                line_start = pos + text.rindex(b"\n") + 1
+        pos = end
+
+
+@contextmanager
+def map_file(path):
+    """Mapeia o arquivo em memória (somente leitura); arquivos vazios viram b""."""
+    with open(path, "rb") as f:
+        try:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            yield b""  # mmap não aceita arquivos vazios
+            return
+        try:
+            yield data
+        finally:
+            data.close()
+
+
+def tokenize_file(path, include_ignored=False):
+    """Como `tokenize`, lendo o arquivo por mmap. Gera (tipo, início, fim, linha, texto)."""
+    with map_file(path) as data:
+        for type_id, start, end, line in tokenize(data, include_ignored):
+            yield type_id, start, end, line, data[start:end].decode("utf-8")
+
+
+class _LexerState:
+    def __init__(self, text):
+        self.text = text
+
+
+class StreamingLexer(Lexer):
+    """
+    Lexer do Lark que lê bytes/mmap com os Scanners deste módulo. Em cada
+    estado do parser só os terminais aceitos ali (mais os ignorados) são
+    considerados, como no lexer contextual padrão.
+    """
+
+    __future_interface__ = True
+
+    def __init__(self, lexer_conf):
+        self.ignore = tuple(lexer_conf.ignore)
+
+    def make_lexer_state(self, text):
+        if isinstance(text, str):
+            text = text.encode("utf-8")
+        return _LexerState(text)
+
+    def lex(self, lexer_state, parser_state):
+        data = lexer_state.text
+        states = parser_state.parse_conf.parse_table.states
+        scanners = {}
+        pos, line, line_start, size = 0, 1, 0, len(data)
+        # Posições dos Tokens em caracteres, como no lexer do Lark
+        char_pos, char_line_start = 0, 0
+        while pos < size:
+            state = parser_state.position
+            scanner = scanners.get(state)
+            if scanner is None:
+                accepts = [name for name in states[state] if name in TERMINALS]
+                scanner = scanners[state] = _scanner(accepts + list(self.ignore))
+            found = scanner.scan(data, pos)
+            if found is None:
+                allowed = {name for name in states[state] if name in TERMINALS}
+                raise _unexpected(data, pos, line, line_start, allowed, parser_state, char_pos)
+            type_id, end = found
+            text = data[pos:end]
+            width = _chars(text)
+            char_end = char_pos + width
+            column = char_pos - char_line_start + 1
+            end_line, end_column = line, column + width
+            if type_id in NEWLINE_TYPES and b"\n" in text:
+                end_line = line + text.count(b"\n")
+                end_column = _chars(text[text.rindex(b"\n") + 1:]) + 1
+            if type_id not in IGNORED:
+                yield Token(TOKEN_TYPES[type_id], text.decode("utf-8"), char_pos, line, column,
+                            end_line, end_column, char_end)
+            if end_line != line:
+                line_start = pos + text.rindex(b"\n") + 1
+                char_line_start = char_end - end_column + 1
+                line = end_line
+            pos, char_pos = end, char_end
+
+
+_streaming_parser = None
+
+
+def streaming_parser():
+    """Parser LALR da gramática MicroC usando o StreamingLexer (criado sob demanda)."""
+    global _streaming_parser
+    if _streaming_parser is None:
+        _streaming_parser = Lark(GRAMMAR, parser='lalr', start='start', lexer=StreamingLexer,
+                                 propagate_positions=True)
+    return _streaming_parser
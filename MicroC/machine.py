@@ -0,0 +1,383 @@
+"""
+Interpretador MicroC com pilhas explícitas.
+
+O Interpreter de eval.py avalia cada nó com uma chamada recursiva do Python,
+então expressões longas (`a + a + ... + a` vira uma cadeia de BinaryOp com a
+profundidade do número de termos) e blocos muito aninhados estouram o limite
+de recursão. Aqui a avaliação é um laço sobre duas pilhas:
+
+- `work`: tarefas pendentes, pares (ação, argumento). Avaliar um nó empilha
+  a ação que o combina e, acima dela, as ações dos filhos na ordem inversa.
+- `values`: resultados das expressões já avaliadas.
+
+Chamadas de função MicroC também não usam a pilha do Python: cada chamada
+empilha um frame em `frames` (uma lista no heap) e o corpo da função na
+mesma pilha de trabalho. Um return descarta de uma vez o trabalho e os valores
+pendentes do frame. Assim a profundidade de recursão deixa de depender do
+limite do Python e passa a ser um orçamento de memória, `max_frames`.
+"""
+
+import operator
+from array import array
+
+from .ast import *
+from .ctx import Environment
+from .erros import *
+from .runtime_errors import *
+from .eval import Interpreter, ReturnValue
+
+
+BINARY_OPERATORS = {
+    '+': operator.add,
+    '-': operator.sub,
+    '*': operator.mul,
+    '/': operator.floordiv,
+    '==': lambda left, right: int(left == right),
+    '!=': lambda left, right: int(left != right),
+    '<': lambda left, right: int(left < right),
+    '>': lambda left, right: int(left > right),
+    '<=': lambda left, right: int(left <= right),
+    '>=': lambda left, right: int(left >= right),
+    '&&': lambda left, right: int(bool(left) and bool(right)),
+    '||': lambda left, right: int(bool(left) or bool(right)),
+}
+
+
+# Frames permitidos por padrão (cada um ocupa algumas centenas de bytes)
+DEFAULT_MAX_FRAMES = 1_000_000
+
+
+class StackInterpreter(Interpreter):
+    """
+    Interpretador sem recursão por nó nem por chamada. Tem a mesma interface
+    e semântica do Interpreter (limites de passos e profundidade, sinks de
+    saída). `max_frames` limita a pilha de chamadas MicroC (None: sem limite);
+    estourá-lo gera CallDepthError, como `max_depth`.
+    """
+
+    def __init__(self, program, max_frames=DEFAULT_MAX_FRAMES, **options):
+        self.work = []
+        self.values = []
+        # Frame: (escopo, função e tamanhos de work/values do chamador)
+        self.frames = []
+        self.max_frames = max_frames
+        self._actions = dispatch_table(self, "_")
+        super().__init__(program, **options)
+        limits = [limit for limit in (self.max_depth, max_frames) if limit is not None]
+        self.frame_limit = min(limits) if limits else None
+
+    # ---------------------------------------------------------------- laço
+
+    def _push(self, node):
+        self.work.append((self._actions[type(node)], node))
+
+    def _run(self, nodes, env, call=None):
+        """
+        Executa `nodes` em `env` (ou a chamada `call` = (função, args)) até
+        esvaziar a pilha de trabalho. Só há um _run ativo por entrada vinda do
+        Python; as chamadas MicroC dentro dele não criam outro.
+        """
+        saved = self.work, self.values, self.frames, self.env
+        work = self.work = []
+        self.values = []
+        self.frames = []
+        self.env = env
+        try:
+            for node in reversed(nodes):
+                self._push(node)
+            if call is not None:
+                self._enter(*call)
+            pop = work.pop
+            while work:
+                action, arg = pop()
+                action(arg)
+            return self.values.pop() if self.values else None
+        finally:
+            self.work, self.values, self.frames, self.env = saved
+
+    def _eval_block(self, block, env):
+        # Corpo de main: os statements executam direto no escopo recebido
+        self._run(block.statements, env)
+
+    def _call_function(self, name, args, node=None):
+        # Entrada vinda do Python (ex.: run com outra função de entrada)
+        func = self._lookup_function(name, len(args))
+        return self._run((), self.env, (func, list(args), node))
+
+    def _execute(self, node):
+        self._run([node], self.env)
+
+    def _evaluate(self, node):
+        return self._run([node], self.env)
+
+    visit_var_decl = visit_array_decl = visit_block = visit_expr_stmt = _execute
+    visit_if_stmt = visit_while_stmt = visit_for_stmt = visit_return_stmt = _execute
+    visit_assignment = visit_compound_assignment = visit_increment = _evaluate
+    visit_array_assignment = visit_binary_op = visit_unary_op = _evaluate
+    visit_function_call = visit_print_call = visit_variable = _evaluate
+    visit_array_index = visit_int_literal = visit_bool_literal = _evaluate
+
+    def _tick(self, node):
+        # Um passo do orçamento por volta de laço, como no Interpreter
+        self.fuel -= 1
+        if self.fuel < 0:
+            self._refuel(node)
+
+    def _discard(self, _):
+        self.values.pop()
+
+    def _restore_env(self, env):
+        self.env = env
+
+    # ---------------------------------------------------------------- expressões
+
+    def _literal(self, node):
+        self.values.append(node.value)
+
+    _int_literal = _bool_literal = _literal
+
+    def _variable(self, node):
+        self.values.append(self.env.get(node.name))
+
+    def _binary_op(self, node):
+        work = self.work
+        work.append((self._apply_binary, node))
+        self._push(node.right)
+        self._push(node.left)
+
+    def _apply_binary(self, node):
+        values = self.values
+        right = values.pop()
+        fn = BINARY_OPERATORS.get(node.operator)
+        if fn is None:
+            raise Exception(f"Operador binário não suportado: {node.operator}")
+        values[-1] = fn(values[-1], right)
+
+    def _unary_op(self, node):
+        self.work.append((self._apply_unary, node))
+        self._push(node.operand)
+
+    def _apply_unary(self, node):
+        values = self.values
+        if node.operator == '!':
+            values[-1] = int(not bool(values[-1]))
+        elif node.operator == '-':
+            values[-1] = -values[-1]
+        elif node.operator != '+':
+            raise Exception(f"Operador unário não suportado: {node.operator}")
+
+    def _assignment(self, node):
+        self.work.append((self._store, node))
+        self._push(node.value)
+
+    def _store(self, node):
+        self.env.update(node.name, self.values[-1])
+
+    def _compound_assignment(self, node):
+        self.work.append((self._apply_compound, node))
+        self._push(node.value)
+
+    def _apply_compound(self, node):
+        fn = BINARY_OPERATORS.get(node.operator)
+        if fn is None:
+            raise Exception(f"Operador de atribuição não suportado: {node.operator}=")
+        scope = self.env.resolve(node.name)
+        result = scope[node.name] = fn(scope[node.name], self.values[-1])
+        self.values[-1] = result
+
+    def _increment(self, node):
+        scope = self.env.resolve(node.name)
+        old = scope[node.name]
+        new = scope[node.name] = old + 1 if node.operator == '++' else old - 1
+        self.values.append(new if node.prefix else old)
+
+    def _array_index(self, node):
+        self.work.append((self._load_element, node))
+        self._push(node.index)
+
+    def _load_element(self, node):
+        values = self.env.get(node.name)
+        index = self.values[-1]
+        if index < 0 or index >= len(values):
+            raise IndexOutOfBoundsError(node.name, index, len(values), node)
+        self.values[-1] = values[index]
+
+    def _array_assignment(self, node):
+        self.work.append((self._store_element, node))
+        self._push(node.value)
+        self._push(node.index)
+
+    def _store_element(self, node):
+        values = self.env.get(node.name)
+        value = self.values.pop()
+        index = self.values[-1]
+        if index < 0 or index >= len(values):
+            raise IndexOutOfBoundsError(node.name, index, len(values), node)
+        try:
+            values[index] = value
+        except OverflowError:
+            raise MicroCRuntimeError(f"Valor {value} não cabe em um elemento de '{node.name}' (64 bits).", node)
+        self.values[-1] = value
+
+    def _function_call(self, node):
+        self.work.append((self._call, node))
+        for arg in reversed(node.args):
+            self._push(arg)
+
+    def _lookup_function(self, name, count):
+        func = self.functions.get(name)
+        if not func:
+            raise UndefinedFunctionError(name)
+        if count != len(func.params):
+            raise ArgumentCountError(name, len(func.params), count)
+        return func
+
+    def _call(self, node):
+        values = self.values
+        count = len(node.args)
+        func = self._lookup_function(node.name, count)
+        args = values[len(values) - count:]
+        del values[len(values) - count:]
+        self._enter(func, args, node)
+
+    def _enter(self, func, args, node):
+        """Empilha o frame da chamada e o corpo da função."""
+        if self.fuel is not None:
+            self.fuel -= 1
+            if self.fuel < 0:
+                self._refuel(node)
+        if self.frame_limit is not None and self.depth >= self.frame_limit:
+            raise CallDepthError(self.frame_limit, node, self.function)
+
+        env = Environment(self.globals)
+        scope = env.vars
+        for param, arg in zip(func.params, args):
+            scope[param.name] = arg
+
+        work = self.work
+        self.frames.append((self.env, self.function, len(work), len(self.values)))
+        work.append((self._leave, None))
+        self.env = env
+        self.function = func.name
+        self.depth += 1
+        for stmt in reversed(func.body.statements):
+            self._push(stmt)
+
+    def _leave(self, value):
+        """Fim da função sem return: devolve None, como o Interpreter."""
+        self.env, self.function, _, _ = self.frames.pop()
+        self.depth -= 1
+        self.values.append(value)
+
+    def _print_call(self, node):
+        self.work.append((self._print, node))
+        self._push(node.expression)
+
+    def _print(self, _):
+        self._write(self.values[-1])
+
+    # ---------------------------------------------------------------- statements
+
+    def _var_decl(self, node):
+        if node.initializer is None:
+            self.env.set(node.name, 0)
+            return
+        self.work.append((self._declare, node))
+        self._push(node.initializer)
+
+    def _declare(self, node):
+        self.env.set(node.name, self.values.pop())
+
+    def _array_decl(self, node):
+        self.env.set(node.name, array('q', bytes(8 * node.size)))
+
+    def _block(self, node):
+        # Blocos sem declarações não precisam de escopo próprio
+        if self._needs_scope(node):
+            self.work.append((self._restore_env, self.env))
+            self.env = Environment(self.env)
+        for stmt in reversed(node.statements):
+            self._push(stmt)
+
+    def _expr_stmt(self, node):
+        self.work.append((self._discard, None))
+        self._push(node.expression)
+
+    def _if_stmt(self, node):
+        self.work.append((self._branch, node))
+        self._push(node.condition)
+
+    def _branch(self, node):
+        if self.values.pop():
+            self._push(node.then_stmt)
+        elif node.else_stmt:
+            self._push(node.else_stmt)
+
+    def _while_stmt(self, node):
+        self.work.append((self._while_test, node))
+        self._push(node.condition)
+
+    def _while_test(self, node):
+        if not self.values.pop():
+            return
+        work = self.work
+        work.append((self._while_stmt, node))
+        if self.fuel is not None:
+            work.append((self._tick, node))
+        self._push(node.body)
+
+    def _for_stmt(self, node):
+        # A inicialização do for tem escopo próprio (se declarar algo)
+        work = self.work
+        if self._needs_scope(node):
+            work.append((self._restore_env, self.env))
+            self.env = Environment(self.env)
+        work.append((self._for_next, node))
+        if isinstance(node.init, VarDecl):
+            self._push(node.init)
+        elif node.init is not None:
+            work.append((self._discard, None))
+            self._push(node.init)
+
+    def _for_next(self, node):
+        if node.condition is None:
+            self._for_body(node)
+            return
+        self.work.append((self._for_test, node))
+        self._push(node.condition)
+
+    def _for_test(self, node):
+        if self.values.pop():
+            self._for_body(node)
+
+    def _for_body(self, node):
+        # Empilhado ao contrário: corpo, passo do orçamento, atualização, próximo teste
+        work = self.work
+        work.append((self._for_next, node))
+        if node.update is not None:
+            work.append((self._discard, None))
+            self._push(node.update)
+        if self.fuel is not None:
+            work.append((self._tick, node))
+        self._push(node.body)
+
+    def _return_stmt(self, node):
+        if node.expression is None:
+            self._return_value(0)
+            return
+        self.work.append((self._return, node))
+        self._push(node.expression)
+
+    def _return(self, _):
+        self._return_value(self.values.pop())
+
+    def _return_value(self, value):
+        if not self.frames:
+            # return de main (ou de um statement executado avulso)
+            raise ReturnValue(value)
+        # Descarta o que restava do frame: laços, blocos e operandos pendentes
+        self.env, self.function, work_size, values_size = self.frames.pop()
+        del self.work[work_size:]
+        del self.values[values_size:]
+        self.depth -= 1
+        self.values.append(value)
@@ -0,0 +1,175 @@
+"""
+Uso de memória por fase do pipeline (`--mem-report`).
+
+Executa leitura, parse (CST do Lark), transformação (AST), análise semântica
+e execução (as fases de pipeline.Pipeline) com o tracemalloc ligado e, para
+cada fase, registra:
+
+- pico: maior quantidade de memória alocada durante a fase, acima do que já
+  estava alocado quando ela começou;
+- retido: quanto a memória alocada cresceu do começo ao fim da fase (o que o
+  resultado dela ocupa e segue vivo para as fases seguintes);
+- objetos vivos no fim da fase, por tipo: cada classe de nó da AST,
+  Environment, Token e Tree do Lark (contados pelo gc, descontando os que
+  já existiam antes do pipeline, como a gramática do parser).
+
+Como no pipeline normal, a CST é descartada logo depois da transformação:
+ela aparece retida em "parse" e já não ocupa memória nas fases seguintes.
+Os números de "transformação" são os da AST com a CST ainda viva. Com o
+front-end sob demanda (`lazy`), parse, transformação e análise viram uma
+fase só, "front-end", como em pipeline.Pipeline.
+"""
+
+import gc
+import json
+import time
+import tracemalloc
+from dataclasses import dataclass, field, asdict
+
+from lark import Token, Tree
+
+from .ast import *
+from .ctx import Environment
+from .eval import interpreter_class
+from .pipeline import Pipeline, PhaseHook
+
+
+@dataclass
+class PhaseMemory:
+    """Memória e objetos de uma fase do pipeline."""
+    name: str
+    peak: int = 0  # bytes acima do início da fase
+    retained: int = 0  # bytes (negativo se a fase liberou memória)
+    duration: float = 0.0  # segundos, com o tracemalloc ligado
+    objects: dict = field(default_factory=dict)  # tipo -> objetos vivos no fim da fase
+
+
+class MemoryReport:
+    """Relatório produzido por `memory_report`."""
+
+    def __init__(self, phases, result=None, error=None):
+        self.phases = phases
+        self.result = result  # valor retornado por main
+        self.error = error  # mensagem do erro que interrompeu o pipeline
+
+    def phase(self, name):
+        for phase in self.phases:
+            if phase.name == name:
+                return phase
+        raise KeyError(name)
+
+    @property
+    def peak(self):
+        """Maior pico entre as fases."""
+        return max((phase.peak for phase in self.phases), default=0)
+
+    def to_dict(self):
+        return {
+            "phases": [asdict(phase) for phase in self.phases],
+            "error": self.error,
+        }
+
+    def dump_json(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def format_table(self, max_types=8):
+        lines = [f"{'fase':<14} {'pico(KiB)':>12} {'retido(KiB)':>12} {'tempo(ms)':>10}  objetos vivos"]
+        for phase in self.phases:
+            ranked = sorted(phase.objects.items(), key=lambda item: item[1], reverse=True)
+            objects = ", ".join(f"{name}={count}" for name, count in ranked[:max_types])
+            lines.append(
+                f"{phase.name:<14} {phase.peak / 1024:>12.1f} {phase.retained / 1024:>12.1f} "
+                f"{phase.duration * 1000:>10.1f}  {objects or '-'}"
+            )
+        if self.error is not None:
+            lines.append(f"Interrompido: {self.error}")
+        return "\n".join(lines)
+
+
+def count_objects():
+    """Objetos vivos rastreados pelo gc: nome do tipo -> quantidade."""
+    labels = {}  # classe -> nome no relatório, ou None se não é contada
+    counts = {}
+    for obj in gc.get_objects():
+        cls = type(obj)
+        label = labels.get(cls, False)
+        if label is False:
+            if issubclass(cls, (ASTNode, Environment, Token, Tree)):
+                label = cls.__name__
+            else:
+                label = None
+            labels[cls] = label
+        if label is not None:
+            counts[label] = counts.get(label, 0) + 1
+    return counts
+
+
+class _MemoryHook(PhaseHook):
+    """Mede cada fase do Pipeline com o tracemalloc já ligado."""
+
+    def __init__(self):
+        self.phases = []
+        gc.collect()
+        self.baseline = count_objects()
+        self._start = 0
+
+    def phase_started(self, name):
+        gc.collect()
+        self._start, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        self.phases.append(PhaseMemory(name))
+
+    def phase_finished(self, name, elapsed):
+        current, peak = tracemalloc.get_traced_memory()
+        phase = self.phases[-1]
+        phase.duration = elapsed
+        phase.peak = peak - self._start
+        phase.retained = current - self._start
+        # Contar aloca a lista do gc: fica fora das medidas acima
+        counts = count_objects()
+        phase.objects = {
+            name: counts.get(name, 0) - self.baseline.get(name, 0)
+            for name in counts.keys() | self.baseline.keys()
+            if counts.get(name, 0) != self.baseline.get(name, 0)
+        }
+
+
+def _read(path):
+    with open(path, "r") as f:
+        return f.read()
+
+
+def memory_report(source=None, path=None, engine="tree", output=None, lazy=False, **options):
+    """
+    Executa o pipeline medindo a memória de cada fase e retorna o
+    MemoryReport. Sem `source`, o código é lido de `path` (fase "leitura").
+    Um erro em qualquer fase depois da leitura (inclusive MemoryError)
+    interrompe o pipeline e fica em `report.error`; as fases até ali
+    continuam no relatório.
+    `options` vão para o construtor do interpretador de `engine`.
+    """
+    # Módulos (a tabela do parser, o engine) carregados antes de medir
+    from . import parser, semantic, transformer
+    if lazy:
+        from .lazy import compile_lazy
+    interpreter_class(engine)
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start()
+    hook = _MemoryHook()
+    pipeline = Pipeline(hooks=[hook])
+    result = error = None
+    try:
+        if source is None:
+            # Arquivo inexistente não é uma fase interrompida: propaga o OSError
+            source = pipeline.phase("leitura", _read, path)
+        try:
+            ast = pipeline.compile(source, strict=True, path=path, lazy=lazy)
+            result = pipeline.execute(ast, engine, output=output, **options)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+    finally:
+        if not was_tracing:
+            tracemalloc.stop()
+    return MemoryReport(hook.phases, result, error)
@@ -0,0 +1,313 @@
+"""
+Compilação separada de programas MicroC em vários arquivos.
+
+Um arquivo pode importar outros no começo:
+
+    import "lib/matematica.mc";
+
+e passa a enxergar as funções declaradas neles (só as do próprio módulo
+importado, não as que ele importa). Variáveis globais não são exportadas,
+mas continuam existindo para as funções do módulo que as declara.
+
+Cada módulo é compilado sozinho (parse, transformação e análise semântica,
+com as assinaturas dos imports) e o resultado vai para um artefato em
+`__microc_cache__/`, ao lado do arquivo, no formato de serialize.py: a AST
+verificada e as assinaturas exportadas, no formato `(tipo de retorno,
+[tipos dos parâmetros])` de `SemanticAnalyzer.functions`. Numa nova
+compilação o artefato é reaproveitado se o código-fonte do módulo é o mesmo
+e a interface (assinaturas exportadas) de cada import não mudou; assim, mudar
+o corpo de uma função de biblioteca só recompila a biblioteca.
+
+A ligação (`ModuleCompiler.link`) junta as declarações de todos os módulos
+em um único Program, dependências primeiro, e rejeita funções definidas em
+mais de um módulo. As globais de cada módulo importado são renomeadas para
+`caminho::nome` nas declarações e nos corpos das funções do módulo: ficam
+privadas, sem conflito com globais de mesmo nome de outros módulos nem com as
+variáveis de main (que executa no escopo global).
+"""
+
+import hashlib
+import json
+import os
+import struct
+from dataclasses import dataclass, fields, replace
+
+from lark import UnexpectedInput
+
+from .ast import *
+from .erros import SemanticError
+from .parser import parser
+from .semantic import SemanticAnalyzer
+from .serialize import FormatError, ProgramTypes, dump, load
+from .transformer import MicroCTransformer
+
+
+CACHE_DIR = "__microc_cache__"
+ARTIFACT_MAGIC = b"MCMOD"
+ARTIFACT_VERSION = 1
+# Artefato: ARTIFACT_MAGIC, versão, tamanho dos metadados (4 bytes), metadados
+# em JSON e o programa no formato de serialize.py
+_HEADER = struct.Struct(f"<{len(ARTIFACT_MAGIC)}sBI")
+
+
+# Nós que declaram, leem ou escrevem uma variável pelo nome
+_USES = (Variable, Assignment, CompoundAssignment, Increment, ArrayAssignment, ArrayIndex)
+# Nós que abrem um escopo para as declarações dos filhos
+_SCOPES = (FunDecl, Block, ForStmt)
+
+
+class ModuleError(Exception):
+    """Módulo inexistente, importação circular ou conflito na ligação."""
+
+
+def interface_digest(exports):
+    """Digest das assinaturas exportadas por um módulo."""
+    text = json.dumps(exports, sort_keys=True)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class Module:
+    """Um arquivo compilado: AST verificada e o que ele exporta."""
+    path: str  # caminho absoluto
+    source_digest: str  # sha256 do código-fonte
+    imports: dict  # texto do import -> caminho absoluto do módulo
+    interfaces: dict  # caminho de cada import -> interface_digest usado na compilação
+    program: Program
+    types: ProgramTypes  # funções exportadas e globais do módulo
+
+    @property
+    def exports(self):
+        return self.types.functions
+
+
+class ModuleCompiler:
+    """
+    Carrega módulos (do cache ou compilando) e os liga. `cache_dir` troca o
+    diretório `__microc_cache__` ao lado de cada arquivo por um único
+    diretório. `compiled` lista os módulos que precisaram ser recompilados.
+    """
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir
+        self.modules = {}  # caminho absoluto -> Module
+        self.compiled = []
+
+    # ---------------------------------------------------------------- artefatos
+
+    def artifact_path(self, path):
+        name = os.path.splitext(os.path.basename(path))[0] + ".mcm"
+        if self.cache_dir is None:
+            return os.path.join(os.path.dirname(path), CACHE_DIR, name)
+        key = hashlib.sha256(path.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f"{key}-{name}")
+
+    def _read_artifact(self, path):
+        try:
+            with open(self.artifact_path(path), "rb") as f:
+                data = f.read()
+            magic, version, size = _HEADER.unpack_from(data)
+            if magic != ARTIFACT_MAGIC or version != ARTIFACT_VERSION:
+                return None
+            start = _HEADER.size
+            meta = json.loads(data[start:start + size])
+            program, types = load(data[start + size:], types=True)
+            return Module(path, meta["source"], meta["imports"], meta["interfaces"], program, types)
+        except (OSError, struct.error, ValueError, KeyError, FormatError):
+            # Sem artefato ou artefato de outra versão: recompila
+            return None
+
+    def _write_artifact(self, module):
+        meta = json.dumps({
+            "source": module.source_digest,
+            "imports": module.imports,
+            "interfaces": module.interfaces,
+        }).encode("utf-8")
+        data = _HEADER.pack(ARTIFACT_MAGIC, ARTIFACT_VERSION, len(meta)) + meta + dump(module.program, module.types)
+        target = self.artifact_path(module.path)
+        try:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            # Grava em um temporário e renomeia: outro processo nunca lê um artefato pela metade
+            temp = f"{target}.{os.getpid()}.tmp"
+            with open(temp, "wb") as f:
+                f.write(data)
+            os.replace(temp, target)
+        except OSError:
+            pass  # diretório sem permissão de escrita: segue sem cache
+
+    # ---------------------------------------------------------------- módulos
+
+    def load(self, path):
+        """
+        Module do arquivo `path` e de tudo o que ele importa. Cada módulo é
+        recompilado só se o código-fonte dele ou a interface de um import mudou.
+        """
+        return self._load(os.path.abspath(path), ())
+
+    def _load(self, path, chain):
+        module = self.modules.get(path)
+        if module is not None:
+            return module
+        if path in chain:
+            cycle = chain[chain.index(path):] + (path,)
+            raise ModuleError("Importação circular: " + " -> ".join(os.path.basename(p) for p in cycle))
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            raise ModuleError(f"Módulo '{path}' não encontrado.")
+        digest = hashlib.sha256(data).hexdigest()
+        chain += (path,)
+
+        module = self._read_artifact(path)
+        if module is not None and module.source_digest == digest:
+            deps = [self._load(dep, chain) for dep in module.imports.values()]
+            if all(interface_digest(dep.exports) == module.interfaces.get(dep.path) for dep in deps):
+                self.modules[path] = module
+                return module
+
+        module = self._compile(path, data.decode("utf-8"), digest, chain)
+        self.modules[path] = module
+        self.compiled.append(path)
+        self._write_artifact(module)
+        return module
+
+    def _compile(self, path, source, digest, chain):
+        try:
+            tree = parser.parse(source)
+        except UnexpectedInput as e:
+            raise ModuleError(f"Erro de sintaxe em '{os.path.basename(path)}': {e}")
+        program = MicroCTransformer().transform(tree)
+        imports = self._imports(program, os.path.dirname(path), chain)
+
+        analyzer = SemanticAnalyzer(imports={text: module.exports for text, module in imports.items()})
+        try:
+            analyzer.visit_program(program)
+        except SemanticError as e:
+            raise SemanticError(f"{os.path.basename(path)}: {e}") from e
+
+        own = {decl.name for decl in program.declarations if isinstance(decl, FunDecl)}
+        exports = {name: signature for name, signature in analyzer.functions.items() if name in own}
+        return Module(
+            path,
+            digest,
+            {text: module.path for text, module in imports.items()},
+            {module.path: interface_digest(module.exports) for module in imports.values()},
+            program,
+            ProgramTypes(exports, dict(analyzer.env.vars)),
+        )
+
+    def imports_for(self, program, base_dir):
+        """Carrega os módulos importados por `program`: texto do import -> Module."""
+        return self._imports(program, base_dir, ())
+
+    def _imports(self, program, base_dir, chain):
+        imports = {}
+        for decl in program.declarations:
+            if isinstance(decl, ImportDecl):
+                path = os.path.normpath(os.path.join(base_dir, decl.path))
+                imports[decl.path] = self._load(path, chain)
+        return imports
+
+    # ---------------------------------------------------------------- ligação
+
+    def link(self, program, imports, path=None):
+        """
+        Junta `program` (de `path`, se veio de um arquivo) e os módulos de que
+        ele depende, com os `imports` devolvidos por imports_for, em um único
+        Program sem ImportDecl. Cada módulo entra uma vez, depois dos que ele
+        importa, e os inicializadores de globais rodam nessa ordem.
+        """
+        order, seen = [], set()
+        stack = [(module, False) for module in reversed(list(imports.values()))]
+        while stack:
+            module, done = stack.pop()
+            if done:
+                order.append(module)
+                continue
+            if module.path in seen:
+                continue
+            seen.add(module.path)
+            stack.append((module, True))
+            stack.extend((self.modules[dep], False) for dep in reversed(list(module.imports.values())))
+
+        declarations = []
+        owners = {}  # (função ou variável, nome) -> módulo que define
+        units = [(module.path, module.program) for module in order] + [(path, program)]
+        for origin, unit in units:
+            renames = {}
+            if unit is not program:
+                renames = {
+                    decl.name: f"{origin}::{decl.name}" for decl in unit.declarations
+                    if isinstance(decl, (VarDecl, ArrayDecl))
+                }
+            for decl in unit.declarations:
+                if isinstance(decl, ImportDecl):
+                    continue
+                if renames:
+                    decl = rename_globals(decl, renames)
+                key = ("Função" if isinstance(decl, FunDecl) else "Variável", decl.name)
+                if key in owners:
+                    where = [os.path.basename(p) if p else "programa principal" for p in (owners[key], origin)]
+                    raise ModuleError(f"{key[0]} '{decl.name}' definida em {where[0]} e em {where[1]}.")
+                owners[key] = origin
+                declarations.append(decl)
+        return Program(declarations)
+
+    def link_file(self, path):
+        """Carrega o arquivo `path` como módulo e devolve o programa ligado."""
+        module = self.load(path)
+        imports = {text: self.modules[dep] for text, dep in module.imports.items()}
+        return self.link(module.program, imports, module.path)
+
+
+def rename_globals(decl, renames):
+    """
+    Cópia da declaração de nível superior `decl` com as globais de `renames`
+    (nome -> novo nome) trocadas, inclusive nos corpos de funções; variáveis
+    locais e parâmetros de mesmo nome continuam como estão. Subárvores sem
+    mudança (e os nós compartilhados nelas) são reaproveitadas.
+    """
+    scopes = []  # nomes locais de cada escopo aberto
+    values = []  # filhos já reconstruídos
+    # Itens: nó, lista ou None a reconstruir; ("list", n) junta os n valores
+    # do topo; ("node", nó, campos) reconstrói o nó com os filhos do topo
+    work = [decl]
+    while work:
+        item = work.pop()
+        if type(item) is tuple:
+            if item[0] == "list":
+                count = item[1]
+                items = values[len(values) - count:]
+                del values[len(values) - count:]
+                values.append(items)
+                continue
+            _, node, names = item
+            children = values[len(values) - len(names):]
+            del values[len(values) - len(names):]
+            changes = {name: child for name, child in zip(names, children) if child is not getattr(node, name)}
+            name = getattr(node, "name", None)
+            if isinstance(node, (VarDecl, ArrayDecl, Param)) and scopes:
+                scopes[-1].add(name)
+            elif isinstance(node, (VarDecl, ArrayDecl, *_USES)) and name in renames:
+                if not any(name in scope for scope in scopes):
+                    changes["name"] = renames[name]
+            if isinstance(node, _SCOPES):
+                scopes.pop()
+            if changes:
+                copy = replace(node, **changes)
+                copy.line, copy.column = node.line, node.column
+                node = copy
+            values.append(node)
+        elif type(item) is list:
+            work.append(("list", len(item)))
+            work.extend(reversed(item))
+        elif isinstance(item, ASTNode):
+            if isinstance(item, _SCOPES):
+                scopes.append(set())
+            names = [f.name for f in fields(item) if isinstance(getattr(item, f.name), (ASTNode, list, type(None)))]
+            work.append(("node", item, names))
+            work.extend(getattr(item, name) for name in reversed(names))
+        else:
+            values.append(item)
+    return values[0]
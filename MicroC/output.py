@@ -0,0 +1,84 @@
+"""
+Destinos de saída (sinks) para o print do MicroC.
+
+O interpretador entrega cada valor impresso a `sink.write(valor)`. Os sinks
+abaixo acumulam a saída em memória e escrevem em blocos, de modo que
+programas que imprimem muito não pagam uma escrita no stream por print.
+"""
+
+import sys
+
+
+class OutputSink:
+    """Interface dos sinks de saída."""
+
+    def write(self, value):
+        raise NotImplementedError
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.flush()
+
+
+class BufferedWriter(OutputSink):
+    """
+    Formata cada valor como o print do Python (uma linha por valor) e escreve
+    em `stream` quando o buffer passa de `flush_size` caracteres.
+
+    Sem `stream`, usa o `sys.stdout` vigente no momento da descarga (o que
+    mantém funcionando `contextlib.redirect_stdout`).
+    """
+
+    def __init__(self, stream=None, flush_size=64 * 1024):
+        self.stream = stream
+        self.flush_size = flush_size
+        self.parts = []
+        self.size = 0
+
+    def write(self, value):
+        text = f"{value}\n"
+        self.parts.append(text)
+        self.size += len(text)
+        if self.size >= self.flush_size:
+            self.flush()
+
+    def flush(self):
+        if not self.parts:
+            return
+        stream = self.stream if self.stream is not None else sys.stdout
+        stream.write("".join(self.parts))
+        self.parts = []
+        self.size = 0
+
+
+class FileWriter(BufferedWriter):
+    """BufferedWriter que escreve em um arquivo, dado por caminho ou descritor."""
+
+    def __init__(self, target, flush_size=64 * 1024):
+        # Descritores recebidos não são fechados por nós
+        closefd = not isinstance(target, int)
+        super().__init__(open(target, "w", encoding="utf-8", closefd=closefd), flush_size)
+
+    def flush(self):
+        super().flush()
+        self.stream.flush()
+
+    def close(self):
+        super().close()
+        self.stream.close()
+
+
+class ListCollector(OutputSink):
+    """Guarda os valores impressos (sem formatar) em `values`."""
+
+    def __init__(self):
+        self.values = []
+        self.write = self.values.append
+
+    def drain(self):
+        """Retorna os valores acumulados e esvazia o coletor."""
+        values = self.values[:]
+        del self.values[:]
+        return values
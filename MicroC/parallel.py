@@ -0,0 +1,249 @@
+"""
+Execução fork-join de chamadas puras independentes (`--engine parallel`).
+
+Em `fib(n - 1) + fib(n - 2)` as duas chamadas não dependem uma da outra:
+nenhuma imprime nem escreve em variáveis que a outra lê. O
+ParallelInterpreter executa essas expressões em dois processos: um filho
+(os.fork) calcula o operando da direita enquanto o processo atual calcula o
+da esquerda, e o resultado do filho volta por um pipe.
+
+Uma função é pura se não tem print, não escreve em globais nem em vetores
+recebidos como parâmetro e só chama funções puras (análise sobre o programa
+todo, em `pure_functions`). Um BinaryOp é paralelizável se os dois operandos
+são expressões puras (sem atribuições, incrementos ou print, e só com
+chamadas de funções puras) e ambos chamam alguma função; && e || ficam de
+fora por causa do curto-circuito.
+
+O resultado é sempre o da execução sequencial:
+
+- O filho trabalha sobre uma cópia do estado (fork) e não tem efeitos
+  visíveis; o pai calcula o operando da esquerda primeiro, como na ordem
+  sequencial. Se ele falhar, o filho é encerrado e o erro segue normalmente.
+- Se o filho falhar (erro de execução, limite de profundidade), o pai refaz
+  o operando da direita sequencialmente, o que reproduz o mesmo erro.
+- Com `max_steps` não há paralelismo: o orçamento de passos é contado como
+  na execução sequencial.
+
+Granularidade: só se divide uma expressão até a profundidade de chamadas
+`cutoff` (as mais próximas da raiz da recursão, que têm mais trabalho) e se
+houver um dos `workers - 1` slots livres, compartilhados por todos os
+processos por um semáforo; sem slot, a expressão é avaliada ali mesmo. Um
+slot liberado é usado pelo primeiro processo que chegar a um ponto de divisão.
+"""
+
+import os
+import pickle
+import signal
+from multiprocessing import Semaphore
+
+from .ast import *
+from .eval import Interpreter
+from .machine import BINARY_OPERATORS
+
+
+DEFAULT_CUTOFF = 8
+# Marca de saída de escopo na pilha de _function_effects
+_POP = object()
+
+
+def _function_effects(func):
+    """
+    (tem efeitos colaterais, funções chamadas) de uma função. Escritas são
+    resolvidas pelo escopo léxico: só variáveis e vetores locais podem mudar.
+    """
+    calls = set()
+    # Pilha de escopos: nome -> "local" ou "param" (vetor recebido do chamador)
+    scopes = [{param.name: "param" if param.type.endswith("[]") else "local" for param in func.params}]
+
+    def writes_outside(name, element=False):
+        for scope in reversed(scopes):
+            if name in scope:
+                return element and scope[name] == "param"
+        return True  # global
+
+    def expression_effects(node):
+        pending = [node]
+        while pending:
+            current = pending.pop()
+            if current is None:
+                continue
+            if isinstance(current, PrintCall):
+                return True
+            if isinstance(current, (Assignment, CompoundAssignment, Increment)) and writes_outside(current.name):
+                return True
+            if isinstance(current, ArrayAssignment) and writes_outside(current.name, element=True):
+                return True
+            if isinstance(current, FunctionCall):
+                calls.add(current.name)
+            pending.extend(expression_children(current))
+        return False
+
+    work = list(reversed(func.body.statements))
+    while work:
+        stmt = work.pop()
+        if stmt is None:
+            continue
+        if stmt is _POP:
+            scopes.pop()
+        elif isinstance(stmt, VarDecl):
+            if stmt.initializer is not None and expression_effects(stmt.initializer):
+                return True, calls
+            scopes[-1][stmt.name] = "local"
+        elif isinstance(stmt, ArrayDecl):
+            scopes[-1][stmt.name] = "local"
+        elif isinstance(stmt, Block):
+            scopes.append({})
+            work.append(_POP)
+            work.extend(reversed(stmt.statements))
+        elif isinstance(stmt, ForStmt):
+            # Inicialização, condição e atualização em um escopo próprio
+            scopes.append({})
+            work.append(_POP)
+            work.extend([stmt.body, ExprStmt(stmt.update) if stmt.update else None,
+                         ExprStmt(stmt.condition) if stmt.condition else None])
+            if isinstance(stmt.init, VarDecl):
+                work.append(stmt.init)
+            elif stmt.init is not None:
+                work.append(ExprStmt(stmt.init))
+        elif isinstance(stmt, IfStmt):
+            if expression_effects(stmt.condition):
+                return True, calls
+            work.extend([stmt.else_stmt, stmt.then_stmt])
+        elif isinstance(stmt, WhileStmt):
+            if expression_effects(stmt.condition):
+                return True, calls
+            work.append(stmt.body)
+        elif isinstance(stmt, ExprStmt):
+            if expression_effects(stmt.expression):
+                return True, calls
+        elif isinstance(stmt, ReturnStmt):
+            if stmt.expression is not None and expression_effects(stmt.expression):
+                return True, calls
+    return False, calls
+
+
+def pure_functions(program):
+    """Nomes das funções de `program` sem efeitos colaterais visíveis."""
+    functions = {decl.name: decl for decl in program.declarations if isinstance(decl, FunDecl)}
+    pure, callers = set(), {}
+    for name, func in functions.items():
+        effects, calls = _function_effects(func)
+        if not effects:
+            pure.add(name)
+        for callee in calls:
+            callers.setdefault(callee, set()).add(name)
+    # Quem chama uma função impura (ou inexistente) também é impuro
+    pending = [name for name in callers if name not in pure]
+    while pending:
+        name = pending.pop()
+        for caller in callers.get(name, ()):
+            if caller in pure:
+                pure.discard(caller)
+                pending.append(caller)
+    return pure
+
+
+def _pure_calls(node, pure):
+    """Quantas chamadas a expressão faz, ou None se ela tem efeitos colaterais."""
+    count = 0
+    pending = [node]
+    while pending:
+        current = pending.pop()
+        if isinstance(current, (Assignment, CompoundAssignment, Increment, ArrayAssignment, PrintCall)):
+            return None
+        if isinstance(current, FunctionCall):
+            if current.name not in pure:
+                return None
+            count += 1
+        pending.extend(expression_children(current))
+    return count
+
+
+def forkable_operations(program, pure=None):
+    """ids dos BinaryOp de `program` cujos operandos podem rodar em paralelo."""
+    pure = pure_functions(program) if pure is None else pure
+    found = set()
+    pending = [program]
+    while pending:
+        node = pending.pop()
+        if isinstance(node, BinaryOp) and node.operator in BINARY_OPERATORS and node.operator not in ('&&', '||'):
+            if _pure_calls(node.left, pure) and _pure_calls(node.right, pure):
+                found.add(id(node))
+        for value in vars(node).values():
+            if isinstance(value, list):
+                pending.extend(v for v in value if isinstance(v, ASTNode))
+            elif isinstance(value, ASTNode):
+                pending.append(value)
+    return found
+
+
+class ParallelInterpreter(Interpreter):
+    """
+    Interpreter que divide expressões puras entre processos. `workers` é o
+    número de processos que podem executar ao mesmo tempo (padrão: número de
+    CPUs) e `cutoff` a profundidade de chamadas até a qual se divide.
+    """
+
+    def __init__(self, program, workers=None, cutoff=DEFAULT_CUTOFF, **options):
+        super().__init__(program, **options)
+        self.workers = workers if workers is not None else os.cpu_count() or 1
+        self.cutoff = cutoff
+        self.call_depth = 0
+        self.forks = 0  # divisões feitas por este processo
+        self._forkable = forkable_operations(program) if hasattr(os, "fork") and self.workers > 1 else set()
+        self._slots = Semaphore(self.workers - 1) if self._forkable else None
+        if not self._forkable:
+            # Nada a dividir: executa com o custo do Interpreter
+            self._call_function = super()._call_function
+            self._dispatch[BinaryOp] = super().visit_binary_op
+
+    def _call_function(self, name, args, node=None):
+        self.call_depth += 1
+        try:
+            return super()._call_function(name, args, node)
+        finally:
+            self.call_depth -= 1
+
+    def visit_binary_op(self, node):
+        if (id(node) not in self._forkable or self.call_depth > self.cutoff
+                or self.fuel is not None or not self._slots.acquire(False)):
+            return super().visit_binary_op(node)
+        try:
+            return self._fork_join(node)
+        finally:
+            self._slots.release()
+
+    def _fork_join(self, node):
+        dispatch = self._dispatch
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            try:
+                try:
+                    data = pickle.dumps((True, dispatch[type(node.right)](node.right)))
+                except BaseException:
+                    data = pickle.dumps((False, None))
+                with os.fdopen(write_fd, "wb") as f:
+                    f.write(data)
+            finally:
+                # Sem flush de saída nem atexit: o filho não tem efeitos visíveis
+                os._exit(0)
+        os.close(write_fd)
+        self.forks += 1
+        try:
+            left = dispatch[type(node.left)](node.left)
+        except BaseException:
+            # A execução sequencial pararia aqui: o cálculo do filho é descartado
+            os.kill(pid, signal.SIGKILL)
+            os.close(read_fd)
+            os.waitpid(pid, 0)
+            raise
+        with os.fdopen(read_fd, "rb") as f:
+            data = f.read()
+        os.waitpid(pid, 0)
+        ok, right = pickle.loads(data) if data else (False, None)
+        if not ok:
+            # Refaz aqui para levantar exatamente o erro da execução sequencial
+            right = dispatch[type(node.right)](node.right)
+        return BINARY_OPERATORS[node.operator](left, right)
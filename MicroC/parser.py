@@ -21,3 +21,16 @@ def parse_source(source: str):
     except UnexpectedInput as e:
         print('Erro de sintaxe:', e)
         return None
+
+def parse_file(path):
+    """
+    Como parse_source, mas lê o arquivo por mmap e tokeniza sob demanda com o
+    lexer em streaming, sem carregar o código-fonte inteiro numa string.
+    """
+    from .lexer import map_file, streaming_parser
+    try:
+        with map_file(path) as data:
+            return streaming_parser().parse(data)
+    except UnexpectedInput as e:
+        print('Erro de sintaxe:', e)
+        return None
@@ -0,0 +1,114 @@
+"""
+Pipeline do MicroC com fases nomeadas e medidas (`--time`).
+
+    pipeline = Pipeline()
+    ast = pipeline.compile(source)          # parse, transformação, análise
+    result = pipeline.execute(ast, "tree")  # execução
+    print(pipeline.format_table())
+
+Cada fase é cronometrada com `time.perf_counter` e o tempo fica em
+`pipeline.timings` (nome -> segundos). Quem embute o MicroC pode assinar o
+começo e o fim das fases com um PhaseHook:
+
+    class Log(PhaseHook):
+        def phase_finished(self, name, elapsed):
+            print(name, elapsed)
+
+    eval(source, pipeline=Pipeline(hooks=[Log()]))
+
+Com o front-end sob demanda (lazy.py) parse, transformação e análise viram
+uma fase só, "front-end", e os corpos lidos durante a execução contam em
+"execução".
+"""
+
+import json
+import time
+
+from .eval import analyze, interpreter_class
+
+
+PHASES = ("parse", "transformação", "análise", "execução")
+
+
+class PhaseHook:
+    """Interface dos observadores de fase; os métodos padrão não fazem nada."""
+
+    def phase_started(self, name):
+        pass
+
+    def phase_finished(self, name, elapsed):
+        """Chamado também quando a fase termina com erro."""
+        pass
+
+
+class Pipeline:
+    """
+    Executa as fases do MicroC medindo cada uma. Uma fase repetida (ex.:
+    duas execuções) acumula o tempo.
+    """
+
+    def __init__(self, hooks=(), clock=time.perf_counter):
+        self.hooks = list(hooks)
+        self.clock = clock
+        self.timings = {}
+
+    def subscribe(self, hook):
+        self.hooks.append(hook)
+        return hook
+
+    @property
+    def total(self):
+        return sum(self.timings.values())
+
+    def phase(self, name, function, *args):
+        """Executa `function(*args)` como a fase `name` e retorna o resultado."""
+        for hook in self.hooks:
+            hook.phase_started(name)
+        start = self.clock()
+        try:
+            return function(*args)
+        finally:
+            elapsed = self.clock() - start
+            self.timings[name] = self.timings.get(name, 0.0) + elapsed
+            for hook in self.hooks:
+                hook.phase_finished(name, elapsed)
+
+    def compile(self, source, strict=False, path=None, modules=None, lazy=False):
+        """Front-end, como eval.compile_source (e lazy.compile_lazy com `lazy`)."""
+        from .parser import parse_source
+        from .transformer import MicroCTransformer
+
+        if lazy:
+            from .lazy import compile_lazy
+            return self.phase("front-end", compile_lazy, source, strict, path, modules)
+
+        tree = self.phase("parse", parse_source, source)
+        if not tree:
+            raise Exception("Erro de sintaxe.")
+        ast = self.phase("transformação", MicroCTransformer().transform, tree)
+        del tree  # a CST não é mais usada: libera antes da análise
+        return self.phase("análise", analyze, ast, strict, path, modules)
+
+    def execute(self, ast, engine="tree", **options):
+        """Cria o interpretador de `engine` e executa main (fase "execução")."""
+        cls = interpreter_class(engine)
+        return self.phase("execução", lambda: cls(ast, **options).visit_program(ast))
+
+    def to_dict(self):
+        return {
+            "phases": [{"name": name, "time": elapsed} for name, elapsed in self.timings.items()],
+            "total": self.total,
+        }
+
+    def dump_json(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def format_table(self):
+        total = self.total
+        lines = [f"{'fase':<14} {'tempo(ms)':>12} {'%':>7}"]
+        for name, elapsed in self.timings.items():
+            percent = 100.0 * elapsed / total if total else 0.0
+            lines.append(f"{name:<14} {elapsed * 1000:>12.3f} {percent:>6.1f}%")
+        lines.append(f"{'total':<14} {total * 1000:>12.3f}")
+        return "\n".join(lines)
@@ -0,0 +1,194 @@
+"""
+Profiler de MicroC.
+
+Mede o tempo gasto em cada função MicroC (e não nos métodos internos do
+interpretador, como faria o cProfile) e conta quantas vezes cada statement foi
+executado, usando as posições de código-fonte propagadas pelo Lark.
+"""
+
+import json
+import time
+from dataclasses import dataclass, asdict
+
+from .ast import *
+from .eval import Interpreter
+from .pipeline import Pipeline
+
+
+@dataclass
+class FunctionStats:
+    """Estatísticas acumuladas de uma função MicroC."""
+    name: str
+    calls: int = 0
+    inclusive: float = 0.0  # tempo total, incluindo funções chamadas
+    exclusive: float = 0.0  # tempo próprio, descontando funções chamadas
+
+
+@dataclass
+class StatementStats:
+    """Contagem de execuções de um statement."""
+    function: str
+    line: int
+    column: int
+    kind: str
+    hits: int = 0
+
+
+class Profile:
+    """Relatório produzido pelo ProfilingInterpreter."""
+
+    def __init__(self, total_time, functions, statements):
+        self.total_time = total_time
+        self.functions = sorted(functions, key=lambda f: f.exclusive, reverse=True)
+        self.statements = sorted(statements, key=lambda s: s.hits, reverse=True)
+
+    def self_percent(self, stats):
+        if not self.total_time:
+            return 0.0
+        return 100.0 * stats.exclusive / self.total_time
+
+    def to_dict(self):
+        functions = []
+        for stats in self.functions:
+            entry = asdict(stats)
+            entry["self_percent"] = self.self_percent(stats)
+            functions.append(entry)
+        return {
+            "total_time": self.total_time,
+            "functions": functions,
+            "statements": [asdict(stats) for stats in self.statements],
+        }
+
+    def dump_json(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def format_table(self, max_statements=20):
+        lines = [f"Tempo total: {self.total_time * 1000:.3f} ms", ""]
+        lines.append(f"{'função':<20} {'chamadas':>10} {'inclusivo(ms)':>14} {'exclusivo(ms)':>14} {'próprio%':>9}")
+        for stats in self.functions:
+            lines.append(
+                f"{stats.name:<20} {stats.calls:>10} {stats.inclusive * 1000:>14.3f} "
+                f"{stats.exclusive * 1000:>14.3f} {self.self_percent(stats):>8.1f}%"
+            )
+        lines.append("")
+        lines.append(f"{'linha':>6} {'coluna':>6} {'statement':<12} {'função':<20} {'execuções':>10}")
+        for stats in self.statements[:max_statements]:
+            lines.append(
+                f"{stats.line if stats.line is not None else '?':>6} "
+                f"{stats.column if stats.column is not None else '?':>6} "
+                f"{stats.kind:<12} {stats.function:<20} {stats.hits:>10}"
+            )
+        return "\n".join(lines)
+
+
+class ProfilingInterpreter(Interpreter):
+    """Interpretador que registra tempos por função e execuções por statement."""
+
+    def __init__(self, program, clock=time.perf_counter, **options):
+        # Precisa existir antes de Interpreter.__init__, que já pode chamar
+        # funções ao avaliar inicializadores globais.
+        self.clock = clock
+        self.function_stats = {}
+        self.statement_stats = {}
+        self.total_time = 0.0
+        self._frames = []  # [nome, tempo gasto em funções chamadas]
+        self._active = {}  # nome -> número de chamadas ativas (recursão)
+        super().__init__(program, **options)
+
+    def report(self):
+        return Profile(self.total_time, self.function_stats.values(), self.statement_stats.values())
+
+    def _enter(self, name):
+        self._frames.append([name, 0.0])
+        self._active[name] = self._active.get(name, 0) + 1
+        return self.clock()
+
+    def _leave(self, name, start):
+        elapsed = self.clock() - start
+        _, children = self._frames.pop()
+        self._active[name] -= 1
+
+        stats = self.function_stats.get(name)
+        if stats is None:
+            stats = self.function_stats[name] = FunctionStats(name)
+        stats.calls += 1
+        stats.exclusive += elapsed - children
+        # Em chamadas recursivas só a mais externa conta no tempo inclusivo
+        if not self._active[name]:
+            stats.inclusive += elapsed
+        if self._frames:
+            self._frames[-1][1] += elapsed
+
+    def _hit(self, node):
+        function = self._frames[-1][0] if self._frames else "<global>"
+        key = (function, node.line, node.column, type(node).__name__)
+        stats = self.statement_stats.get(key)
+        if stats is None:
+            stats = self.statement_stats[key] = StatementStats(*key)
+        stats.hits += 1
+
+    def run(self, entry="main", args=()):
+        start = self.clock()
+        try:
+            if entry != "main" or args:
+                # Passa por _call_function, que já registra a chamada
+                return super().run(entry, args)
+            call_start = self._enter("main")
+            try:
+                return super().run()
+            finally:
+                self._leave("main", call_start)
+        finally:
+            self.total_time += self.clock() - start
+
+    def _call_function(self, name, args, node=None):
+        start = self._enter(name)
+        try:
+            return super()._call_function(name, args, node)
+        finally:
+            self._leave(name, start)
+
+    def visit_var_decl(self, node):
+        self._hit(node)
+        return super().visit_var_decl(node)
+
+    def visit_array_decl(self, node):
+        self._hit(node)
+        return super().visit_array_decl(node)
+
+    def visit_block(self, node):
+        self._hit(node)
+        return super().visit_block(node)
+
+    def visit_expr_stmt(self, node):
+        self._hit(node)
+        return super().visit_expr_stmt(node)
+
+    def visit_if_stmt(self, node):
+        self._hit(node)
+        return super().visit_if_stmt(node)
+
+    def visit_while_stmt(self, node):
+        self._hit(node)
+        return super().visit_while_stmt(node)
+
+    def visit_for_stmt(self, node):
+        self._hit(node)
+        return super().visit_for_stmt(node)
+
+    def visit_return_stmt(self, node):
+        self._hit(node)
+        return super().visit_return_stmt(node)
+
+
+def profile(source, path=None, lazy=False, **options):
+    """
+    Executa o programa MicroC com o profiler e retorna (resultado, Profile).
+    `path` é o arquivo do programa, base dos imports; com `lazy` o front-end
+    é o sob demanda (ver lazy.py).
+    """
+    ast = Pipeline().compile(source, path=path, lazy=lazy)
+    interpreter = ProfilingInterpreter(ast, **options)
+    result = interpreter.visit_program(ast)
+    return result, interpreter.report()
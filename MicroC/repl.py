@@ -0,0 +1,275 @@
+"""
+REPL do MicroC (`microc repl`).
+
+Cada entrada pode declarar funções e globais, executar statements e terminar
+com uma expressão sem `;`, cujo valor é impresso:
+
+    >>> int quadrado(int x) { return x * x; }
+    >>> int total = quadrado(3);
+    >>> total + 1
+    10
+
+A sessão guarda um único SemanticAnalyzer e um único interpretador: cada
+entrada passa pelo parser, pela análise e pela execução sozinha, contra as
+tabelas de símbolos e as globais/funções acumuladas, sem repetir o
+front-end do que já foi definido nem rodar main de novo. Uma entrada com
+erro de sintaxe ou semântico não deixa nada definido.
+
+Comandos:
+
+    :time ENTRADA     executa ENTRADA e mostra o tempo de cada fase
+    :profile ENTRADA  executa ENTRADA com o profiler (ver profiler.py)
+    :help, :quit
+"""
+
+import argparse
+import sys
+import time
+
+from lark import Lark, UnexpectedInput
+
+from .ast import *
+from .erros import *
+from .eval import interpreter_class
+from .output import BufferedWriter
+from .parser import GRAMMAR
+from .semantic import SemanticAnalyzer
+from .transformer import MicroCTransformer
+
+
+# Uma entrada: funções e statements (declarações de globais inclusive) e,
+# opcionalmente, uma expressão final sem `;`
+REPL_GRAMMAR = GRAMMAR + """
+repl_input:     (fun_decl | statement)* expression?
+"""
+
+PHASES = ("parse", "análise", "execução")
+
+HELP = """\
+Declare funções e globais, execute statements ou avalie uma expressão (sem ';').
+  :time ENTRADA     executa ENTRADA e mostra o tempo de cada fase
+  :profile ENTRADA  executa ENTRADA com o profiler
+  :help             mostra esta ajuda
+  :quit             encerra (também Ctrl+D)"""
+
+_parser = None
+
+
+def repl_parser():
+    """Parser das entradas do REPL, criado no primeiro uso."""
+    global _parser
+    if _parser is None:
+        _parser = Lark(REPL_GRAMMAR, parser='lalr', start='repl_input', propagate_positions=True)
+    return _parser
+
+
+class _ReplTransformer(MicroCTransformer):
+    def repl_input(self, items):
+        return items
+
+
+class Session:
+    """
+    Estado de uma sessão do REPL. `feed(texto)` processa uma entrada e
+    retorna o valor da expressão final (ou None); `timings` guarda o tempo
+    de cada fase da última entrada, em segundos.
+    """
+
+    def __init__(self, engine="tree", output=None, max_steps=None, max_depth=None):
+        self.output = output if output is not None else BufferedWriter()
+        self.engine = engine
+        self.limits = {"max_steps": max_steps, "max_depth": max_depth}
+        self.analyzer = SemanticAnalyzer()
+        self.interpreter = interpreter_class(engine)(Program([]), output=self.output, **self.limits)
+        # Um único transformer: os nós compartilhados valem para a sessão toda
+        self.transformer = _ReplTransformer()
+        self.timings = {}
+
+    def feed(self, text, interpreter=None):
+        """
+        Processa `text`. Erros de sintaxe (UnexpectedInput) e semânticos
+        (SemanticError) são propagados sem alterar a sessão; erros de execução
+        mantêm o que já tinha sido executado, como em um programa, e desfazem
+        as declarações da entrada que não chegaram a executar.
+        """
+        clock = time.perf_counter
+        start = clock()
+        items = self.transformer.transform(repl_parser().parse(text))
+        expression = None
+        if items and not isinstance(items[-1], (Declaration, Statement)):
+            expression = items.pop()
+        parsed = clock()
+        snapshot = self._snapshot()
+        self._check(items, expression, snapshot)
+        checked = clock()
+        interpreter = interpreter or self.interpreter
+        try:
+            return self._execute(items, expression, interpreter)
+        except Exception:
+            self._forget_unexecuted(items, snapshot, interpreter)
+            raise
+        finally:
+            done = clock()
+            self.timings = dict(zip(PHASES, (parsed - start, checked - parsed, done - checked)))
+
+    def _snapshot(self):
+        analyzer = self.analyzer
+        return analyzer.env, dict(analyzer.env.vars), dict(analyzer.functions)
+
+    def _restore(self, snapshot):
+        analyzer = self.analyzer
+        scope, variables, functions = snapshot
+        analyzer.env = scope
+        scope.vars, analyzer.functions = dict(variables), dict(functions)
+        analyzer.work.clear()
+        analyzer.current_return_type, analyzer.has_return = None, False
+
+    def _check(self, items, expression, snapshot):
+        analyzer = self.analyzer
+        try:
+            analyzer.visit_program(Program(items))
+            if expression is not None:
+                analyzer.visit_expression(expression)
+        except Exception:
+            # Desfaz o que a entrada chegou a declarar
+            self._restore(snapshot)
+            raise
+
+    def _forget_unexecuted(self, items, snapshot, interpreter):
+        """
+        Depois de um erro de execução, volta a análise ao estado anterior à
+        entrada e declara de novo só o que o interpretador chegou a definir.
+        """
+        declared = self.analyzer.env.vars, self.analyzer.functions
+        self._restore(snapshot)
+        variables, functions = self.analyzer.env.vars, self.analyzer.functions
+        for item in items:
+            if isinstance(item, FunDecl):
+                if interpreter.functions.get(item.name) is item:
+                    functions[item.name] = declared[1][item.name]
+            elif isinstance(item, (VarDecl, ArrayDecl)) and item.name in interpreter.globals.vars:
+                variables[item.name] = declared[0][item.name]
+
+    def _execute(self, items, expression, interpreter):
+        # Cada entrada tem o orçamento de passos inteiro
+        interpreter.fuel = interpreter.max_steps
+        try:
+            for item in items:
+                if isinstance(item, FunDecl):
+                    interpreter.functions[item.name] = item
+                else:
+                    interpreter.visit(item)
+            if expression is None:
+                return None
+            value = interpreter.visit(expression)
+            if value is not None:
+                self.output.write(value)
+            return value
+        except Exception:
+            # O erro pode ter ocorrido dentro de uma chamada: volta ao escopo global
+            interpreter.env = interpreter.globals
+            interpreter.depth = 0
+            interpreter.function = None
+            raise
+        finally:
+            self.output.flush()
+
+    def profile(self, text):
+        """Processa `text` com o ProfilingInterpreter e retorna o Profile."""
+        from .profiler import ProfilingInterpreter
+
+        profiler = ProfilingInterpreter(Program([]), output=self.output, **self.limits)
+        # Mesmas globais e funções da sessão
+        profiler.env = profiler.globals = self.interpreter.globals
+        profiler.functions = self.interpreter.functions
+        self.feed(text, profiler)
+        profiler.total_time = self.timings["execução"]
+        return profiler.report()
+
+    def command(self, line):
+        """
+        Processa uma linha digitada (entrada ou comando) e retorna o texto a
+        mostrar, além da saída do próprio programa. Erros viram mensagens.
+        """
+        name, _, rest = line.strip().partition(" ")
+        try:
+            if name in (":help", ":h"):
+                return HELP
+            if name == ":time":
+                self.feed(rest)
+                return "  ".join(f"{phase}: {self.timings[phase] * 1000:.3f} ms" for phase in PHASES)
+            if name == ":profile":
+                return self.profile(rest).format_table()
+            if name.startswith(":"):
+                return f"Comando desconhecido: {name} (veja :help)"
+            self.feed(line)
+        except UnexpectedInput as e:
+            return f"Erro de sintaxe: {e}"
+        except SemanticError as e:
+            return f"Erro semântico: {e}"
+        except Exception as e:
+            return f"Erro de execução: {e}"
+        return None
+
+
+def read_input(interactive):
+    """
+    Lê uma entrada: continua nas linhas seguintes enquanto houver chaves
+    abertas. Levanta EOFError no fim da entrada.
+    """
+    lines = []
+    while True:
+        prompt = ("... " if lines else ">>> ") if interactive else ""
+        line = input(prompt) if interactive else sys.stdin.readline()
+        if not interactive and not line:
+            if not lines:
+                raise EOFError
+            break
+        lines.append(line.rstrip("\n"))
+        text = "\n".join(lines)
+        if text.count("{") <= text.count("}"):
+            return text
+    return "\n".join(lines)
+
+
+def make_repl_argparser():
+    parser = argparse.ArgumentParser(prog="microc repl", description="REPL do MicroC")
+    parser.add_argument("file", nargs="?", help="Arquivo cujas declarações são carregadas antes (main não roda).")
+    parser.add_argument("--engine", choices=["tree", "stack", "jit"], default="tree", help="Interpretador usado.")
+    parser.add_argument("--max-steps", type=int, metavar="N", help="Orçamento de passos de cada entrada.")
+    parser.add_argument("--max-depth", type=int, metavar="N", help="Profundidade máxima de chamadas.")
+    return parser
+
+
+def repl_main(argv):
+    args = make_repl_argparser().parse_args(argv)
+    session = Session(engine=args.engine, max_steps=args.max_steps, max_depth=args.max_depth)
+    if args.file:
+        try:
+            with open(args.file, "r") as f:
+                source = f.read()
+        except FileNotFoundError:
+            print(f"Arquivo {args.file} não encontrado.")
+            exit(1)
+        message = session.command(source)
+        if message:
+            print(message)
+
+    interactive = sys.stdin.isatty()
+    if interactive:
+        print("MicroC REPL. :help mostra os comandos.")
+    while True:
+        try:
+            line = read_input(interactive)
+        except EOFError:
+            break
+        except KeyboardInterrupt:
+            print()
+            continue
+        if line.strip() in (":quit", ":q"):
+            break
+        if not line.strip():
+            continue
+        message = session.command(line)
+        if message:
+            print(message)
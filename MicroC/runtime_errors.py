@@ -0,0 +1,59 @@
+"""
+Erros de execução do interpretador: vetor acessado fora dos limites e
+limites de recursos (passos e profundidade de chamadas) esgotados.
+"""
+
+from .erros import MicroCRuntimeError
+
+
+class IndexOutOfBoundsError(MicroCRuntimeError):
+    """
+    Exceção para acesso a vetor fora dos limites.
+    """
+
+    def __init__(self, name, index, size, token=None):
+        msg = f"Índice {index} fora dos limites do vetor '{name}' (tamanho {size})."
+        super().__init__(msg, token)
+        self.name = name
+        self.index = index
+        self.size = size
+
+
+class ExecutionLimitError(MicroCRuntimeError):
+    """
+    Exceção para quando a execução esgota um limite de recursos.
+    """
+
+    def __init__(self, msg, node=None, function=None):
+        line = getattr(node, "line", None)
+        if function is not None:
+            msg += f" Em '{function}'"
+            msg += f", linha {line}." if line is not None else "."
+        elif line is not None:
+            msg += f" Na linha {line}."
+        super().__init__(msg)
+        self.node = node
+        self.function = function
+        self.line = line
+
+
+class StepLimitError(ExecutionLimitError):
+    """
+    Exceção para quando o programa esgota o orçamento de passos de execução.
+    """
+
+    def __init__(self, limit, node=None, function=None):
+        msg = f"Limite de {limit} passos de execução excedido."
+        super().__init__(msg, node, function)
+        self.limit = limit
+
+
+class CallDepthError(ExecutionLimitError):
+    """
+    Exceção para quando a profundidade de chamadas excede o limite.
+    """
+
+    def __init__(self, limit, node=None, function=None):
+        msg = f"Profundidade máxima de {limit} chamadas excedida."
+        super().__init__(msg, node, function)
+        self.limit = limit
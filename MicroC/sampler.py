@@ -0,0 +1,135 @@
+"""
+Profiler por amostragem das pilhas de chamadas MicroC (`--flame`).
+
+O profiler.py cronometra cada chamada e conta cada statement, um custo pago
+o tempo todo em execuções longas. Aqui o interpretador só mantém uma pilha sombra
+com o nome de cada função MicroC ativa e a linha da chamada que ela está
+fazendo (um append e um pop por chamada); uma thread acorda a cada
+`interval` segundos e registra a pilha daquele momento. A linha da função
+mais interna é a do nó que o interpretador está avaliando, lida do frame
+Python da thread que executa o programa, só na hora da amostra.
+
+O resultado sai no formato "collapsed stacks", uma pilha por linha com o
+número de amostras, aceito por flamegraph.pl, speedscope e inferno:
+
+    main:12;fib:4;fib:4;fib:3 57
+
+Como a thread só roda quando o interpretador solta o GIL (a cada
+sys.getswitchinterval(), 5 ms por padrão), intervalos menores que isso não
+aumentam o número de amostras.
+"""
+
+import sys
+import threading
+from collections import Counter
+
+from .ast import *
+from .eval import Interpreter
+from .pipeline import Pipeline
+
+
+DEFAULT_INTERVAL = 0.005
+
+
+def _current_line(frame):
+    """Linha do nó avaliado mais interno da função MicroC em execução."""
+    while frame is not None:
+        if frame.f_code.co_name == "_call_function":
+            return None
+        node = frame.f_locals.get("node")
+        # Nós compartilhados (ver interning.py) têm a posição da primeira ocorrência
+        if isinstance(node, ASTNode) and node.structural_hash is None and node.line is not None:
+            return node.line
+        frame = frame.f_back
+    return None
+
+
+class SamplingInterpreter(Interpreter):
+    """
+    Interpretador com pilha sombra de funções MicroC, amostrada por uma
+    thread enquanto `run` executa. `samples` conta cada pilha, de main até
+    a função mais interna, como uma tupla de "função:linha" (ou só "função"
+    com lines=False).
+    """
+
+    def __init__(self, program, interval=DEFAULT_INTERVAL, lines=True, **options):
+        # Precisa existir antes de Interpreter.__init__, que já pode chamar
+        # funções ao avaliar inicializadores globais.
+        self.stack = []  # [nome, linha em execução]
+        self.interval = interval
+        self.lines = lines
+        self.samples = Counter()
+        self._thread_id = None
+        super().__init__(program, **options)
+
+    def _call_function(self, name, args, node=None):
+        stack = self.stack
+        if stack and node is not None:
+            stack[-1][1] = node.line
+        stack.append([name, None])
+        try:
+            return super()._call_function(name, args, node)
+        finally:
+            stack.pop()
+
+    def run(self, entry="main", args=()):
+        if entry != "main" or args:
+            # Passa por _call_function, que já empilha a função
+            return self._sampled(super().run, entry, args)
+        self.stack.append(["main", None])
+        try:
+            return self._sampled(super().run)
+        finally:
+            self.stack.pop()
+
+    def _sampled(self, function, *args):
+        self._thread_id = threading.get_ident()
+        stop = threading.Event()
+        sampler = threading.Thread(target=self._sample_loop, args=(stop,), daemon=True)
+        sampler.start()
+        try:
+            return function(*args)
+        finally:
+            stop.set()
+            sampler.join()
+
+    def _sample_loop(self, stop):
+        while not stop.wait(self.interval):
+            self.take_sample()
+
+    def take_sample(self):
+        """Registra a pilha atual. Chamado pela thread de amostragem."""
+        frames = [list(frame) for frame in self.stack]
+        if not frames:
+            return
+        if not self.lines:
+            self.samples[tuple(name for name, _ in frames)] += 1
+            return
+        innermost = frames[-1]
+        innermost[1] = _current_line(sys._current_frames().get(self._thread_id))
+        if innermost[1] is None:
+            # Entrando ou saindo da função: usa a linha da declaração
+            func = self.functions.get(innermost[0])
+            innermost[1] = func.line if func is not None else None
+        self.samples[tuple(f"{name}:{line}" if line is not None else name for name, line in frames)] += 1
+
+    def collapsed(self):
+        """Linhas no formato collapsed stacks, da pilha mais amostrada à menos."""
+        return [f"{';'.join(stack)} {count}" for stack, count in self.samples.most_common()]
+
+    def write_collapsed(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            for line in self.collapsed():
+                f.write(line + "\n")
+
+
+def sample(source, path=None, lazy=False, **options):
+    """
+    Executa o programa MicroC com o profiler por amostragem e retorna
+    (resultado, SamplingInterpreter). `path` é o arquivo do programa, base
+    dos imports; com `lazy` o front-end é o sob demanda (ver lazy.py).
+    """
+    ast = Pipeline().compile(source, path=path, lazy=lazy)
+    interpreter = SamplingInterpreter(ast, **options)
+    result = interpreter.visit_program(ast)
+    return result, interpreter
@@ -2,19 +2,79 @@ from .ast import *
 from .erros import *
 from .ctx import Environment
 
+class ArrayType(str):
+    """
+    Tipo vetor, escrito "int[]". Se comporta como a string do tipo nas
+    comparações e guarda o tamanho declarado (None para parâmetros).
+    """
+
+    def __new__(cls, element, size=None):
+        obj = super().__new__(cls, element + "[]")
+        obj.size = size
+        return obj
+
+
+def is_array(type_name):
+    return type_name is not None and type_name.endswith("[]")
+
+
 class SemanticAnalyzer(ASTVisitor):
-    def __init__(self):
+    """
+    Verifica declarações, escopos e tipos.
+
+    A travessia não usa recursão do Python: statements aninhados (blocos,
+    corpos de if/while/for e funções) vão para uma pilha de trabalho e as
+    expressões são tipadas em pós-ordem com uma pilha de tipos, então a
+    análise suporta aninhamentos arbitrariamente profundos.
+    """
+
+    def __init__(self, check_bounds=True, imports=None):
+        self.check_bounds = check_bounds  # verifica índices constantes
+        # caminho do import -> assinaturas exportadas pelo módulo (ver modules.py)
+        self.imports = imports
+        self.imported = set()
         self.env = Environment()  # escopo global
         self.functions = {}  # nome->(tipo_retorno, [tipos_param])
         self.current_return_type = None
         self.has_return = False
+        self.work = []  # statements pendentes e ações de saída de escopo
+
+        # tipo do nó -> (verificação antes dos filhos, verificação com os tipos dos filhos)
+        self._expression_rules = {
+            IntLiteral: (None, lambda node: "int"),
+            BoolLiteral: (None, lambda node: "bool"),
+            Variable: (None, self._check_variable),
+            Assignment: (self._check_assignable, self._check_assignment),
+            CompoundAssignment: (self._check_compound_target, self._check_compound_assignment),
+            Increment: (None, self._check_increment),
+            ArrayIndex: (self._check_array_name, self._check_array_index),
+            ArrayAssignment: (self._check_array_name, self._check_array_assignment),
+            BinaryOp: (None, self._check_binary_op),
+            UnaryOp: (None, self._check_unary_op),
+            FunctionCall: (self._check_callee, self._check_call_args),
+            PrintCall: (None, self._check_print),
+        }
+        self._dispatch = dispatch_table(self)
 
     def error(self, msg, token=None):
         raise SemanticError(msg, token)
 
+    def _run(self, *nodes):
+        """Analisa `nodes` e tudo o que eles empilharem."""
+        work = self.work
+        dispatch = self._dispatch
+        base = len(work)
+        work.extend(reversed(nodes))
+        while len(work) > base:
+            item = work.pop()
+            if isinstance(item, tuple):
+                action, arg = item
+                action(arg)
+            else:
+                dispatch[type(item)](item)
+
     def visit_program(self, node):
-        for decl in node.declarations:
-            decl.accept(self)
+        self._run(*node.declarations)
 
     def visit_var_decl(self, node):
         if node.name in self.env.vars:
@@ -25,42 +85,64 @@ class SemanticAnalyzer(ASTVisitor):
             if init_type != node.type:
                 self.error(f"Incompatibilidade de tipo em '{node.name}': esperado '{node.type}', recebeu '{init_type}'.")
 
+    def visit_array_decl(self, node):
+        if node.name in self.env.vars:
+            self.error(f"Variável '{node.name}' já declarada.")
+        if node.type != "int":
+            self.error(f"Vetor '{node.name}' deve ser do tipo 'int'.")
+        if node.size <= 0:
+            self.error(f"Tamanho do vetor '{node.name}' deve ser positivo.")
+        self.env.set(node.name, ArrayType(node.type, node.size))
+
     def visit_fun_decl(self, node):
         if node.name in self.functions:
             self.error(f"Função '{node.name}' já declarada.")
         param_types = [param.type for param in node.params]
         self.functions[node.name] = (node.type, param_types)
 
-        prev_env = self.env
-        self.env = Environment(prev_env)
+        saved = (self.env, self.current_return_type, self.has_return)
+        self.env = Environment(self.env)
 
         for param in node.params:
+            if is_array(param.type) and param.type != "int[]":
+                self.error(f"Parâmetro vetor '{param.name}' deve ser do tipo 'int[]'.")
             self.env.set(param.name, param.type)
 
-        prev_return = self.current_return_type
-        prev_has_return = self.has_return
-
         self.current_return_type = node.type
         self.has_return = False
 
-        node.body.accept(self)
+        # O corpo é analisado pelo laço de trabalho; ao terminar, _end_function
+        self.work.append((self._end_function, (node, saved)))
+        self.work.append(node.body)
 
+    def _end_function(self, arg):
+        node, saved = arg
         if self.current_return_type != "void" and not self.has_return:
             self.error(f"Função '{node.name}' deve conter ao menos um 'return' com valor.")
+        self.env, self.current_return_type, self.has_return = saved
 
-        self.current_return_type = prev_return
-        self.has_return = prev_has_return
-        self.env = prev_env
+    def _restore_env(self, env):
+        self.env = env
+
+    def visit_import_decl(self, node):
+        exports = (self.imports or {}).get(node.path)
+        if exports is None:
+            self.error(f"Módulo '{node.path}' não foi carregado.")
+        if node.path in self.imported:
+            return
+        self.imported.add(node.path)
+        for name, signature in exports.items():
+            if name in self.functions:
+                self.error(f"Função '{name}' já declarada.")
+            self.functions[name] = signature
 
     def visit_param(self, node):
         pass
 
     def visit_block(self, node):
-        prev_env = self.env
-        self.env = Environment(prev_env)
-        for stmt in node.statements:
-            stmt.accept(self)
-        self.env = prev_env
+        self.work.append((self._restore_env, self.env))
+        self.env = Environment(self.env)
+        self.work.extend(reversed(node.statements))
 
     def visit_expr_stmt(self, node):
         self.visit_expression(node.expression)
@@ -69,17 +151,34 @@ class SemanticAnalyzer(ASTVisitor):
         cond_type = self.visit_expression(node.condition)
         if cond_type != "bool":
             self.error("Condição do if deve ser bool.")
-        node.then_stmt.accept(self)
         if node.else_stmt:
-            node.else_stmt.accept(self)
+            self.work.append(node.else_stmt)
+        self.work.append(node.then_stmt)
 
     def visit_while_stmt(self, node):
         cond_type = self.visit_expression(node.condition)
         if cond_type != "bool":
             self.error("Condição do while deve ser bool.")
-        node.body.accept(self)
+        self.work.append(node.body)
+
+    def visit_for_stmt(self, node):
+        self.work.append((self._restore_env, self.env))
+        self.env = Environment(self.env)  # escopo da inicialização
+        if isinstance(node.init, VarDecl):
+            self.visit(node.init)
+        elif node.init is not None:
+            self.visit_expression(node.init)
+        if node.condition is not None:
+            if self.visit_expression(node.condition) != "bool":
+                self.error("Condição do for deve ser bool.")
+        if node.update is not None:
+            self.visit_expression(node.update)
+        self.work.append(node.body)
 
     def visit_return_stmt(self, node):
+        if self.current_return_type is None:
+            # Só o REPL aceita statements fora de funções
+            self.error("'return' fora de uma função.")
         self.has_return = True
         if node.expression:
             ret_type = self.visit_expression(node.expression)
@@ -89,18 +188,104 @@ class SemanticAnalyzer(ASTVisitor):
             if self.current_return_type != "void":
                 self.error(f"Função do tipo '{self.current_return_type}' deve retornar valor.")
 
-    def visit_assignment(self, node):
+    # ==================== EXPRESSÕES ====================
+
+    def visit_expression(self, node):
+        """
+        Retorna o tipo da expressão. Cada nó passa pela verificação prévia ao
+        ser encontrado e pela verificação final quando os tipos de todos os
+        filhos já estão na pilha.
+        """
+        rules = self._expression_rules
+        types = []
+        stack = [(node, False)]
+        while stack:
+            current, ready = stack.pop()
+            rule = rules.get(type(current))
+            if rule is None:
+                self.error(f"Nó de expressão não suportado: {type(current).__name__}")
+            before, after = rule
+            children = expression_children(current)
+            if not ready:
+                if before is not None:
+                    before(current)
+                if children:
+                    stack.append((current, True))
+                    stack.extend((child, False) for child in reversed(children))
+                    continue
+            if children:
+                child_types = types[-len(children):]
+                del types[-len(children):]
+                types.append(after(current, *child_types))
+            else:
+                types.append(after(current))
+        return types[0]
+
+    visit_assignment = visit_compound_assignment = visit_increment = visit_expression
+    visit_array_assignment = visit_binary_op = visit_unary_op = visit_expression
+    visit_function_call = visit_print_call = visit_variable = visit_expression
+    visit_array_index = visit_int_literal = visit_bool_literal = visit_expression
+
+    def _lookup(self, name):
         try:
-            var_type = self.env.get(node.name)
+            return self.env.get(name)
         except Exception:
-            self.error(f"Variável '{node.name}' não declarada.")
-        value_type = self.visit_expression(node.value)
+            self.error(f"Variável '{name}' não declarada.")
+
+    def _check_variable(self, node):
+        return self._lookup(node.name)
+
+    def _check_assignable(self, node):
+        if is_array(self._lookup(node.name)):
+            self.error(f"Não é possível atribuir ao vetor '{node.name}' inteiro.")
+
+    def _check_assignment(self, node, value_type):
+        var_type = self._lookup(node.name)
         if var_type != value_type:
             self.error(f"Incompatibilidade de tipo na atribuição: '{var_type}' <- '{value_type}'.")
+        return var_type
 
-    def visit_binary_op(self, node):
-        left_type = self.visit_expression(node.left)
-        right_type = self.visit_expression(node.right)
+    def _check_int_variable(self, name, op):
+        var_type = self._lookup(name)
+        if var_type != "int":
+            self.error(f"Operador '{op}' requer variável int, mas '{name}' é '{var_type}'.")
+
+    def _check_compound_target(self, node):
+        self._check_int_variable(node.name, node.operator + "=")
+
+    def _check_compound_assignment(self, node, value_type):
+        if value_type != "int":
+            self.error(f"Incompatibilidade de tipo na atribuição: 'int' <- '{value_type}'.")
+        return "int"
+
+    def _check_increment(self, node):
+        self._check_int_variable(node.name, node.operator)
+        return "int"
+
+    def _check_array_name(self, node):
+        if not is_array(self._lookup(node.name)):
+            self.error(f"Variável '{node.name}' não é um vetor.")
+
+    def _check_index(self, node, index_type):
+        if index_type != "int":
+            self.error(f"Índice de '{node.name}' deve ser int.")
+        size = getattr(self._lookup(node.name), "size", None)
+        index = node.index
+        if self.check_bounds and size is not None and isinstance(index, IntLiteral):
+            if not 0 <= index.value < size:
+                self.error(f"Índice {index.value} fora dos limites do vetor '{node.name}' (tamanho {size}).")
+
+    def _check_array_index(self, node, index_type):
+        self._check_index(node, index_type)
+        return "int"
+
+    def _check_array_assignment(self, node, index_type, value_type):
+        self._check_index(node, index_type)
+        if value_type != "int":
+            self.error(f"Incompatibilidade de tipo na atribuição: 'int' <- '{value_type}'.")
+        return "int"
+
+    def _check_binary_op(self, node, left_type, right_type):
         op = node.operator
         if op in ['+', '-', '*', '/']:
             if left_type == right_type == "int":
@@ -116,11 +301,7 @@ class SemanticAnalyzer(ASTVisitor):
             self.error("Operação lógica requer booleanos.")
         self.error(f"Operador '{op}' não suportado.")
 
-    def visit_binaryop(self, node):
-        return self.visit_binary_op(node)
-
-    def visit_unary_op(self, node):
-        operand_type = self.visit_expression(node.operand)
+    def _check_unary_op(self, node, operand_type):
         op = node.operator
         if op == '!':
             if operand_type == "bool":
@@ -132,48 +313,21 @@ class SemanticAnalyzer(ASTVisitor):
             self.error(f"Operador '{op}' requer inteiro.")
         self.error(f"Operador unário '{op}' não suportado.")
 
-    def visit_functioncall(self, node):
-        return self.visit_function_call(node)
-
-    def visit_function_call(self, node):
+    def _check_callee(self, node):
         if node.name not in self.functions:
             self.error(f"Função '{node.name}' não declarada.")
-        ret_type, param_types = self.functions[node.name]
+        _, param_types = self.functions[node.name]
         if len(node.args) != len(param_types):
             self.error(f"Função '{node.name}' espera {len(param_types)} argumentos, recebeu {len(node.args)}.")
-        for arg, expected_type in zip(node.args, param_types):
-            arg_type = self.visit_expression(arg)
+
+    def _check_call_args(self, node, *arg_types):
+        ret_type, param_types = self.functions[node.name]
+        for arg_type, expected_type in zip(arg_types, param_types):
             if arg_type != expected_type:
                 self.error(f"Tipo de argumento incompatível em '{node.name}': esperado '{expected_type}', recebeu '{arg_type}'.")
         return ret_type
 
-    def visit_print_call(self, node):
-        return self.visit_expression(node.expression)
-
-    def visit_variable(self, node):
-        try:
-            return self.env.get(node.name)
-        except Exception:
-            self.error(f"Variável '{node.name}' não declarada.")
-
-    def visit_intliteral(self, node):
-        return self.visit_int_literal(node)
-
-    def visit_int_literal(self, node):
-        return "int"
-
-    def visit_boolliteral(self, node):
-        return self.visit_bool_literal(node)
-
-    def visit_bool_literal(self, node):
-        return "bool"
-
-    def visit_expression(self, node):
-        # Tratamento especial para PrintCall que tem underscore no nome do método
-        if isinstance(node, PrintCall):
-            return self.visit_print_call(node)
-        
-        method = getattr(self, f"visit_{type(node).__name__.lower()}", None)
-        if method:
-            return method(node)
-        self.error(f"Nó de expressão não suportado: {type(node).__name__}")
+    def _check_print(self, node, value_type):
+        if is_array(value_type):
+            self.error("print não aceita vetores.")
+        return value_type
@@ -0,0 +1,369 @@
+"""
+Formato binário compacto para programas MicroC.
+
+`dump(programa)` gera bytes e `load(dados)` reconstrói a AST sem passar pelo
+Lark, pelo MicroCTransformer nem pelo SemanticAnalyzer: serve para mandar
+programas já verificados a processos trabalhadores e guardá-los em caches.
+
+Layout (versão 1):
+
+    cabeçalho   MAGIC, versão (1 byte) e flags (1 byte)
+    strings     quantidade e, para cada uma, tamanho + UTF-8
+    tipos       só com FLAG_TYPES: assinaturas das funções e tipos das globais
+    nós         instruções de uma máquina de pilha, em pós-ordem
+
+Inteiros são varints (7 bits por byte, o menos significativo primeiro);
+os que podem ser negativos passam antes por zigzag. Cada nó é gravado depois
+dos filhos: um byte com o tipo (posição em SCHEMA a partir de FIRST_KIND), a
+posição no código (linha relativa à do nó anterior e coluna) e os campos
+escalares (strings como índices da tabela). O leitor tira os filhos da
+pilha. LIST junta os n valores do topo em uma lista, NONE empilha None e REF
+empilha de novo um nó já lido, então subárvores compartilhadas (ver
+interning.py) são gravadas uma vez e continuam compartilhadas após o load.
+
+O `structural_hash` dos nós não é gravado: ele depende do hash de strings do
+processo e é recalculado por `structural_hash()` quando preciso.
+"""
+
+import gc
+from contextlib import contextmanager
+from dataclasses import dataclass, fields
+
+from .ast import *
+from .semantic import ArrayType
+
+
+MAGIC = b"MCAST"
+VERSION = 1
+FLAG_TYPES = 1
+
+NONE, LIST, REF = 0, 1, 2
+FIRST_KIND = 3
+
+# Tipos de nó na ordem do formato, com os campos na ordem do dataclass:
+# "n" filho (nó, lista ou None, vem da pilha), "s" string, "i" inteiro e
+# "b" bool. Mudar esta tabela exige uma nova VERSION.
+SCHEMA = (
+    (Program, "n"),
+    (VarDecl, "ssn"),
+    (ArrayDecl, "ssi"),
+    (FunDecl, "ssnn"),
+    (Param, "ss"),
+    (Block, "n"),
+    (ExprStmt, "n"),
+    (IfStmt, "nnn"),
+    (WhileStmt, "nn"),
+    (ForStmt, "nnnn"),
+    (ReturnStmt, "n"),
+    (Assignment, "sn"),
+    (CompoundAssignment, "ssn"),
+    (Increment, "ssb"),
+    (ArrayAssignment, "snn"),
+    (BinaryOp, "nsn"),
+    (UnaryOp, "sn"),
+    (FunctionCall, "sn"),
+    (PrintCall, "n"),
+    (Variable, "s"),
+    (ArrayIndex, "sn"),
+    (IntLiteral, "i"),
+    (BoolLiteral, "b"),
+    (ImportDecl, "s"),
+)
+
+
+class FormatError(Exception):
+    """Dados que não estão no formato (ou na versão) esperado."""
+
+
+@dataclass
+class ProgramTypes:
+    """Resultado da análise semântica gravado junto com o programa."""
+    functions: dict  # nome -> (tipo de retorno, [tipos dos parâmetros])
+    globals: dict  # nome -> tipo ("int", "bool" ou ArrayType com o tamanho)
+
+
+def _varint(out, value):
+    while value >= 0x80:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _varint_tail(data, pos, first):
+    # Continuação de um varint cujo primeiro byte (`first`) tem o bit alto
+    value, shift = first & 0x7F, 7
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def _read_varint(data, pos):
+    byte = data[pos]
+    if byte < 0x80:
+        return byte, pos + 1
+    return _varint_tail(data, pos + 1, byte)
+
+
+def _zigzag(value):
+    return value << 1 if value >= 0 else (-value << 1) - 1
+
+
+def _unzigzag(value):
+    return value >> 1 if not value & 1 else -((value + 1) >> 1)
+
+
+# Tabelas derivadas de SCHEMA. Para gravar, por classe: (tipo, campos filhos,
+# campos escalares com o código); para ler, por tipo: (classe, códigos).
+_WRITERS = {}
+_READERS = []
+for _kind, (_cls, _codes) in enumerate(SCHEMA, FIRST_KIND):
+    _layout = list(zip((field.name for field in fields(_cls)), _codes))
+    _WRITERS[_cls] = (
+        _kind,
+        tuple(name for name, code in _layout if code == "n"),
+        tuple((name, code) for name, code in _layout if code != "n"),
+    )
+    _READERS.append((_cls, _codes))
+del _kind, _cls, _codes, _layout
+
+
+def _encode_nodes(program, out, string):
+    seen = {}  # id(nó) -> índice do nó na ordem de leitura
+    last_line = 0
+    # Itens: nó, lista ou None a gravar; (escalares, nó) quando os filhos do
+    # nó já foram gravados; int n para fechar uma lista de n elementos
+    stack = [program]
+    push, pop, append = stack.append, stack.pop, out.append
+    while stack:
+        item = pop()
+        cls = type(item)
+        if cls is tuple:
+            kind, scalars, node = item
+            seen[id(node)] = len(seen)
+            append(kind)
+            line = node.line
+            if line is None:
+                append(0)
+            else:
+                delta = line - last_line
+                last_line = line
+                _varint(out, _zigzag(delta) + 1)
+                column = node.column
+                _varint(out, 0 if column is None else column + 1)
+            for name, code in scalars:
+                value = getattr(node, name)
+                if code == "s":
+                    _varint(out, string(value))
+                elif code == "i":
+                    _varint(out, _zigzag(value))
+                else:
+                    append(1 if value else 0)
+        elif cls is list:
+            push(len(item))
+            stack.extend(reversed(item))
+        elif cls is int:
+            append(LIST)
+            _varint(out, item)
+        elif item is None:
+            append(NONE)
+        else:
+            index = seen.get(id(item))
+            if index is not None:
+                append(REF)
+                _varint(out, index)
+                continue
+            writer = _WRITERS.get(cls)
+            if writer is None:
+                raise FormatError(f"Nó não serializável: {cls.__name__}")
+            kind, children, scalars = writer
+            push((kind, scalars, item))
+            for name in reversed(children):
+                push(getattr(item, name))
+
+
+def _decode_nodes(data, pos, strings):
+    stack, nodes = [], []
+    push, pop = stack.append, stack.pop
+    last_line = 0
+    end = len(data)
+    while pos < end:
+        op = data[pos]
+        pos += 1
+        if op < FIRST_KIND:
+            if op == REF:
+                index, pos = _read_varint(data, pos)
+                push(nodes[index])
+            elif op == NONE:
+                push(None)
+            elif op == LIST:
+                count, pos = _read_varint(data, pos)
+                if count:
+                    if count > len(stack):
+                        raise ValueError("pilha de nós vazia")
+                    values = stack[-count:]
+                    del stack[-count:]
+                else:
+                    values = []
+                push(values)
+            continue
+        if op - FIRST_KIND >= len(_READERS):
+            raise ValueError(f"instrução {op} desconhecida")
+        cls, codes = _READERS[op - FIRST_KIND]
+        line, pos = _read_varint(data, pos)
+        if line:
+            last_line += _unzigzag(line - 1)
+            column, pos = _read_varint(data, pos)
+
+        # Os filhos estão na pilha, o último no topo
+        values = [None] * len(codes)
+        for i in range(len(codes) - 1, -1, -1):
+            if codes[i] == "n":
+                values[i] = pop()
+        for i, code in enumerate(codes):
+            if code == "s":
+                index, pos = _read_varint(data, pos)
+                values[i] = strings[index]
+            elif code == "i":
+                value, pos = _read_varint(data, pos)
+                values[i] = _unzigzag(value)
+            elif code == "b":
+                values[i] = data[pos] != 0
+                pos += 1
+        node = cls(*values)
+        if line:
+            node.line = last_line
+            if column:
+                node.column = column - 1
+        nodes.append(node)
+        push(node)
+    return stack
+
+
+@contextmanager
+def _gc_paused():
+    # A AST não tem ciclos; o coletor disparado pelas milhares de alocações
+    # só gastaria tempo percorrendo a árvore em construção
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+
+def dump(program, types=None):
+    """
+    Serializa `program` em bytes. Com `types` (o SemanticAnalyzer que já
+    verificou o programa, ou um ProgramTypes) grava também as assinaturas
+    das funções e os tipos das variáveis globais.
+    """
+    strings = {}
+
+    def string(text):
+        index = strings.get(text)
+        if index is None:
+            index = strings[text] = len(strings)
+        return index
+
+    out = bytearray()
+    with _gc_paused():
+        _encode_nodes(program, out, string)
+
+    flags = 0
+    section = bytearray()
+    if types is not None:
+        flags |= FLAG_TYPES
+        if not isinstance(types, ProgramTypes):
+            types = ProgramTypes(dict(types.functions), dict(types.env.vars))
+        _varint(section, len(types.functions))
+        for name, (ret_type, param_types) in types.functions.items():
+            _varint(section, string(name))
+            _varint(section, string(ret_type))
+            _varint(section, len(param_types))
+            for param_type in param_types:
+                _varint(section, string(param_type))
+        _varint(section, len(types.globals))
+        for name, type_name in types.globals.items():
+            _varint(section, string(name))
+            _varint(section, string(str(type_name)))
+            size = getattr(type_name, "size", None)
+            _varint(section, 0 if size is None else size + 1)
+
+    header = bytearray(MAGIC)
+    header.append(VERSION)
+    header.append(flags)
+    _varint(header, len(strings))
+    for text in strings:
+        encoded = text.encode("utf-8")
+        _varint(header, len(encoded))
+        header += encoded
+    return bytes(header + section + out)
+
+
+def load(data, types=False):
+    """
+    Reconstrói o Program serializado por `dump`. Com `types=True` retorna
+    (programa, ProgramTypes), ou (programa, None) se os tipos não foram
+    gravados.
+    """
+    data = bytes(data)
+    if data[:len(MAGIC)] != MAGIC:
+        raise FormatError("Os dados não são um programa MicroC serializado.")
+    pos = len(MAGIC)
+    if len(data) < pos + 2:
+        raise FormatError("Dados truncados.")
+    version, flags = data[pos], data[pos + 1]
+    if version != VERSION:
+        raise FormatError(f"Versão {version} do formato não suportada (esperada {VERSION}).")
+    try:
+        with _gc_paused():
+            program, program_types = _decode(data, pos + 2, flags)
+    except (IndexError, ValueError) as e:
+        raise FormatError(f"Dados truncados ou corrompidos: {e}") from e
+    return (program, program_types) if types else program
+
+
+def _decode(data, pos, flags):
+    count, pos = _read_varint(data, pos)
+    strings = []
+    for _ in range(count):
+        size, pos = _read_varint(data, pos)
+        strings.append(data[pos:pos + size].decode("utf-8"))
+        pos += size
+    if pos > len(data):
+        raise IndexError("tabela de strings incompleta")
+
+    program_types = None
+    if flags & FLAG_TYPES:
+        functions, global_types = {}, {}
+        count, pos = _read_varint(data, pos)
+        for _ in range(count):
+            name, pos = _read_varint(data, pos)
+            ret_type, pos = _read_varint(data, pos)
+            params, pos = _read_varint(data, pos)
+            param_types = []
+            for _ in range(params):
+                param_type, pos = _read_varint(data, pos)
+                param_types.append(strings[param_type])
+            functions[strings[name]] = (strings[ret_type], param_types)
+        count, pos = _read_varint(data, pos)
+        for _ in range(count):
+            name, pos = _read_varint(data, pos)
+            type_name, pos = _read_varint(data, pos)
+            size, pos = _read_varint(data, pos)
+            type_name = strings[type_name]
+            if size:
+                type_name = ArrayType(type_name[:-2], size - 1)
+            global_types[strings[name]] = type_name
+        program_types = ProgramTypes(functions, global_types)
+
+    stack = _decode_nodes(data, pos, strings)
+    if len(stack) != 1 or not isinstance(stack[0], Program):
+        raise ValueError("a pilha não terminou com um Program")
+    return stack[0], program_types
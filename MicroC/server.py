@@ -0,0 +1,281 @@
+"""
+Servidor MicroC de longa duração sobre um socket Unix.
+
+Mantém o parser (tabelas LALR da gramática) e um cache de programas já
+compilados aquecidos em um único processo, evitando pagar a inicialização do
+Python e do Lark a cada programa. O protocolo é JSON, um objeto por linha:
+
+    requisição: {"source": "...", "file": null, "entry": "main", "args": [],
+                 "max_steps": null, "max_depth": null}
+    resposta:   {"ok": true, "result": 0, "output": "...",
+                 "timings": {"compile": ..., "execute": ..., "total": ..., "cached": false}}
+                {"ok": false, "error": "...", "error_type": "StepLimitError", "output": "..."}
+
+`file` é o arquivo de onde o código-fonte veio: os imports são resolvidos a
+partir do diretório dele (sem `file`, a partir do diretório do servidor).
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+import time
+from collections import OrderedDict
+from contextlib import redirect_stdout
+
+from .eval import Interpreter, compile_source
+from .modules import ModuleCompiler
+from .output import BufferedWriter
+
+
+def _mtimes(paths):
+    """Data de modificação de cada arquivo (None se ele não existe mais)."""
+    mtimes = {}
+    for path in paths:
+        try:
+            mtimes[path] = os.stat(path).st_mtime_ns
+        except OSError:
+            mtimes[path] = None
+    return mtimes
+
+
+class CompileCache:
+    """
+    Cache LRU de programas compilados, indexado pelo hash do código-fonte e
+    do arquivo de origem. Um programa com imports é compilado de novo quando
+    algum dos módulos ligados a ele muda.
+    """
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+
+    def get(self, source, path=None):
+        """
+        Retorna (ast, diagnósticos, veio_do_cache). Os diagnósticos são as
+        mensagens impressas pelo front-end (ex.: erros semânticos). `path` é
+        o arquivo do código-fonte, base dos imports.
+        """
+        key = hashlib.sha256(f"{path or ''}\0{source}".encode("utf-8")).hexdigest()
+        entry = self.entries.get(key)
+        if entry is not None and _mtimes(entry[2]) == entry[2]:
+            self.entries.move_to_end(key)
+            return entry[:2] + (True,)
+
+        modules = ModuleCompiler()
+        out = io.StringIO()
+        with redirect_stdout(out):
+            ast = compile_source(source, path=path, modules=modules)
+        entry = (ast, out.getvalue(), _mtimes(modules.modules))
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+        return entry[:2] + (False,)
+
+
+def execute(request, cache):
+    """Atende uma requisição e devolve o dicionário de resposta."""
+    clock = time.perf_counter
+    start = clock()
+    output = io.StringIO()
+    try:
+        ast, diagnostics, cached = cache.get(request["source"], request.get("file"))
+        output.write(diagnostics)
+        compiled = clock()
+        interpreter = Interpreter(
+            ast,
+            max_steps=request.get("max_steps"),
+            max_depth=request.get("max_depth"),
+            output=BufferedWriter(output),
+        )
+        result = interpreter.visit_program(ast, request.get("entry", "main"), request.get("args", ()))
+        end = clock()
+    except Exception as e:
+        return {
+            "ok": False,
+            "error": str(e),
+            "error_type": type(e).__name__,
+            "output": output.getvalue(),
+        }
+    return {
+        "ok": True,
+        "result": result,
+        "output": output.getvalue(),
+        "timings": {
+            "compile": compiled - start,
+            "execute": end - compiled,
+            "total": end - start,
+            "cached": cached,
+        },
+    }
+
+
+class MicroCRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict) or "source" not in request:
+                    raise ValueError("requisição deve ser um objeto com o campo 'source'")
+            except ValueError as e:
+                response = {"ok": False, "error": f"Requisição inválida: {e}", "error_type": "ProtocolError"}
+            else:
+                response = self.server.dispatch(request)
+            self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+            self.wfile.flush()
+
+
+class MicroCServer(socketserver.UnixStreamServer):
+    """
+    Servidor que atende uma requisição por vez (a compilação ainda captura
+    as mensagens do front-end pela saída padrão). Com `fork=True` cada programa
+    executa em um processo filho, isolando falhas e uso de memória; a
+    compilação continua no processo pai para manter o cache aquecido.
+    """
+
+    def __init__(self, path, fork=False, cache_size=128):
+        if os.path.exists(path):
+            os.unlink(path)  # socket antigo de uma execução anterior
+        self.fork = fork
+        self.cache = CompileCache(cache_size)
+        super().__init__(path, MicroCRequestHandler)
+
+    def dispatch(self, request):
+        if not self.fork:
+            return execute(request, self.cache)
+
+        # Compila no pai (aquece o cache) e executa no filho
+        start = time.perf_counter()
+        try:
+            _, _, cached = self.cache.get(request["source"], request.get("file"))
+        except Exception:
+            cached = False  # o filho reporta o erro
+        compile_time = time.perf_counter() - start
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            try:
+                data = json.dumps(execute(request, self.cache)).encode("utf-8")
+                with os.fdopen(write_fd, "wb") as f:
+                    f.write(data)
+            finally:
+                os._exit(0)
+        os.close(write_fd)
+        with os.fdopen(read_fd, "rb") as f:
+            data = f.read()
+        _, status = os.waitpid(pid, 0)
+        if not data:
+            return {
+                "ok": False,
+                "error": f"Processo filho terminou sem resposta (status {status}).",
+                "error_type": "WorkerCrashed",
+            }
+        response = json.loads(data)
+        timings = response.get("timings")
+        if timings is not None:
+            # No filho o programa sempre está em cache; vale o que o pai fez
+            timings["cached"] = cached
+            timings["compile"] = compile_time
+            timings["total"] = compile_time + timings["execute"]
+        return response
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+
+
+def request(path, source, **options):
+    """
+    Envia um programa ao servidor em `path` e retorna a resposta (dict).
+
+    Opções aceitas: file, entry, args, max_steps, max_depth.
+    """
+    payload = dict(options, source=source)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(path)
+        sock.sendall(json.dumps(payload).encode("utf-8") + b"\n")
+        sock.shutdown(socket.SHUT_WR)
+        with sock.makefile("rb") as f:
+            return json.loads(f.readline())
+
+
+def make_serve_argparser():
+    parser = argparse.ArgumentParser(prog="microc serve", description="Servidor MicroC sobre socket Unix")
+    parser.add_argument("--socket", required=True, metavar="CAMINHO", help="Caminho do socket Unix.")
+    parser.add_argument("--fork", action="store_true", help="Executa cada programa em um processo filho.")
+    parser.add_argument("--cache-size", type=int, default=128, help="Programas mantidos no cache de compilação.")
+    return parser
+
+
+def make_client_argparser():
+    parser = argparse.ArgumentParser(prog="microc client", description="Cliente do servidor MicroC")
+    parser.add_argument("file", help="Arquivo de entrada")
+    parser.add_argument("--socket", required=True, metavar="CAMINHO", help="Caminho do socket Unix.")
+    parser.add_argument("--entry", default="main", help="Função de entrada (padrão: main).")
+    parser.add_argument(
+        "--arg",
+        dest="args",
+        type=int,
+        action="append",
+        default=[],
+        metavar="N",
+        help="Argumento inteiro da função de entrada (pode ser repetido).",
+    )
+    parser.add_argument("--max-steps", type=int, metavar="N", help="Orçamento de passos de execução.")
+    parser.add_argument("--max-depth", type=int, metavar="N", help="Profundidade máxima de chamadas.")
+    parser.add_argument("--json", action="store_true", help="Imprime a resposta JSON completa.")
+    return parser
+
+
+def serve_main(argv):
+    args = make_serve_argparser().parse_args(argv)
+    server = MicroCServer(args.socket, fork=args.fork, cache_size=args.cache_size)
+    # SIGTERM encerra como Ctrl+C, removendo o arquivo do socket
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    print(f"Servidor MicroC escutando em {args.socket}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def client_main(argv):
+    args = make_client_argparser().parse_args(argv)
+    try:
+        with open(args.file, "r") as f:
+            source = f.read()
+    except FileNotFoundError:
+        print(f"Arquivo {args.file} não encontrado.")
+        exit(1)
+
+    response = request(
+        args.socket,
+        source,
+        file=os.path.abspath(args.file),
+        entry=args.entry,
+        args=args.args,
+        max_steps=args.max_steps,
+        max_depth=args.max_depth,
+    )
+    if args.json:
+        print(json.dumps(response, indent=2))
+    else:
+        sys.stdout.write(response.get("output", ""))
+        if response["ok"]:
+            print(response["result"])
+        else:
+            print(f"{response['error_type']}: {response['error']}", file=sys.stderr)
+    if not response["ok"]:
+        exit(1)
@@ -1,13 +1,21 @@
-from lark import Transformer, Token
+from lark import Token
+from lark.visitors import Transformer_NonRecursive
 from .ast import *
+from .interning import Interner
 
 
-class MicroCTransformer(Transformer):
+class MicroCTransformer(Transformer_NonRecursive):
+    def __init__(self, interner=None):
+        super().__init__()
+        # Compartilha expressões puras repetidas e interna os identificadores
+        # (ver interning.py); um Interner novo por transformer por padrão
+        self.interner = interner if interner is not None else Interner()
+
     def NOT(self, token):
         return str(token)
     def BOOL(self, token):
         # token é 'true' ou 'false'
-        return BoolLiteral(token == 'true')
+        return self.interner.bool_literal(token == 'true')
     # Métodos para preservar os operadores como strings na AST
     def PLUS(self, token):
         return str(token)
@@ -45,32 +53,45 @@ class MicroCTransformer(Transformer):
     def AND(self, token):
         return str(token)
     """Transforma a árvore de parse do Lark em uma AST de MicroC."""
+
+    def _call_userfunc(self, tree, new_children=None):
+        # Copia a posição registrada pelo Lark (propagate_positions=True) para o nó
+        node = super()._call_userfunc(tree, new_children)
+        if isinstance(node, ASTNode) and node.line is None and not tree.meta.empty:
+            node.line = tree.meta.line
+            node.column = tree.meta.column
+        return node
     
     def _convert_to_ast(self, item):
         """Converte um item primitivo para um objeto da AST."""
         # Se já for um nó da AST, retorna direto
         if isinstance(item, (ASTNode, list)):
             return item
+        interner = self.interner
         if isinstance(item, int):
-            return IntLiteral(item)
+            return interner.int_literal(item)
         elif isinstance(item, str):
             if item == 'true':
-                return BoolLiteral(True)
+                return interner.bool_literal(True)
             elif item == 'false':
-                return BoolLiteral(False)
-            return Variable(item)
+                return interner.bool_literal(False)
+            return interner.variable(item)
         elif isinstance(item, Token):
             if item.type == 'INT':
-                return IntLiteral(int(item))
+                return interner.int_literal(int(item))
             elif item.type == 'BOOL':
-                return BoolLiteral(str(item) == 'true')
+                return interner.bool_literal(str(item) == 'true')
             elif item.type == 'ID':
-                return Variable(str(item))
+                return interner.variable(item)
         return item
     
     def program(self, items):
         return Program(items)
     
+    def import_decl(self, items):
+        # STRING inclui as aspas
+        return ImportDecl(str(items[0])[1:-1])
+
     def var_decl(self, items):
         # type_str, name = items
         # if isinstance(name, Token):
@@ -80,15 +101,19 @@ class MicroCTransformer(Transformer):
         type_str = items[0]
         name = items[1]
         if isinstance(name, Token):
-            name = str(name)
+            name = self.interner.name(name)
 
         initializer = items[2] if len(items) > 2 else None
         return VarDecl(type_str, name, initializer)
     
+    def array_decl(self, items):
+        type_str, name, size = items
+        return ArrayDecl(type_str, self.interner.name(name), size)
+
     def fun_decl(self, items):
         type_str, name, params, body = items
         if isinstance(name, Token):
-            name = str(name)
+            name = self.interner.name(name)
         return FunDecl(type_str, name, params, body)
     
     def params(self, items):
@@ -97,9 +122,14 @@ class MicroCTransformer(Transformer):
     def param(self, items):
         type_str, name = items
         if isinstance(name, Token):
-            name = str(name)
+            name = self.interner.name(name)
         return Param(type_str, name)
     
+    def array_param(self, items):
+        # Parâmetros vetor têm o tipo "int[]"
+        type_str, name = items
+        return Param(type_str + "[]", self.interner.name(name))
+
     def type(self, items):
         if items and len(items) > 0:
             item = items[0]
@@ -135,6 +165,25 @@ class MicroCTransformer(Transformer):
         condition = self._convert_to_ast(condition)
         return WhileStmt(condition, body)
     
+    def for_stmt(self, items):
+        init, condition, update, body = items
+        return ForStmt(init, condition, update, body)
+
+    def for_init(self, items):
+        if not items:
+            return None
+        if len(items) == 3:
+            # Declaração: tipo nome = expressão
+            type_str, name, value = items
+            return VarDecl(type_str, self.interner.name(name), self._convert_to_ast(value))
+        return self._convert_to_ast(items[0])
+
+    def for_cond(self, items):
+        return self._convert_to_ast(items[0]) if items else None
+
+    def for_update(self, items):
+        return self._convert_to_ast(items[0]) if items else None
+
     def return_stmt(self, items):
         if items:
             expr = self._convert_to_ast(items[0])
@@ -146,7 +195,7 @@ class MicroCTransformer(Transformer):
             # É uma atribuição: ID = assignment
             name, value = items
             if isinstance(name, Token):
-                name = str(name)
+                name = self.interner.name(name)
             # O lado direito pode ser uma lista se for uma chamada de função mal processada
             if isinstance(value, list) and len(value) == 1:
                 value = value[0]
@@ -159,6 +208,25 @@ class MicroCTransformer(Transformer):
                 expr = expr[0]
             return expr
     
+    def compound_assignment(self, items):
+        name, op, value = items
+        # "+=" -> '+'
+        return CompoundAssignment(self.interner.name(name), str(op)[0], self._convert_to_ast(value))
+
+    def postfix_increment(self, items):
+        name, op = items
+        return Increment(self.interner.name(name), str(op), prefix=False)
+
+    def prefix_increment(self, items):
+        op, name = items
+        return Increment(self.interner.name(name), str(op), prefix=True)
+
+    def array_assignment(self, items):
+        name, index, value = items
+        index = self._convert_to_ast(index)
+        value = self._convert_to_ast(value)
+        return ArrayAssignment(self.interner.name(name), index, value)
+
     def logic_or(self, items):
         return self._create_binary_op(items, "||")
     
@@ -178,7 +246,7 @@ class MicroCTransformer(Transformer):
         while i + 1 < len(items):
             op = items[i]
             right = self._convert_to_ast(items[i + 1])
-            result = BinaryOp(result, op, right)
+            result = self.interner.binary_op(result, op, right)
             i += 2
         return result
         
@@ -199,21 +267,25 @@ class MicroCTransformer(Transformer):
             # Pode ser negação (!factor) ou chamada de função (ID args)
             if items[0] == '!':
                 operand = self._convert_to_ast(items[1])
-                return UnaryOp('!', operand)
+                return self.interner.unary_op('!', operand)
             else:
                 # Chamada de função: ID args
                 name, args = items
                 if isinstance(name, Token):
-                    name = str(name)
+                    name = self.interner.name(name)
                 result = FunctionCall(name, args)
                 return result
         else:
             # Expressão entre parênteses já processada
             return items[0]
         
+    def array_index(self, items):
+        name, index = items
+        return ArrayIndex(self.interner.name(name), self._convert_to_ast(index))
+
     def fun_call(self, items):
         # print("items do fun_call", items)
-        name = str(items[0])
+        name = self.interner.name(items[0])
         args = items[1] if len(items) > 1 else []
         return FunctionCall(name=name, args=args)
     
@@ -236,7 +308,7 @@ class MicroCTransformer(Transformer):
             left = self._convert_to_ast(items[0])
             right = self._convert_to_ast(items[1])
             op = operators[0] if isinstance(operators, str) else operators[0]
-            result = BinaryOp(left, op, right)
+            result = self.interner.binary_op(left, op, right)
             return result
         result = self._convert_to_ast(items[0])
         i = 1
@@ -244,7 +316,7 @@ class MicroCTransformer(Transformer):
             operator = str(items[i])
             right = items[i + 1]
             right = self._convert_to_ast(right)
-            result = BinaryOp(result, operator, right)
+            result = self.interner.binary_op(result, operator, right)
             i += 2
         return result
     
@@ -252,4 +324,4 @@ class MicroCTransformer(Transformer):
         return int(token)
 
     def ID(self, token):
-        return str(token)
+        return self.interner.name(token)
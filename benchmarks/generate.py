@@ -0,0 +1,34 @@
+"""
+Gerador de programas MicroC grandes e determinísticos para os benchmarks.
+"""
+
+
+def generate_program(functions=300, terms=40):
+    """
+    Gera um programa com `functions` funções, cada uma com uma expressão de
+    `terms` parcelas, e um main que chama todas e imprime a soma.
+    """
+    lines = []
+    for k in range(functions):
+        body = " + ".join(f"x * {(k + t) % 7 + 1}" for t in range(terms))
+        lines.append(f"int f{k}(int x) {{")
+        lines.append(f"    int y = {body};")
+        lines.append(f"    if (y > {k}) {{")
+        lines.append(f"        return y - {k};")
+        lines.append("    }")
+        lines.append("    return y;")
+        lines.append("}")
+        lines.append("")
+
+    lines.append("int main() {")
+    lines.append("    int total = 0;")
+    for k in range(functions):
+        lines.append(f"    total = total + f{k}({k % 10});")
+    lines.append("    print(total);")
+    lines.append("    return 0;")
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+
+if __name__ == "__main__":
+    print(generate_program(), end="")
@@ -0,0 +1,244 @@
+"""
+Executor dos benchmarks de MicroC.
+
+Mede cada etapa do pipeline (parse, transformação, análise semântica e
+execução) e o tempo ponta a ponta de cada workload, com aquecimento, várias
+repetições e estatísticas. Antes de medir, confere a saída de cada workload
+com a saída de referência (golden) guardada em `<nome>.out`.
+
+Uso:
+    python -m benchmarks.run                        # roda tudo e imprime a tabela
+    python -m benchmarks.run fib calls -r 10        # só alguns workloads
+    python -m benchmarks.run --engine jit           # mede outro interpretador
+    python -m benchmarks.run --save-baseline base.json
+    python -m benchmarks.run --baseline base.json --threshold 0.10
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+from contextlib import redirect_stdout
+
+from MicroC.pipeline import Pipeline
+
+from .generate import generate_program
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+STAGES = ["parse", "transform", "semantic", "execute", "total"]
+
+# Workloads gerados em tempo de execução (nome -> função que devolve o código)
+GENERATED = {
+    "generated": lambda: generate_program(functions=150, terms=40),
+}
+
+
+def list_workloads():
+    names = [name[:-3] for name in os.listdir(BENCH_DIR) if name.endswith(".mc")]
+    return sorted(names) + sorted(GENERATED)
+
+
+def load_source(name):
+    if name in GENERATED:
+        return GENERATED[name]()
+    with open(os.path.join(BENCH_DIR, name + ".mc"), encoding="utf-8") as f:
+        return f.read()
+
+
+def golden_path(name):
+    return os.path.join(BENCH_DIR, name + ".out")
+
+
+# Fase do pipeline.Pipeline -> etapa nos resultados (e nas baselines salvas)
+PHASE_STAGES = {
+    "parse": "parse",
+    "transformação": "transform",
+    "análise": "semantic",
+    "execução": "execute",
+}
+
+
+def run_once(source, engine="tree"):
+    """
+    Executa o pipeline completo uma vez.
+
+    Retorna (tempos por etapa, saída produzida). A saída é a mesma de
+    `microc arquivo.mc`: os prints do programa seguidos do valor de main.
+    `engine` escolhe o interpretador, como `microc --engine`.
+    """
+    pipeline = Pipeline()
+    out = io.StringIO()
+    with redirect_stdout(out):
+        ast = pipeline.compile(source)
+        print(pipeline.execute(ast, engine))
+    times = {PHASE_STAGES[phase]: elapsed for phase, elapsed in pipeline.timings.items()}
+    times["total"] = pipeline.total
+    return times, out.getvalue()
+
+
+def summarize(samples):
+    return {
+        "min": min(samples),
+        "median": statistics.median(samples),
+        "mean": statistics.mean(samples),
+        "stdev": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        "runs": len(samples),
+    }
+
+
+def bench(name, warmup=1, repeat=5, engine="tree"):
+    """Mede um workload e retorna suas estatísticas por etapa."""
+    source = load_source(name)
+    for _ in range(warmup):
+        run_once(source, engine)
+    samples = {stage: [] for stage in STAGES}
+    for _ in range(repeat):
+        times, _ = run_once(source, engine)
+        for stage in STAGES:
+            samples[stage].append(times[stage])
+
+    stats = {stage: summarize(samples[stage]) for stage in STAGES}
+    total = stats["total"]["median"]
+    front = stats["parse"]["median"] + stats["transform"]["median"] + stats["semantic"]["median"]
+    stats["throughput"] = {
+        "runs_per_s": 1.0 / total if total else 0.0,
+        "frontend_kb_per_s": len(source) / 1024 / front if front else 0.0,
+        "source_bytes": len(source),
+    }
+    return stats
+
+
+def check_golden(name, update=False, engine="tree"):
+    """Confere (ou regrava) a saída de referência. Retorna uma mensagem de erro ou None."""
+    _, output = run_once(load_source(name), engine)
+    path = golden_path(name)
+    if update:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(output)
+        return None
+    if not os.path.exists(path):
+        return f"{name}: saída de referência {path} não encontrada"
+    with open(path, encoding="utf-8") as f:
+        expected = f.read()
+    if output != expected:
+        return f"{name}: saída difere da referência\n  esperado: {expected!r}\n  obtido:   {output!r}"
+    return None
+
+
+def compare(results, baseline, threshold, min_time=0.001):
+    """
+    Compara as medianas com a baseline.
+
+    Retorna a lista de regressões: etapas cuja mediana ficou mais de
+    `threshold` (fração) acima da baseline. Etapas mais rápidas que `min_time`
+    segundos na baseline são ignoradas, pois o ruído domina.
+    """
+    regressions = []
+    for name, stats in results.items():
+        base = baseline.get("workloads", {}).get(name)
+        if base is None:
+            continue
+        for stage in STAGES:
+            old = base[stage]["median"]
+            new = stats[stage]["median"]
+            if old < min_time:
+                continue
+            change = (new - old) / old
+            if change > threshold:
+                regressions.append((name, stage, old, new, change))
+    return regressions
+
+
+def format_table(results):
+    lines = [f"{'workload':<14} {'etapa':<10} {'mediana(ms)':>12} {'mín(ms)':>10} {'desvio(ms)':>11}"]
+    for name, stats in results.items():
+        for stage in STAGES:
+            s = stats[stage]
+            lines.append(
+                f"{name:<14} {stage:<10} {s['median'] * 1000:>12.3f} "
+                f"{s['min'] * 1000:>10.3f} {s['stdev'] * 1000:>11.3f}"
+            )
+        tp = stats["throughput"]
+        lines.append(
+            f"{name:<14} {'vazão':<10} {tp['runs_per_s']:>9.2f} execuções/s, "
+            f"front-end {tp['frontend_kb_per_s']:.1f} KB/s"
+        )
+    return "\n".join(lines)
+
+
+def make_argparser():
+    parser = argparse.ArgumentParser(description="Benchmarks do interpretador MicroC")
+    parser.add_argument("workloads", nargs="*", help="Workloads a executar (padrão: todos).")
+    parser.add_argument("-w", "--warmup", type=int, default=1, help="Execuções de aquecimento.")
+    parser.add_argument("-r", "--repeat", type=int, default=5, help="Execuções medidas.")
+    parser.add_argument(
+        "--engine",
+        choices=["tree", "stack", "jit"],
+        default="tree",
+        help="Interpretador medido (padrão: tree).",
+    )
+    parser.add_argument("--json", metavar="ARQ", help="Salva os resultados em JSON.")
+    parser.add_argument("--save-baseline", metavar="ARQ", help="Salva os resultados como baseline.")
+    parser.add_argument("--baseline", metavar="ARQ", help="Compara com uma baseline salva.")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.10,
+        help="Regressão máxima tolerada, como fração da mediana (padrão: 0.10).",
+    )
+    parser.add_argument(
+        "--min-time",
+        type=float,
+        default=0.001,
+        help="Ignora etapas mais rápidas que isso (segundos) na baseline (padrão: 0.001).",
+    )
+    parser.add_argument(
+        "--update-golden",
+        action="store_true",
+        help="Regrava as saídas de referência em vez de conferi-las.",
+    )
+    return parser
+
+
+def main(argv=None):
+    args = make_argparser().parse_args(argv)
+    names = args.workloads or list_workloads()
+
+    errors = [e for e in (check_golden(name, args.update_golden, args.engine) for name in names) if e]
+    if errors:
+        print("\n".join(errors), file=sys.stderr)
+        return 1
+
+    results = {name: bench(name, args.warmup, args.repeat, args.engine) for name in names}
+    print(format_table(results))
+
+    data = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "workloads": results,
+    }
+    for path in (args.json, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold, args.min_time)
+        for name, stage, old, new, change in regressions:
+            print(
+                f"REGRESSÃO {name}/{stage}: {old * 1000:.3f} ms -> {new * 1000:.3f} ms (+{change:.1%})",
+                file=sys.stderr,
+            )
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,7 @@
 import pytest
 from MicroC.eval import eval
 from MicroC.erros import *
+from MicroC.runtime_errors import *
 
 # Teste simples: soma
 microc_sum = '''
@@ -834,3 +835,1822 @@ def test_valid_code_still_works():
     # Este não deve gerar erro
     result = eval(microc_valid)
     assert result == 20
+
+# ===========================================
+# TESTES PARA O PROFILER
+# ===========================================
+
+microc_profile = '''
+int fib(int n) {
+    if (n <= 1) {
+        return n;
+    }
+    return fib(n - 1) + fib(n - 2);
+}
+
+int main() {
+    int i = 0;
+    while (i < 3) {
+        i = i + 1;
+    }
+    return fib(5);
+}
+'''
+
+def test_profile_function_stats():
+    from MicroC.profiler import profile
+
+    result, report = profile(microc_profile)
+    assert result == 5
+
+    stats = {f.name: f for f in report.functions}
+    assert stats["fib"].calls == 15
+    assert stats["main"].calls == 1
+    # main inclui o tempo de fib, que é contado só uma vez apesar da recursão
+    assert stats["main"].inclusive >= stats["fib"].inclusive
+    assert stats["fib"].inclusive >= stats["fib"].exclusive
+    total = sum(report.self_percent(f) for f in report.functions)
+    assert 90.0 < total <= 100.0
+
+def test_profile_statement_hits():
+    from MicroC.profiler import profile
+
+    _, report = profile(microc_profile)
+    hits = {(s.line, s.kind): s.hits for s in report.statements}
+    assert hits[(3, "IfStmt")] == 15
+    assert hits[(11, "WhileStmt")] == 1
+    assert hits[(11, "Block")] == 3  # corpo do while
+    assert hits[(12, "ExprStmt")] == 3
+
+    data = report.to_dict()
+    assert {"total_time", "functions", "statements"} <= set(data)
+
+# ===========================================
+# TESTES PARA OS BENCHMARKS
+# ===========================================
+
+def test_benchmark_golden_output():
+    from benchmarks.run import check_golden
+
+    assert check_golden("deep_scopes") is None
+    assert check_golden("fib") is None
+
+def test_benchmark_regression_detection():
+    from benchmarks.run import STAGES, compare
+
+    def stats(median):
+        return {stage: {"median": median} for stage in STAGES}
+
+    baseline = {"workloads": {"fib": stats(0.100), "calls": stats(0.100)}}
+    results = {"fib": stats(0.105), "calls": stats(0.150)}
+    regressions = compare(results, baseline, threshold=0.10)
+    assert {name for name, *_ in regressions} == {"calls"}
+    assert compare(results, baseline, threshold=0.60) == []
+
+def test_division_and_not_equal():
+    microc = '''
+    int main() {
+        int x = 7 / 2;
+        if (x != 3) {
+            return 0;
+        }
+        return x * 10 / 5;
+    }
+    '''
+    assert eval(microc) == 6
+
+# ===========================================
+# TESTES PARA LIMITES DE EXECUÇÃO
+# ===========================================
+
+microc_infinite_loop = '''
+int main() {
+    int i = 0;
+    while (true) {
+        i = i + 1;
+    }
+    return i;
+}
+'''
+
+def test_step_limit_stops_infinite_loop():
+    with pytest.raises(StepLimitError) as exc_info:
+        eval(microc_infinite_loop, max_steps=500)
+
+    error = exc_info.value
+    assert isinstance(error, MicroCRuntimeError)
+    assert error.limit == 500
+    assert error.function == "main"
+    assert error.line == 4
+
+def test_step_limit_counts_calls():
+    # fib(10) faz 177 chamadas: cabe em 200 passos, mas não em 100
+    assert eval(microc_fib_steps, max_steps=200) == 55
+    with pytest.raises(StepLimitError):
+        eval(microc_fib_steps, max_steps=100)
+
+microc_fib_steps = '''
+int fib(int n) {
+    if (n <= 1) {
+        return n;
+    }
+    return fib(n - 1) + fib(n - 2);
+}
+
+int main() {
+    return fib(10);
+}
+'''
+
+def test_call_depth_limit():
+    assert eval(microc_fib_steps, max_depth=10) == 55
+    with pytest.raises(CallDepthError) as exc_info:
+        eval(microc_fib_steps, max_depth=5)
+    assert exc_info.value.function == "fib"
+
+# ===========================================
+# TESTES PARA O SERVIDOR MICROC
+# ===========================================
+
+@pytest.fixture(params=[False, True], ids=["inline", "fork"])
+def microc_server(request, tmp_path):
+    import threading
+    from MicroC.server import MicroCServer
+
+    path = str(tmp_path / "microc.sock")
+    server = MicroCServer(path, fork=request.param)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield path
+    server.shutdown()
+    server.server_close()
+
+def test_server_runs_program(microc_server):
+    from MicroC.server import request
+
+    response = request(microc_server, microc_print_loop)
+    assert response["ok"]
+    assert response["result"] == 3
+    assert response["output"] == "0\n1\n2\n"
+    assert not response["timings"]["cached"]
+
+    # A segunda requisição com o mesmo código reaproveita a compilação
+    response = request(microc_server, microc_print_loop)
+    assert response["timings"]["cached"]
+
+def test_server_entry_point_and_budget(microc_server):
+    from MicroC.server import request
+
+    response = request(microc_server, microc_fib_steps, entry="fib", args=[12])
+    assert response["ok"]
+    assert response["result"] == 144
+
+    response = request(microc_server, microc_infinite_loop, max_steps=100)
+    assert not response["ok"]
+    assert response["error_type"] == "StepLimitError"
+
+def test_server_resolves_imports_from_path(microc_server, tmp_path):
+    from MicroC.server import request
+
+    lib = tmp_path / "lib" / "mat.mc"
+    lib.parent.mkdir()
+    lib.write_text(microc_lib)
+    main = str(tmp_path / "main.mc")
+    response = request(microc_server, microc_main_import, file=main)
+    assert response["ok"], response
+    assert (response["result"], response["output"]) == (25, "2\n")
+    assert request(microc_server, microc_main_import, file=main)["timings"]["cached"]
+
+    # Mudou um módulo importado: o programa é compilado de novo
+    lib.write_text(microc_lib.replace("x * x", "x * x + 1"))
+    os.utime(lib, ns=(0, 0))
+    response = request(microc_server, microc_main_import, file=main)
+    assert not response["timings"]["cached"]
+    assert response["result"] == 27
+
+# ===========================================
+# TESTES PARA A EXECUÇÃO COOPERATIVA (ASYNCIO)
+# ===========================================
+
+microc_count_to = '''
+int main() {
+    int i = 0;
+    while (i < 5) {
+        print(i);
+        i = i + 1;
+    }
+    return i;
+}
+'''
+
+def test_run_async_streams_output():
+    import asyncio
+    from MicroC.cooperative import run_async
+
+    seen = []
+
+    async def on_output(value):
+        seen.append(value)
+
+    result = asyncio.run(run_async(microc_count_to, slice_steps=2, on_output=on_output))
+    assert result == 5
+    assert seen == [0, 1, 2, 3, 4]
+
+def test_run_async_interleaves_programs():
+    import asyncio
+    from MicroC.cooperative import run_async
+
+    events = []
+
+    async def ticker():
+        for _ in range(3):
+            events.append("tick")
+            await asyncio.sleep(0)
+
+    async def main():
+        return await asyncio.gather(
+            run_async(microc_count_to, slice_steps=1, on_output=lambda v: events.append(("a", v))),
+            run_async(microc_count_to, slice_steps=1, on_output=lambda v: events.append(("b", v))),
+            ticker(),
+        )
+
+    results = asyncio.run(main())
+    assert results[:2] == [5, 5]
+    # Nenhum programa roda até o fim antes do outro começar
+    assert events.index(("b", 0)) < events.index(("a", 4))
+    assert events.index("tick") < events.index(("a", 4))
+
+def test_run_async_budget_and_cancel():
+    import asyncio
+    from MicroC.cooperative import run_async
+
+    with pytest.raises(StepLimitError):
+        asyncio.run(run_async(microc_infinite_loop, slice_steps=10, max_steps=95))
+
+    async def cancel_infinite():
+        task = asyncio.ensure_future(run_async(microc_infinite_loop, slice_steps=10))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_infinite())
+
+# ===========================================
+# TESTES PARA OS SINKS DE SAÍDA
+# ===========================================
+
+def test_list_collector_and_quiet_eval(capsys):
+    from MicroC.output import ListCollector
+
+    sink = ListCollector()
+    result = eval(microc_print_loop, output=sink, quiet=True)
+    assert result == 3
+    assert sink.values == [0, 1, 2]
+    assert capsys.readouterr().out == ""
+
+def test_buffered_writer_flushes_in_blocks():
+    import io
+    from MicroC.output import BufferedWriter
+
+    class CountingStream(io.StringIO):
+        writes = 0
+        def write(self, text):
+            CountingStream.writes += 1
+            return super().write(text)
+
+    stream = CountingStream()
+    sink = BufferedWriter(stream, flush_size=4)
+    eval(microc_count_to, output=sink, quiet=True)
+    assert stream.getvalue() == "0\n1\n2\n3\n4\n"
+    # Cada descarga junta dois valores (4 caracteres), mais a descarga final
+    assert CountingStream.writes == 3
+
+def test_file_writer(tmp_path):
+    from MicroC.output import FileWriter
+
+    path = tmp_path / "saida.txt"
+    sink = FileWriter(str(path))
+    eval(microc_count_to, output=sink, quiet=True)
+    sink.close()
+    assert path.read_text() == "0\n1\n2\n3\n4\n"
+
+# ===========================================
+# TESTES PARA VETORES
+# ===========================================
+
+microc_array_sum = '''
+int data[5];
+
+int sum(int v[], int n) {
+    int total = 0;
+    int i = 0;
+    while (i < n) {
+        total = total + v[i];
+        i = i + 1;
+    }
+    return total;
+}
+
+int main() {
+    int i = 0;
+    while (i < 5) {
+        data[i] = i * i;
+        i = i + 1;
+    }
+    return sum(data, 5);
+}
+'''
+
+def test_array_global_and_parameter():
+    assert eval(microc_array_sum) == 30
+
+def test_array_passed_by_reference():
+    microc = '''
+    void fill(int v[], int value) {
+        v[0] = value;
+        v[1] = value + 1;
+    }
+
+    int main() {
+        int v[2];
+        fill(v, 10);
+        return v[0] + v[1];
+    }
+    '''
+    assert eval(microc) == 21
+
+def test_array_storage_is_contiguous():
+    from array import array
+    from MicroC.eval import Interpreter, compile_source
+
+    ast = compile_source(microc_array_sum)
+    interpreter = Interpreter(ast)
+    interpreter.visit_program(ast)
+    assert isinstance(interpreter.env.get("data"), array)
+    assert list(interpreter.env.get("data")) == [0, 1, 4, 9, 16]
+
+def test_array_runtime_bounds_check():
+    microc = '''
+    int main() {
+        int v[3];
+        int i = 3;
+        return v[i];
+    }
+    '''
+    with pytest.raises(IndexOutOfBoundsError) as exc_info:
+        eval(microc)
+    assert exc_info.value.index == 3
+    assert exc_info.value.size == 3
+
+def test_array_semantic_checks():
+    from MicroC.parser import parse_source
+    from MicroC.semantic import SemanticAnalyzer
+    from MicroC.transformer import MicroCTransformer
+
+    def check(source):
+        ast = MicroCTransformer().transform(parse_source(source))
+        SemanticAnalyzer().visit_program(ast)
+
+    check("int main() { int v[3]; v[2] = 1; return v[0]; }")
+    with pytest.raises(SemanticError, match="fora dos limites"):
+        check("int main() { int v[3]; return v[3]; }")
+    with pytest.raises(SemanticError, match="não é um vetor"):
+        check("int main() { int x; return x[0]; }")
+    with pytest.raises(SemanticError, match="vetor 'v' inteiro"):
+        check("int main() { int v[3]; int w[3]; v = w; return 0; }")
+    with pytest.raises(SemanticError):
+        check("int main() { int v[3]; v[0] = true; return 0; }")
+
+# ===========================================
+# TESTES PARA ATRIBUIÇÃO COMPOSTA, ++/-- E FOR
+# ===========================================
+
+def test_compound_assignment():
+    microc = '''
+    int main() {
+        int x = 10;
+        x += 5;
+        x -= 3;
+        x *= 4;
+        x /= 6;
+        return x;
+    }
+    '''
+    assert eval(microc) == 8
+
+def test_increment_prefix_and_postfix():
+    microc = '''
+    int g = 5;
+
+    int main() {
+        int a = g++;
+        int b = ++g;
+        int c = g--;
+        int d = --g;
+        return a * 1000 + b * 100 + c * 10 + d;
+    }
+    '''
+    assert eval(microc) == 5000 + 700 + 70 + 5
+
+def test_for_loop_sum_and_scope():
+    microc = '''
+    int main() {
+        int i = 100;
+        int s = 0;
+        for (int i = 0; i < 5; i++) {
+            s += i;
+        }
+        for (; s < 20;) {
+            s++;
+        }
+        return s + i;
+    }
+    '''
+    assert eval(microc) == 120
+
+def test_for_loop_respects_step_limit():
+    microc = '''
+    int main() {
+        for (;;) {
+        }
+        return 0;
+    }
+    '''
+    with pytest.raises(StepLimitError):
+        eval(microc, max_steps=50)
+
+def test_compound_assignment_type_errors():
+    from MicroC.parser import parse_source
+    from MicroC.semantic import SemanticAnalyzer
+    from MicroC.transformer import MicroCTransformer
+
+    def check(source):
+        ast = MicroCTransformer().transform(parse_source(source))
+        SemanticAnalyzer().visit_program(ast)
+
+    with pytest.raises(SemanticError):
+        check("int main() { bool b = true; b += 1; return 0; }")
+    with pytest.raises(SemanticError):
+        check("int main() { bool b = true; b++; return 0; }")
+    with pytest.raises(SemanticError, match="for deve ser bool"):
+        check("int main() { for (int i = 0; i; i++) {} return 0; }")
+
+# ===========================================
+# TESTES PARA O BACK-END C (microc build)
+# ===========================================
+
+import glob
+import io
+import os
+import shutil
+import subprocess
+
+needs_cc = pytest.mark.skipif(shutil.which("cc") is None, reason="compilador C não disponível")
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROGRAMS = {
+    os.path.relpath(path, _ROOT): path
+    for pattern in ("examples/*.mc", "benchmarks/*.mc")
+    for path in sorted(glob.glob(os.path.join(_ROOT, pattern)))
+}
+PROGRAMS.update(
+    (name, value) for name, value in list(globals().items())
+    if name.startswith("microc_") and isinstance(value, str)
+)
+
+def _interpreter_output(source):
+    """Saída de `python -m MicroC` para o programa, ou None se ele falha."""
+    from MicroC.output import BufferedWriter
+    out = io.StringIO()
+    try:
+        result = eval(source, max_steps=10**6, output=BufferedWriter(out), quiet=True)
+    except Exception:
+        return None
+    return out.getvalue() + f"{result}\n"
+
+def _native_run(source, tmp_path):
+    from MicroC.codegen import build
+    exe = str(tmp_path / "prog")
+    build(source, exe)
+    return subprocess.run([exe], capture_output=True, text=True, timeout=30)
+
+@needs_cc
+@pytest.mark.parametrize("name", sorted(PROGRAMS))
+def test_native_matches_interpreter(name, tmp_path):
+    from MicroC.eval import compile_source
+    source = PROGRAMS[name]
+    if os.path.exists(source):
+        with open(source) as f:
+            source = f.read()
+    try:
+        compile_source(source, strict=True)
+    except Exception:
+        pytest.skip("programa inválido (erro sintático ou semântico)")
+    expected = _interpreter_output(source)
+    if expected is None:
+        pytest.skip("programa falha no interpretador")
+    proc = _native_run(source, tmp_path)
+    assert proc.returncode == 0, proc.stderr
+    assert proc.stdout == expected
+
+@needs_cc
+def test_native_evaluation_order_and_division(tmp_path):
+    microc = '''
+    int g = 1;
+    int bump() { g = g + 10; return g; }
+
+    int main() {
+        int x = 5;
+        print(g + bump());
+        print(bump() + g);
+        x = x++;
+        print(x);
+        print((0 - 7) / 2);
+        print(x > 3 && !(x > 10));
+        { int x = x + 1; print(x); }
+        return bump();
+    }
+    '''
+    expected = _interpreter_output(microc)
+    assert expected == "12\n42\n5\n-4\n1\n6\n31\n"
+    assert _native_run(microc, tmp_path).stdout == expected
+
+@needs_cc
+def test_native_runtime_errors(tmp_path):
+    microc = '''
+    int main() {
+        int v[3];
+        int i = 3;
+        print(1);
+        v[i] = 2;
+        return 0;
+    }
+    '''
+    proc = _native_run(microc, tmp_path)
+    assert proc.returncode == 1
+    assert proc.stdout == "1\n"
+    assert "fora dos limites do vetor 'v' (tamanho 3)" in proc.stderr
+
+def test_build_rejects_invalid_program(tmp_path):
+    from MicroC.codegen import BuildError, build
+    with pytest.raises(SemanticError):
+        build("int main() { return x; }", str(tmp_path / "prog"))
+    with pytest.raises(BuildError, match="main"):
+        build("int f() { return 1; }", str(tmp_path / "prog"))
+
+@needs_cc
+def test_native_bools_and_main_scope(tmp_path):
+    microc = '''
+    int g = 1;
+    bool b;
+    int f() { return g; }
+
+    int main() {
+        int g = 7;
+        bool t = true;
+        print(t);
+        print(!t);
+        print(t && true);
+        print(b);
+        print(1 < 2 || false);
+        if (t && !b) print(f());
+        return f();
+    }
+    '''
+    expected = _interpreter_output(microc)
+    assert expected == "True\n0\n1\n0\n1\n7\n7\n"
+    assert _native_run(microc, tmp_path).stdout == expected
+
+def test_build_rejects_main_call_with_global_redeclared(tmp_path):
+    from MicroC.codegen import BuildError, build
+    microc = "int g = 1; int main() { int g = 2; if (g > 5) return main(); return g; }"
+    with pytest.raises(BuildError, match="main"):
+        build(microc, str(tmp_path / "prog"))
+
+# ===========================================
+# TESTES PARA OS VISITANTES SEM RECURSÃO
+# ===========================================
+
+from MicroC.ast import ASTPrinter
+from MicroC.eval import compile_source
+
+DEEP = 20000  # bem acima do limite de recursão padrão do Python
+
+def _run_source(source, engine, **options):
+    from MicroC.output import ListCollector
+    sink = ListCollector()
+    result = eval(source, output=sink, quiet=True, engine=engine, **options)
+    return sink.values, result
+
+@pytest.mark.parametrize("name", sorted(PROGRAMS))
+def test_stack_engine_matches_tree(name):
+    source = PROGRAMS[name]
+    if os.path.exists(source):
+        with open(source) as f:
+            source = f.read()
+    try:
+        compile_source(source, strict=True)
+    except Exception:
+        pytest.skip("programa inválido (erro sintático ou semântico)")
+    try:
+        expected = _run_source(source, "tree", max_steps=10**5)
+    except Exception as e:
+        with pytest.raises(type(e)):
+            _run_source(source, "stack", max_steps=10**5)
+        return
+    assert _run_source(source, "stack", max_steps=10**5) == expected
+
+def test_deep_expression_chain():
+    microc = "int main() { int a = 1; return " + " + ".join(["a"] * DEEP) + "; }"
+    ast = compile_source(microc, strict=True)
+    text = ast.accept(ASTPrinter())
+    assert text.count("BinaryOp(") == DEEP - 1
+    assert _run_source(microc, "stack") == ([], DEEP)
+
+def test_deep_nesting_parens_not_and_blocks():
+    parens = "int main() { return " + "(" * DEEP + "1" + ")" * DEEP + "; }"
+    nots = "bool main() { return " + "!" * DEEP + "true; }"
+    blocks = "int main() { int a = 0; " + "{" * DEEP + "a++;" + "}" * DEEP + " return a; }"
+    assert _run_source(parens, "stack")[1] == 1
+    assert _run_source(nots, "stack")[1] == 1
+    assert _run_source(blocks, "stack")[1] == 1
+
+def test_generate_c_deep_expressions():
+    from MicroC.codegen import generate_c
+    chain = "int f(int x) { return x; } int main() { int a = 1; a = " + " + ".join(["a"] * DEEP) + " + f(a); return a; }"
+    code = generate_c(chain)
+    # A chamada tem efeitos e a atribuição lê `a`: o lado esquerdo vai para um temporário
+    assert code.count("v_a + v_a") == 1 and "f_f(v_a)" in code and "mc_t1" in code
+    nots = generate_c("bool main() { return " + "!" * DEEP + "true; }")
+    assert nots.count("^ 1") == DEEP
+
+def test_stack_engine_limits():
+    with pytest.raises(StepLimitError):
+        _run_source(microc_infinite_loop, "stack", max_steps=100)
+    with pytest.raises(CallDepthError):
+        _run_source(microc_fib_steps, "stack", max_depth=3)
+
+# ===========================================
+# TESTES PARA A PILHA DE CHAMADAS EXPLÍCITA
+# ===========================================
+
+microc_recursive_sum = '''
+int sum(int n) {
+    if (n == 0) {
+        return 0;
+    }
+    return n + sum(n - 1);
+}
+
+int main() {
+    return sum(%d);
+}
+'''
+
+def test_deep_recursion_uses_heap_frames():
+    assert _run_source(microc_recursive_sum % 5000, "stack")[1] == 5000 * 5001 // 2
+    with pytest.raises(RecursionError):
+        eval(microc_recursive_sum % 5000, quiet=True)
+
+def test_max_frames_budget():
+    with pytest.raises(CallDepthError, match="100 chamadas"):
+        _run_source(microc_recursive_sum % 500, "stack", max_frames=100)
+    assert _run_source(microc_recursive_sum % 99, "stack", max_frames=100)[1] == 4950
+
+def test_return_unwinds_loops_and_blocks():
+    microc = '''
+    int find(int n, int target) {
+        for (int i = 1; i < n; i++) {
+            int j = 1;
+            while (j < n) {
+                if (i * j == target) {
+                    { return i * 100 + j; }
+                }
+                j++;
+            }
+        }
+        return 0 - 1;
+    }
+
+    int depth(int n) {
+        if (n == 0) {
+            return find(10, 12);
+        }
+        return depth(n - 1) + 0 * print(n);
+    }
+
+    int main() {
+        return find(10, 12) + find(3, 100) + depth(3);
+    }
+    '''
+    assert _run_source(microc, "stack") == ([1, 2, 3], 411)
+    assert _run_source(microc, "tree") == ([1, 2, 3], 411)
+
+def test_functions_see_globals_not_caller_locals():
+    microc = '''
+    int g = 1;
+    int f() { return g; }
+    int h() { int g = 5; return f() * 10 + g; }
+    int main() { return h(); }
+    '''
+    assert _run_source(microc, "tree")[1] == 15
+    assert _run_source(microc, "stack")[1] == 15
+
+# ===========================================
+# TESTES PARA O LEXER EM STREAMING
+# ===========================================
+
+from lark import Lark, Token, UnexpectedInput
+from MicroC import parser as microc_parser
+from MicroC.lexer import TOKEN_TYPES, streaming_parser, tokenize, tokenize_file
+from MicroC.transformer import MicroCTransformer
+
+SOURCE_FILES = sorted(name for name in PROGRAMS if name.endswith(".mc"))
+
+@pytest.mark.parametrize("name", SOURCE_FILES)
+def test_streaming_tokens_match_lark(name):
+    path = PROGRAMS[name]
+    with open(path, encoding="utf-8") as f:
+        source = f.read()
+    lark_lexer = Lark(microc_parser.GRAMMAR, parser='lalr', lexer='standard')
+    expected = [(token.type, token.value, token.line) for token in lark_lexer.lex(source)]
+    tokens = [(TOKEN_TYPES[type_id], text, line) for type_id, _, _, line, text in tokenize_file(path)]
+    assert tokens == expected
+
+@pytest.mark.parametrize("name", SOURCE_FILES)
+def test_parse_file_matches_parse_source(name):
+    path = PROGRAMS[name]
+    with open(path, encoding="utf-8") as f:
+        expected = microc_parser.parse_source(f.read())
+    tree = microc_parser.parse_file(path)
+    assert tree == expected
+    assert ASTPrinter().format(MicroCTransformer().transform(tree)) == \
+        ASTPrinter().format(MicroCTransformer().transform(expected))
+
+def test_tokenize_is_lazy_and_tracks_lines():
+    data = b"int x = 1; // fim\n/* a\nb */ int y;\n" + b"@" * 10
+    tokens = tokenize(data)
+    type_id, start, end, line = next(tokens)
+    assert (TOKEN_TYPES[type_id], data[start:end], line) == ("TYPE_INT", b"int", 1)
+    rest = []
+    with pytest.raises(UnexpectedInput) as info:
+        for type_id, start, end, line in tokens:
+            rest.append((TOKEN_TYPES[type_id], data[start:end], line))
+    assert rest[-3:] == [("TYPE_INT", b"int", 3), ("ID", b"y", 3), ("SEMICOLON", b";", 3)]
+    assert (info.value.line, info.value.column, info.value.pos_in_stream) == (4, 1, len(data) - 10)
+
+def test_parse_file_reports_positions(tmp_path):
+    path = tmp_path / "prog.mc"
+    path.write_text("int main() {\n    return 1 +\n        2;\n}\n", encoding="utf-8")
+    ast = MicroCTransformer().transform(microc_parser.parse_file(str(path)))
+    ret = ast.declarations[0].body.statements[0]
+    assert (ret.line, ret.column) == (2, 5)
+    assert ret.expression.right.line == 3
+
+def test_parse_file_positions_count_characters(tmp_path):
+    source = "// função média\nint main() { /* é */ int x = 1;\n    return x; }\n"
+    path = tmp_path / "acentos.mc"
+    path.write_text(source, encoding="utf-8")
+    positions = lambda tree: [(t.value, t.start_pos, t.end_pos, t.line, t.column, t.end_line, t.end_column)
+                              for t in tree.scan_values(lambda v: isinstance(v, Token))]
+    # Os Tokens de parse_file contam caracteres, como os de parse_source
+    assert positions(microc_parser.parse_file(str(path))) == positions(microc_parser.parse_source(source))
+    ast = MicroCTransformer().transform(microc_parser.parse_file(str(path)))
+    decl = ast.declarations[0].body.statements[0]
+    assert (decl.line, decl.column) == (2, 22)
+    # tokenize continua em bytes: o texto do token é data[início:fim]
+    data = source.encode("utf-8")
+    starts = [start for _, start, _, _ in tokenize(data)]
+    assert data[starts[0]:starts[0] + 3] == b"int" and starts[0] == len("// função média\n".encode())
+    with pytest.raises(UnexpectedInput) as info:
+        streaming_parser().parse("int x; /* é */ @".encode("utf-8"))
+    assert (info.value.column, info.value.pos_in_stream) == (16, 15)
+
+# ===========================================
+# TESTES PARA O JIT DE LAÇOS E FUNÇÕES
+# ===========================================
+
+from MicroC.eval import Interpreter
+from MicroC.jit import RETRACE_EXITS, JITInterpreter
+from MicroC.output import ListCollector
+
+# Limiares mínimos: compila quase tudo logo nas primeiras voltas e chamadas
+EAGER_JIT = dict(hot_loop=1, record_loop=1, hot_calls=1)
+
+@pytest.mark.parametrize("name", sorted(PROGRAMS))
+def test_jit_engine_matches_tree(name):
+    source = PROGRAMS[name]
+    if os.path.exists(source):
+        with open(source) as f:
+            source = f.read()
+    try:
+        compile_source(source, strict=True)
+    except Exception:
+        pytest.skip("programa inválido (erro sintático ou semântico)")
+    try:
+        expected = _run_source(source, "tree", max_steps=10**5)
+    except Exception as e:
+        with pytest.raises(type(e)):
+            _run_source(source, "jit", max_steps=10**5, **EAGER_JIT)
+        return
+    assert _run_source(source, "jit", max_steps=10**5, **EAGER_JIT) == expected
+    assert _run_source(source, "jit", max_steps=10**5) == expected
+
+def _jit(source, **options):
+    from MicroC.output import ListCollector
+    ast = compile_source(source, strict=True)
+    sink = ListCollector()
+    interpreter = JITInterpreter(ast, output=sink, **options)
+    return interpreter, interpreter.visit_program(ast), sink.values
+
+microc_branch_flip = '''
+int total = 0;
+
+int main() {
+    int i = 0;
+    while (i < 40) {
+        int half = i / 2;
+        if (i < 20) {
+            total = total + half;
+        } else {
+            int k = half * 3;
+            total = total - k;
+            print(k + i);
+        }
+        i++;
+    }
+    return total + i;
+}
+'''
+
+def test_jit_side_exit_resumes_in_interpreter():
+    # Gravado só com o if indo para o then; depois de i == 20 a guarda falha
+    interpreter, result, printed = _jit(microc_branch_flip, hot_loop=3, record_loop=2)
+    assert (printed, result) == _run_source(microc_branch_flip, "tree")[0:2]
+    assert interpreter.side_exits == RETRACE_EXITS
+    # Depois dessas saídas laterais o laço foi recompilado com os dois lados
+    trace = next(iter(interpreter.traces.values()))
+    assert not trace.exits and "else:" in trace.source
+
+def test_jit_return_inside_trace_and_globals_set_by_callees():
+    microc = '''
+    int calls = 0;
+    int bump(int x) { calls = calls + 1; return x * 2; }
+    int find(int limit) {
+        int i = 0;
+        while (true) {
+            if (bump(i) > limit) {
+                return i;
+            }
+            i = i + 1;
+        }
+        return 0 - 1;
+    }
+    int main() { return find(300) * 1000 + calls; }
+    '''
+    interpreter, result, _ = _jit(microc, hot_loop=2, record_loop=2, hot_calls=3)
+    assert result == _run_source(microc, "tree")[1] == 151152
+    assert interpreter.compiled["bump"]
+
+def test_jit_counts_steps_like_tree():
+    for source in (microc_branch_flip, microc_fib_steps):
+        ast = compile_source(source, strict=True)
+        tree = Interpreter(ast, max_steps=10**6, output=ListCollector())
+        tree.visit_program(ast)
+        jit = JITInterpreter(ast, max_steps=10**6, output=ListCollector(), **EAGER_JIT)
+        jit.visit_program(ast)
+        assert jit.fuel == tree.fuel
+    with pytest.raises(StepLimitError):
+        _jit(microc_infinite_loop, max_steps=500, **EAGER_JIT)
+    with pytest.raises(CallDepthError):
+        _jit(microc_fib_steps, max_depth=3, **EAGER_JIT)
+
+def test_jit_callee_guard_discards_trace():
+    microc = '''
+    int f(int x) { return x + 1; }
+    int g(int x) { return x * 10; }
+    int loop(int n) {
+        int s = 0;
+        int i = 0;
+        while (i < n) { s = s + f(i); i = i + 1; }
+        return s;
+    }
+    int main() { return loop(10); }
+    '''
+    interpreter, result, _ = _jit(microc, hot_loop=2, record_loop=1, hot_calls=100)
+    assert result == 55
+    interpreter.functions["f"] = interpreter.functions["g"]
+    assert interpreter.run("loop", [10]) == 450
+
+# ===========================================
+# TESTES PARA O REAPROVEITAMENTO DE ESCOPOS
+# ===========================================
+
+def test_scopes_are_pooled_in_loops_and_calls():
+    microc = '''
+    int sq(int x) { int y = x * x; return y; }
+    int main() {
+        int total = 0;
+        int i = 0;
+        while (i < 1000) {
+            int k = sq(i);
+            total = total + k;
+            i = i + 1;
+        }
+        return total;
+    }
+    '''
+    ast = compile_source(microc, strict=True)
+    interpreter = Interpreter(ast, output=ListCollector())
+    assert interpreter.visit_program(ast) == sum(i * i for i in range(1000))
+    # Um escopo por nível ativo, não um por volta ou chamada
+    assert interpreter.scopes.created <= 3
+    assert interpreter.scopes.created + interpreter.scopes.reused == 2000
+
+def test_blocks_without_declarations_keep_scoping():
+    microc = '''
+    int x = 1;
+    int main() {
+        int n = 0;
+        { x = x + 1; { int x = 10; x = x + 5; n = x; } }
+        for (n = n + 0; n < 20; n++) { x = x + 1; }
+        if (true) int y = 7;
+        { if (x > 0) int x = 100; n = n + x; }
+        return n * 1000 + x + y;
+    }
+    '''
+    expected = 120 * 1000 + 7 + 7  # o x do último bloco é o declarado pelo if
+    for engine in ("tree", "stack", "jit"):
+        assert _run_source(microc, engine)[1] == expected
+
+# ===========================================
+# TESTES PARA AS TABELAS DE DESPACHO
+# ===========================================
+
+from MicroC.ast import NODE_METHODS, Block, WhileStmt, dispatch_table
+from MicroC.profiler import ProfilingInterpreter
+from MicroC.semantic import SemanticAnalyzer
+
+def test_dispatch_tables_cover_every_node_class():
+    ast = compile_source(microc_branch_flip, strict=True)
+    for visitor in (Interpreter(ast), SemanticAnalyzer(), ASTPrinter()):
+        table = dispatch_table(visitor)
+        assert set(table) == set(NODE_METHODS)
+        assert table[Block] == visitor.visit_block
+    assert set(ASTPrinter()._templates) == set(NODE_METHODS)
+
+def test_dispatch_table_uses_subclass_overrides():
+    ast = compile_source(microc_branch_flip, strict=True)
+    profiler = ProfilingInterpreter(ast, output=ListCollector())
+    assert profiler._dispatch[WhileStmt] == profiler.visit_while_stmt
+    profiler.visit_program(ast)
+    # Os statements chegam à versão do profiler mesmo sem passar por accept
+    kinds = {stats.kind for stats in profiler.report().statements}
+    assert {"WhileStmt", "IfStmt", "ExprStmt", "VarDecl", "Block"} <= kinds
+
+# ===========================================
+# TESTES PARA O HASH-CONSING DA AST
+# ===========================================
+
+import copy
+import sys
+from benchmarks.generate import generate_program
+from MicroC.ast import BinaryOp, FunctionCall, IntLiteral, Variable
+from MicroC.interning import Interner, count_nodes, structural_hash
+
+def _transform(source, interner=None):
+    return MicroCTransformer(interner).transform(microc_parser.parser.parse(source))
+
+def test_identical_subexpressions_are_shared():
+    ast = _transform('''
+    int main() {
+        int a = 1; int b = 2;
+        int x = (a + b) * 2;
+        int y = (a + b) * 2;
+        return x + y;
+    }
+    ''')
+    x, y = ast.declarations[0].body.statements[2:4]
+    assert x.initializer is y.initializer
+    assert x.name is sys.intern("x")
+    # Igual (e com o mesmo hash) à árvore montada sem compartilhamento
+    plain = BinaryOp(BinaryOp(Variable("a"), "+", Variable("b")), "*", IntLiteral(2))
+    assert x.initializer == plain
+    assert x.initializer.structural_hash == structural_hash(plain)
+    assert structural_hash(ast) == structural_hash(copy.deepcopy(ast))
+
+def test_interning_shrinks_generated_programs():
+    source = generate_program(functions=70, terms=40)
+    total, distinct = count_nodes(_transform(source))
+    assert distinct * 5 < total
+    assert _run_source(source, "tree") == _run_source(source, "jit")
+
+def test_interner_shares_only_canonical_children():
+    interner = Interner()
+    one = interner.int_literal(1)
+    call = FunctionCall("f", [])
+    assert interner.binary_op(one, "+", one) is interner.binary_op(interner.int_literal(1), "+", one)
+    assert interner.binary_op(call, "+", one) is not interner.binary_op(call, "+", one)
+    assert interner.unary_op("!", interner.bool_literal(True)).structural_hash is not None
+    # Um Interner pode ser compartilhado entre vários programas
+    first = _transform("int main() { return 7 * 6; }", interner)
+    second = _transform("int main() { int z = 7 * 6; return z; }", interner)
+    assert first.declarations[0].body.statements[0].expression is second.declarations[0].body.statements[0].initializer
+
+def test_division_keeps_its_own_position():
+    from MicroC.codegen import generate_c
+    source = '''int main() {
+        int a = 6; int b = 3;
+        int x = a / b;
+        int y = a / b;
+        return x / 1 + y;
+    }'''
+    ast = _transform(source)
+    x, y = ast.declarations[0].body.statements[2:4]
+    # A divisão aparece no erro do backend C: cada ocorrência fica com a sua linha
+    assert x.initializer is not y.initializer
+    assert (x.initializer.line, y.initializer.line) == (3, 4)
+    assert x.initializer.structural_hash is None
+    # Quem contém uma divisão também não é compartilhado
+    assert ast.declarations[0].body.statements[4].expression.structural_hash is None
+    c_source = generate_c(ast)
+    assert "mc_div(v_a, v_b, 3)" in c_source and "mc_div(v_a, v_b, 4)" in c_source
+
+# ===========================================
+# TESTES PARA O FORMATO BINÁRIO
+# ===========================================
+
+import pickle
+from dataclasses import fields
+from MicroC.ast import ASTNode
+from MicroC.serialize import FormatError, ProgramTypes, dump, load
+
+def _positions(node):
+    # (tipo, linha, coluna) de todos os nós, em pré-ordem
+    result, stack = [], [node]
+    while stack:
+        current = stack.pop()
+        result.append((type(current).__name__, current.line, current.column))
+        children = [getattr(current, field.name) for field in fields(current)]
+        for child in reversed(children):
+            if isinstance(child, list):
+                stack.extend(reversed([c for c in child if isinstance(c, ASTNode)]))
+            elif isinstance(child, ASTNode):
+                stack.append(child)
+    return result
+
+@pytest.mark.parametrize("name", sorted(PROGRAMS))
+def test_serialized_program_round_trips(name):
+    source = PROGRAMS[name]
+    if os.path.exists(source):
+        with open(source) as f:
+            source = f.read()
+    try:
+        ast = compile_source(source, strict=True)
+    except Exception:
+        pytest.skip("programa inválido (erro sintático ou semântico)")
+    back = load(dump(ast))
+    assert back == ast
+    assert _positions(back) == _positions(ast)
+    assert count_nodes(back) == count_nodes(ast)
+
+def test_serialized_program_is_smaller_than_pickle_and_runs():
+    source = generate_program(functions=100, terms=40)
+    ast = compile_source(source, strict=True)
+    data = dump(ast)
+    assert len(data) * 4 < len(pickle.dumps(ast, pickle.HIGHEST_PROTOCOL))
+    program = load(data)
+    sink = ListCollector()
+    assert Interpreter(program, output=sink).visit_program(program) == _run_source(source, "tree")[1]
+
+def test_serialized_types():
+    source = "int v[5]; bool b; int f(int a[], bool c) { return 1; } int main() { return f(v, b); }"
+    ast = compile_source(source, strict=True)
+    analyzer = SemanticAnalyzer()
+    analyzer.visit_program(ast)
+    program, types = load(dump(ast, analyzer), types=True)
+    assert program == ast
+    assert types == ProgramTypes(
+        {"f": ("int", ["int[]", "bool"]), "main": ("int", [])},
+        {"v": "int[]", "b": "bool"},
+    )
+    assert types.globals["v"].size == 5
+    assert load(dump(ast), types=True) == (ast, None)
+
+def test_deep_program_serializes_without_recursion():
+    microc = "int main() { int a = 1; return " + " + ".join(["a"] * DEEP) + "; }"
+    ast = compile_source(microc, strict=True)
+    back = load(dump(ast))
+    assert back.accept(ASTPrinter()) == ast.accept(ASTPrinter())
+
+def test_invalid_serialized_data():
+    data = dump(compile_source(microc_sum, strict=True))
+    with pytest.raises(FormatError):
+        load(b"int main() { return 0; }")
+    with pytest.raises(FormatError, match="Versão"):
+        load(data[:5] + bytes([99]) + data[6:])
+    with pytest.raises(FormatError):
+        load(data[:-3])
+
+# ===========================================
+# TESTES PARA A COMPILAÇÃO SEPARADA (IMPORT)
+# ===========================================
+
+from MicroC.modules import CACHE_DIR, ModuleCompiler, ModuleError
+
+microc_lib = '''
+int calls = 0;
+int sq(int x) { calls++; return x * x; }
+int used() { return calls; }
+'''
+
+microc_main_import = '''
+import "lib/mat.mc";
+int main() {
+    int total = sq(3) + sq(4);
+    print(used());
+    return total;
+}
+'''
+
+def _write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+    return str(path)
+
+def test_import_runs_linked_program(tmp_path):
+    _write(tmp_path / "lib" / "mat.mc", microc_lib)
+    main = _write(tmp_path / "main.mc", microc_main_import)
+    sink = ListCollector()
+    assert eval(microc_main_import, output=sink, quiet=True, path=main) == 25
+    assert sink.values == [2]
+    assert (tmp_path / "lib" / CACHE_DIR / "mat.mcm").exists()
+    program = ModuleCompiler().link_file(main)
+    # A global do módulo é renomeada na ligação: fica privada
+    calls = str(tmp_path / "lib" / "mat.mc") + "::calls"
+    assert [decl.name for decl in program.declarations] == [calls, "sq", "used", "main"]
+    for engine in ("stack", "jit"):
+        assert eval(microc_main_import, output=ListCollector(), quiet=True, engine=engine, path=main) == 25
+
+def test_modules_recompile_only_what_changed(tmp_path):
+    lib = _write(tmp_path / "lib" / "mat.mc", microc_lib)
+    main = _write(tmp_path / "main.mc", microc_main_import)
+    first = ModuleCompiler()
+    first.link_file(main)
+    assert first.compiled == [lib, main]
+
+    cached = ModuleCompiler()
+    program = cached.link_file(main)
+    assert cached.compiled == []
+    assert Interpreter(program, output=ListCollector()).visit_program(program) == 25
+
+    # Só o corpo mudou: a interface é a mesma e main vem do cache
+    _write(tmp_path / "lib" / "mat.mc", microc_lib.replace("x * x", "x * x + 1"))
+    body = ModuleCompiler()
+    program = body.link_file(main)
+    assert body.compiled == [lib]
+    assert Interpreter(program, output=ListCollector()).visit_program(program) == 27
+
+    # Assinatura mudou: quem importa é verificado de novo
+    _write(tmp_path / "lib" / "mat.mc", microc_lib.replace("int sq(int x)", "int sq(int x, int y)"))
+    with pytest.raises(SemanticError, match="main.mc"):
+        ModuleCompiler().link_file(main)
+
+def test_module_globals_are_private(tmp_path):
+    from MicroC.lazy import compile_lazy
+    _write(tmp_path / "lib.mc", "int counter = 0;\n"
+           "int next() { int n = counter; counter = n + 1; return counter; }")
+    _write(tmp_path / "outro.mc", "int counter = 50; int peek(int counter) { return counter; }")
+    source = ('import "lib.mc"; import "outro.mc";\n'
+              "int main() { int counter = 100; print(next()); print(next()); return counter + peek(7); }")
+    main = _write(tmp_path / "main.mc", source)
+    for engine in ("tree", "stack", "jit"):
+        sink = ListCollector()
+        assert eval(source, output=sink, quiet=True, engine=engine, path=main) == 107
+        assert sink.values == [1, 2]
+    program = compile_lazy(source, path=main)
+    sink = ListCollector()
+    assert Interpreter(program, output=sink).visit_program(program) == 107
+    assert sink.values == [1, 2]
+    # O módulo em cache continua com os nomes originais
+    assert ModuleCompiler().load(tmp_path / "lib.mc").program.declarations[0].name == "counter"
+
+@needs_cc
+def test_native_module_globals_are_private(tmp_path):
+    _write(tmp_path / "lib.mc", "int counter = 0; int next() { counter = counter + 1; return counter; }")
+    source = 'import "lib.mc"; int main() { int counter = 100; print(next()); print(next()); return counter; }'
+    main = _write(tmp_path / "main.mc", source)
+    from MicroC.codegen import build
+    exe = str(tmp_path / "prog")
+    build(compile_source(source, strict=True, path=main), exe)
+    assert subprocess.run([exe], capture_output=True, text=True).stdout == "1\n2\n100\n"
+
+def test_import_errors(tmp_path):
+    _write(tmp_path / "a.mc", 'import "b.mc"; int a() { return 1; }')
+    _write(tmp_path / "b.mc", 'import "a.mc"; int b() { return 2; }')
+    with pytest.raises(ModuleError, match="circular"):
+        ModuleCompiler().load(tmp_path / "a.mc")
+    with pytest.raises(ModuleError, match="não encontrado"):
+        ModuleCompiler().load(_write(tmp_path / "c.mc", 'import "nada.mc"; int main() { return 0; }'))
+
+    # Funções importadas pelo módulo importado não são visíveis
+    _write(tmp_path / "base.mc", "int base() { return 1; }")
+    _write(tmp_path / "meio.mc", 'import "base.mc"; int meio() { return base() + 1; }')
+    with pytest.raises(SemanticError, match="não declarada"):
+        ModuleCompiler().load(_write(tmp_path / "d.mc", 'import "meio.mc"; int main() { return base(); }'))
+
+    # O mesmo nome em dois módulos é rejeitado na ligação
+    dup = _write(tmp_path / "e.mc", 'import "meio.mc"; int x = 1; int base() { return 2; } int main() { return 0; }')
+    with pytest.raises(ModuleError, match="'base' definida em base.mc e em e.mc"):
+        ModuleCompiler().link_file(dup)
+
+    # Sem ligar, o import não resolvido é um erro de execução
+    program = MicroCTransformer().transform(microc_parser.parser.parse(microc_main_import))
+    with pytest.raises(MicroCRuntimeError, match="não foi ligado"):
+        Interpreter(program).visit_program(program)
+
+# ===========================================
+# TESTES PARA O FRONT-END SOB DEMANDA (LAZY)
+# ===========================================
+
+from MicroC.ast import FunDecl
+from MicroC.eval import interpreter_class
+from MicroC.lazy import LazyFunDecl, compile_lazy, reachable
+
+microc_lazy_library = '''
+int base = 10;
+int quebrada(int x) { return x + ; }
+bool errada() { return 1; }
+/* chaves em comentário não contam: { */
+int dobro(int x) {
+    return 2 * x;
+}
+int soma(int a, int b) { return dobro(a) + b; }
+int main() {
+    print(soma(base, 1));
+    return 0;
+}
+'''
+
+def _own_positions(node):
+    # Como _positions, sem os nós compartilhados: eles guardam a posição da
+    # primeira ocorrência, que depende da ordem em que os corpos foram lidos
+    result, stack = [], [node]
+    while stack:
+        current = stack.pop()
+        if current.structural_hash is None:
+            result.append((type(current).__name__, current.line, current.column))
+        for field in fields(current):
+            child = getattr(current, field.name)
+            stack.extend(c for c in (child if isinstance(child, list) else [child]) if isinstance(c, ASTNode))
+    return result
+
+def _lazy_functions(program):
+    return [decl.name for decl in program.declarations if isinstance(decl, LazyFunDecl)]
+
+@pytest.mark.parametrize("name", sorted(PROGRAMS))
+def test_lazy_front_end_matches_eager(name):
+    source = PROGRAMS[name]
+    if os.path.exists(source):
+        with open(source) as f:
+            source = f.read()
+    try:
+        ast = compile_source(source, strict=True)
+    except Exception:
+        pytest.skip("programa inválido (erro sintático ou semântico)")
+    program = compile_lazy(source, strict=True)
+    for decl in program.declarations:
+        if isinstance(decl, FunDecl):
+            decl.body
+    assert _lazy_functions(program) == []
+    assert program == ast
+    assert _own_positions(program) == _own_positions(ast)
+
+def test_lazy_builds_only_reachable_functions(capsys):
+    program = compile_lazy(microc_lazy_library, strict=True)
+    assert _lazy_functions(program) == ["quebrada", "errada"]
+    assert capsys.readouterr().out == ""
+    sink = ListCollector()
+    assert Interpreter(program, output=sink).visit_program(program) == 0
+    assert sink.values == [21]
+    assert eval(microc_lazy_library, output=ListCollector(), quiet=True, lazy=True) == 0
+
+def test_lazy_builds_functions_on_first_call():
+    program = compile_lazy(microc_lazy_library, entry=None)
+    assert len(_lazy_functions(program)) == 5
+    unit = program.declarations[-1]._unit
+    for engine in ("tree", "stack", "jit"):
+        sink = ListCollector()
+        interpreter = interpreter_class(engine)(program, output=sink)
+        assert interpreter.visit_program(program) == 0
+        assert sink.values == [21]
+    assert unit.materialized == ["main", "soma", "dobro"]
+    assert reachable(program) == ["main", "soma", "dobro"]
+
+def test_lazy_checks_bodies_in_declaration_context():
+    # Um corpo só enxerga as globais declaradas antes dele
+    source = "int f() { return g; } int g = 1; int main() { return f(); }"
+    with pytest.raises(SemanticError, match="não declarada"):
+        compile_lazy(source, strict=True)
+    # ... e o erro só aparece se a função é usada
+    compile_lazy(source.replace("return f();", "return g;"), strict=True)
+    # Erros de assinatura e de globais não esperam pelos corpos
+    with pytest.raises(SemanticError, match="já declarada"):
+        compile_lazy("int f() { return 1; } int f() { return 2; } int main() { return 0; }", strict=True)
+    with pytest.raises(Exception, match="Erro de sintaxe"):
+        compile_lazy("int main() { return 0; } int x = ;", strict=True)
+
+def test_lazy_time_scales_with_used_code():
+    source = generate_program(functions=200, terms=40)
+    library = source[:source.index("int main")] + "int main() { print(f3(2)); return 0; }\n"
+    program = compile_lazy(library, strict=True)
+    assert len(_lazy_functions(program)) == 199
+    sink = ListCollector()
+    Interpreter(program, output=sink).visit_program(program)
+    assert sink.values == _run_source(library, "tree")[0]
+
+def test_lazy_with_imports(tmp_path):
+    _write(tmp_path / "lib" / "mat.mc", microc_lib)
+    main = _write(tmp_path / "main.mc", microc_main_import + "int nunca() { return x; }\n")
+    assert eval(open(main).read(), output=ListCollector(), quiet=True, path=main, lazy=True) == 25
+
+# ===========================================
+# TESTES PARA O REPL
+# ===========================================
+
+from lark import UnexpectedInput
+from MicroC.repl import Session
+
+def test_repl_session_accumulates_definitions():
+    sink = ListCollector()
+    session = Session(output=sink)
+    assert session.feed("int quadrado(int x) { return x * x; }") is None
+    assert session.feed("int total = quadrado(3);") is None
+    assert session.feed("total + 1") == 10
+    assert session.feed("total = total * 2; print(total); total > 10") == 1
+    assert session.feed("{ int y = 5; print(y); }") is None
+    assert sink.values == [10, 18, 1, 5]
+    # Só a entrada nova passa pelo front-end
+    assert sorted(session.analyzer.functions) == ["quadrado"]
+    assert session.interpreter.globals.vars == {"total": 18}
+    assert set(session.timings) == {"parse", "análise", "execução"}
+
+def test_repl_errors_do_not_change_the_session():
+    session = Session(output=ListCollector())
+    session.feed("int x = 1;")
+    with pytest.raises(SemanticError, match="já declarada"):
+        session.feed("int f() { return 1; } int x = 2;")
+    with pytest.raises(SemanticError, match="não declarada"):
+        session.feed("f()")
+    with pytest.raises(UnexpectedInput):
+        session.feed("x +")
+    assert "f" not in session.analyzer.functions
+    # Erro de execução dentro de uma chamada: a sessão volta ao escopo global
+    session.feed("int div(int a) { return a / 0; }")
+    with pytest.raises(ZeroDivisionError):
+        session.feed("div(1)")
+    assert session.feed("x + 1") == 2
+
+def test_repl_rejects_return_outside_function():
+    session = Session(output=ListCollector())
+    for text in ("return 5;", "return;", "int z = 1; if (true) { return z; }"):
+        with pytest.raises(SemanticError, match="'return' fora de uma função"):
+            session.feed(text)
+    assert session.command("return 5;") == "Erro semântico: 'return' fora de uma função."
+    # A entrada com erro não declarou z; dentro de funções return continua valendo
+    assert "z" not in session.analyzer.env.vars
+    assert session.feed("int f() { return 5; } f()") == 5
+
+def test_repl_runtime_error_undoes_unexecuted_declarations():
+    session = Session(output=ListCollector())
+    with pytest.raises(ZeroDivisionError):
+        session.feed("int a = 2; int y = 1 / 0; int f() { return 3; }")
+    # a foi executada; y e f não chegaram a existir
+    assert session.feed("a") == 2
+    assert "f" not in session.analyzer.functions
+    with pytest.raises(SemanticError, match="não declarada"):
+        session.feed("y")
+    assert session.feed("int y = 5; int f() { return y; } f()") == 5
+
+def test_repl_blocks_keep_their_own_scope():
+    # Cada entrada é uma AST nova: um bloco sem declarações não pode herdar
+    # o "não precisa de escopo" de outro bloco que ocupou o mesmo endereço
+    session = Session(output=ListCollector())
+    session.feed("int x = 1;")
+    for _ in range(50):
+        session.feed("{ x = x; }")
+        session.feed("{ int x = 100; }")
+        assert session.feed("x") == 1
+
+@pytest.mark.parametrize("engine", ["tree", "stack", "jit"])
+def test_repl_engines(engine):
+    session = Session(engine=engine, output=ListCollector(), max_steps=1000)
+    session.feed("int soma(int n) { int s = 0; for (int i = 0; i < n; i++) s += i; return s; }")
+    assert session.feed("soma(100)") == 4950
+    # O orçamento de passos vale por entrada
+    assert session.feed("soma(900)") == 404550
+    with pytest.raises(StepLimitError):
+        session.feed("soma(5000)")
+
+def test_repl_commands():
+    sink = ListCollector()
+    session = Session(output=sink)
+    session.command("int dobro(int x) { return 2 * x; }")
+    assert session.command(":time dobro(4)").startswith("parse: ")
+    table = session.command(":profile dobro(5) + dobro(1)")
+    assert "dobro" in table.splitlines()[3]
+    assert sink.values == [8, 12]
+    assert session.command("dobro(true)").startswith("Erro semântico:")
+    assert session.command("dobro(").startswith("Erro de sintaxe:")
+    assert session.command(":nada").startswith("Comando desconhecido")
+
+def test_repl_cli(tmp_path):
+    lib = _write(tmp_path / "lib.mc", "int tres() { return 3; }\nint main() { print(99); return 0; }\n")
+    script = "int f(int a) {\n  return a + tres();\n}\nf(4)\n:quit\nf(5)\n"
+    result = subprocess.run(
+        [sys.executable, "-m", "MicroC", "repl", lib], input=script,
+        capture_output=True, text=True, timeout=30, cwd=_ROOT,
+    )
+    assert result.stdout == "7\n"
+
+# ===========================================
+# TESTES PARA A AVALIAÇÃO EM LOTE (NUMPY)
+# ===========================================
+
+microc_batch_functions = '''
+int limite = 50;
+int fib(int n) { if (n < 2) return n; return fib(n - 1) + fib(n - 2); }
+int score(int a, int b, bool bonus) {
+    int s = 0;
+    int i = 0;
+    while (i < a) {
+        if (i / 3 * 3 == i) s += b; else s -= 1;
+        i++;
+    }
+    for (int k = 0; k < 3; k++) { int t = k * b; s = s + t; }
+    if (bonus && s > limite) return s * 2;
+    if (a < 12) return fib(a);
+    return s / (b - 5);
+}
+bool par(int x) { return x / 2 * 2 == x; }
+bool positivo(int x) { if (x >= 0) return true; return false; }
+bool sinal(int x) { bool b; if (x > 5) b = x > 5; else if (x >= 0) b = true; return b; }
+int cauteloso(int a, int b) { if (b != 0 && a / b > 1) { return 1; } return 0; }
+int grande(int x) { return x * 4000000000000 + 1; }
+int conta(int x) { print(x); limite = limite + x; return limite; }
+int main() { return 0; }
+'''
+
+def _batch_setup():
+    np = pytest.importorskip("numpy")
+    from MicroC.batch import BatchEvaluator
+    program = compile_source(microc_batch_functions, strict=True)
+    return np, program, BatchEvaluator
+
+def _one_by_one(program, name, rows):
+    interpreter = Interpreter(program, output=ListCollector())
+    for decl in program.declarations:
+        if not isinstance(decl, FunDecl):
+            interpreter.visit(decl)
+    return [interpreter.run(name, list(row)) for row in rows]
+
+def test_batch_matches_interpreter_lane_by_lane():
+    np, program, BatchEvaluator = _batch_setup()
+    rng = np.random.default_rng(7)
+    b = rng.integers(-10, 10, 500)
+    b[b == 5] = 6
+    args = np.column_stack([rng.integers(0, 30, 500), b, rng.integers(0, 2, 500)])
+    evaluator = BatchEvaluator(program)
+    result = evaluator.run("score", args)
+    assert evaluator.vectorized and evaluator.fallback == 0
+    rows = [(int(a), int(b), bool(c)) for a, b, c in args]
+    assert result.tolist() == _one_by_one(program, "score", rows)
+
+    # && avalia os dois lados: b == 0 divide por zero, como no Interpreter
+    rows = [(4, 2), (9, 3), (1, 1), (-7, 2)]
+    assert evaluator.run("cauteloso", np.array(rows)).tolist() == _one_by_one(program, "cauteloso", rows)
+    assert evaluator.fallback == 0
+    with pytest.raises(ZeroDivisionError):
+        _one_by_one(program, "cauteloso", [(4, 0)])
+    with pytest.raises(ZeroDivisionError):
+        evaluator.run("cauteloso", np.array([[4, 2], [4, 0]]))
+
+    # Um parâmetro: aceita um array de uma dimensão. Comparações dão 1/0,
+    # como no Interpreter; o array só é bool quando os valores vêm de literais
+    evens = evaluator.run("par", np.arange(-5, 5))
+    assert evens.dtype == np.int64
+    assert evens.tolist() == _one_by_one(program, "par", [(x,) for x in range(-5, 5)])
+    assert _one_by_one(program, "par", [(2,)]) == [1]
+    flags = evaluator.run("positivo", np.array([-3, 0, 4]))
+    assert flags.dtype == bool and flags.tolist() == [False, True, True]
+    # Misturados, True vira 1 no array int64
+    assert _one_by_one(program, "sinal", [(-3,), (2,), (7,)]) == [0, True, 1]
+    assert evaluator.run("sinal", np.array([-3, 2, 7])).tolist() == [0, 1, 1]
+
+def test_batch_sends_inexact_lanes_to_the_interpreter():
+    np, program, BatchEvaluator = _batch_setup()
+    evaluator = BatchEvaluator(program)
+    # Só as lanes que sairiam de 64 bits são recalculadas (inteiros do Python)
+    result = evaluator.run("grande", np.array([1, -2, 10 ** 7, 3]))
+    assert evaluator.vectorized and evaluator.fallback == 1
+    assert result.dtype == object
+    assert result.tolist() == [4000000000001, -7999999999999, 10 ** 7 * 4000000000000 + 1, 12000000000001]
+    # Divisão por zero numa lane: o erro é o do Interpreter
+    with pytest.raises(ZeroDivisionError):
+        evaluator.run("score", np.array([[20, 5, 0], [20, 1, 0]]))
+
+def test_batch_falls_back_for_side_effects():
+    np, program, BatchEvaluator = _batch_setup()
+    sink = ListCollector()
+    evaluator = BatchEvaluator(program, output=sink)
+    result = evaluator.run("conta", np.array([1, 2, 3]))
+    assert not evaluator.vectorized and evaluator.fallback == 3
+    assert result.tolist() == [51, 53, 56]
+    assert sink.values == [1, 2, 3]
+    with pytest.raises(ValueError, match="formato"):
+        evaluator.run("score", np.zeros((4, 2)))
+
+# ===========================================
+# TESTES PARA O ENGINE PARALLEL (FORK-JOIN)
+# ===========================================
+
+from MicroC.parallel import ParallelInterpreter, forkable_operations, pure_functions
+
+needs_fork = pytest.mark.skipif(not hasattr(os, "fork"), reason="os.fork não disponível")
+
+microc_effects = '''
+int g = 0;
+int fib(int n) { if (n <= 1) return n; return fib(n - 1) + fib(n - 2); }
+int local(int n) { int a[3]; a[0] = n; int s = 0; for (int i = 0; i < n; i++) { s += i; } return s + a[0]; }
+int sombra(int n) { { int g = 1; g = n; } return g; }
+int escreve(int n) { { int h = 1; } g = n; return n; }
+int mostra(int n) { print(n); return n; }
+int vetor(int v[]) { v[0] = 1; return v[0]; }
+int usa(int n) { return escreve(n) + 1; }
+int main() { return fib(8) + local(3) + sombra(2); }
+'''
+
+def test_purity_analysis():
+    program = compile_source(microc_effects, strict=True)
+    assert pure_functions(program) == {"fib", "local", "sombra", "main"}
+    # Só o fib(n - 1) + fib(n - 2) e a soma de main dividem o trabalho
+    assert len(forkable_operations(program)) == 3
+
+@needs_fork
+@pytest.mark.parametrize("name", sorted(PROGRAMS))
+def test_parallel_engine_matches_tree(name):
+    source = PROGRAMS[name]
+    if os.path.exists(source):
+        with open(source) as f:
+            source = f.read()
+    try:
+        compile_source(source, strict=True)
+    except Exception:
+        pytest.skip("programa inválido (erro sintático ou semântico)")
+    try:
+        expected = _run_source(source, "tree", max_steps=10**5)
+    except StepLimitError:
+        pytest.skip("programa longo demais")
+    except Exception as e:
+        with pytest.raises(type(e)):
+            _run_source(source, "parallel", workers=4)
+        return
+    assert _run_source(source, "parallel", workers=4) == expected
+
+@needs_fork
+def test_parallel_forks_pure_calls():
+    program = compile_source(microc_effects.replace("fib(8)", "fib(16)"), strict=True)
+    interpreter = ParallelInterpreter(program, workers=4, output=ListCollector())
+    assert interpreter.visit_program(program) == 987 + 6 + 0
+    assert interpreter.forks > 0
+    # Com orçamento de passos (ou um só processo) nada é dividido
+    limited = ParallelInterpreter(program, workers=4, max_steps=10**6, output=ListCollector())
+    assert limited.visit_program(program) == 993
+    assert limited.forks == 0
+    assert ParallelInterpreter(program, workers=1)._forkable == set()
+
+@needs_fork
+def test_parallel_errors_follow_sequential_order():
+    source = '''
+    int inv(int x) { return 100 / x; }
+    int fundo(int n) { if (n == 0) return 0; return fundo(n - 1) + 0 * inv(1); }
+    int main() { return %s; }
+    '''
+    for expression in ("inv(0) + inv(1)", "inv(1) + inv(0)"):
+        with pytest.raises(ZeroDivisionError):
+            _run_source(source % expression, "parallel", workers=4)
+    # O filho estoura a profundidade: o pai refaz e gera o mesmo erro
+    with pytest.raises(CallDepthError):
+        _run_source(source % "inv(1) + fundo(50)", "parallel", workers=4, max_depth=20)
+
+# ===========================================
+# TESTES PARA O RELATÓRIO DE MEMÓRIA POR FASE
+# ===========================================
+
+import json
+
+from MicroC.memreport import memory_report
+
+def test_mem_report_phases():
+    sink = ListCollector()
+    report = memory_report(microc_fun, output=sink)
+    assert report.error is None
+    assert [phase.name for phase in report.phases] == ["parse", "transformação", "análise", "execução"]
+    parse, transform = report.phase("parse"), report.phase("transformação")
+    # A CST fica viva até o fim da transformação e depois é descartada
+    assert parse.objects["Tree"] > 0 and parse.retained > 0
+    assert transform.objects["Tree"] == parse.objects["Tree"]
+    assert "Tree" not in report.phase("análise").objects
+    assert transform.objects["Program"] == 1 and transform.objects["FunDecl"] >= 1
+    assert all(phase.peak >= phase.retained for phase in report.phases)
+    assert report.result == eval(microc_fun, output=ListCollector(), quiet=True)
+    assert report.to_dict()["phases"][0]["name"] == "parse"
+
+def test_mem_report_grows_with_source():
+    def source(n):
+        functions = "".join(f"int f{i}(int x) {{ return x * {i} + 1; }}\n" for i in range(n))
+        return functions + "int main() { return f0(1); }"
+    small, large = memory_report(source(10)), memory_report(source(200))
+    for name in ("parse", "transformação"):
+        assert large.phase(name).retained > 5 * small.phase(name).retained
+    assert large.phase("transformação").objects["FunDecl"] == 201
+
+def test_mem_report_stops_at_failing_phase():
+    report = memory_report("int main() { return y; }")
+    assert [phase.name for phase in report.phases] == ["parse", "transformação", "análise"]
+    assert report.error.startswith("SemanticError")
+    assert "Interrompido: SemanticError" in report.format_table()
+
+def test_mem_report_cli(tmp_path):
+    program = _write(tmp_path / "p.mc", "int main() { print(5); return 2; }\n")
+    target = tmp_path / "mem.json"
+    result = subprocess.run(
+        [sys.executable, "-m", "MicroC", "--mem-report-json", str(target), program],
+        capture_output=True, text=True, timeout=30, cwd=_ROOT,
+    )
+    assert result.stdout == "5\n2\n"
+    assert "leitura" in result.stderr and "execução" in result.stderr
+    data = json.loads(target.read_text())
+    assert [phase["name"] for phase in data["phases"]][0] == "leitura"
+
+# ===========================================
+# TESTES PARA O PIPELINE COM FASES MEDIDAS
+# ===========================================
+
+from MicroC.pipeline import PHASES, Pipeline, PhaseHook
+
+class _RecordingHook(PhaseHook):
+    def __init__(self):
+        self.events = []
+
+    def phase_started(self, name):
+        self.events.append(("início", name))
+
+    def phase_finished(self, name, elapsed):
+        assert elapsed >= 0
+        self.events.append(("fim", name))
+
+def test_pipeline_phases_and_hooks():
+    hook = _RecordingHook()
+    pipeline = Pipeline(hooks=[hook])
+    assert eval(microc_fun, output=ListCollector(), quiet=True, pipeline=pipeline) == eval(microc_fun, quiet=True)
+    assert tuple(pipeline.timings) == PHASES
+    assert hook.events == [(event, name) for name in PHASES for event in ("início", "fim")]
+    assert pipeline.total == pytest.approx(sum(pipeline.timings.values()))
+    data = pipeline.to_dict()
+    assert [phase["name"] for phase in data["phases"]] == list(PHASES)
+    assert pipeline.format_table().splitlines()[-1].startswith("total")
+
+def test_pipeline_clock_and_accumulation():
+    ticks = iter(range(100))
+    pipeline = Pipeline(clock=lambda: next(ticks))
+    ast = pipeline.compile(microc_fun)
+    pipeline.execute(ast, output=ListCollector())
+    pipeline.execute(ast, engine="stack", output=ListCollector())
+    assert pipeline.timings == {"parse": 1, "transformação": 1, "análise": 1, "execução": 2}
+
+def test_pipeline_hook_sees_failing_phase():
+    hook = _RecordingHook()
+    pipeline = Pipeline(hooks=[hook])
+    with pytest.raises(SemanticError):
+        pipeline.compile("int main() { return y; }", strict=True)
+    assert hook.events[-1] == ("fim", "análise")
+    assert list(pipeline.timings) == ["parse", "transformação", "análise"]
+
+def test_pipeline_lazy_front_end():
+    pipeline = Pipeline()
+    assert eval(microc_fun, quiet=True, lazy=True, pipeline=pipeline) == eval(microc_fun, quiet=True)
+    assert list(pipeline.timings) == ["front-end", "execução"]
+
+def test_time_cli(tmp_path):
+    program = _write(tmp_path / "p.mc", "int main() { print(5); return 2; }\n")
+    target = tmp_path / "tempo.json"
+    result = subprocess.run(
+        [sys.executable, "-m", "MicroC", "--time", "--time-json", str(target), program],
+        capture_output=True, text=True, timeout=30, cwd=_ROOT,
+    )
+    assert result.stdout == "5\n2\n"
+    assert result.stderr.splitlines()[1].startswith("parse")
+    data = json.loads(target.read_text())
+    assert [phase["name"] for phase in data["phases"]] == list(PHASES)
+
+# ===========================================
+# TESTES PARA O PROFILER POR AMOSTRAGEM (FLAMEGRAPH)
+# ===========================================
+
+from MicroC.eval import compile_source
+from MicroC.sampler import SamplingInterpreter, sample
+
+microc_sampled = '''
+int folha(int x) {
+    return x * 2;
+}
+int meio(int x) {
+    int y = x + 1;
+    return folha(y);
+}
+int main() {
+    int total = 0;
+    total = meio(3);
+    return total + folha(1);
+}
+'''
+
+class _SampleOnReturn(SamplingInterpreter):
+    # Amostra sincronamente em cada return de folha, sem depender da thread
+    def visit_return_stmt(self, node):
+        if self.stack[-1][0] == "folha":
+            self.take_sample()
+        return super().visit_return_stmt(node)
+
+def test_sampler_shadow_stack_lines():
+    ast = compile_source(microc_sampled)
+    interpreter = _SampleOnReturn(ast, interval=60, output=ListCollector())
+    assert interpreter.visit_program(ast) == 10
+    assert interpreter.samples == {
+        ("main:11", "meio:7", "folha:3"): 1,
+        ("main:12", "folha:3"): 1,
+    }
+    assert interpreter.stack == []
+    assert sorted(interpreter.collapsed()) == ["main:11;meio:7;folha:3 1", "main:12;folha:3 1"]
+
+def test_sampler_thread_collects_stacks():
+    source = "int fib(int n) { if (n < 2) return n; return fib(n - 1) + fib(n - 2); }\n" \
+             "int main() { return fib(20); }"
+    result, sampler = sample(source, interval=0.001, lines=False, output=ListCollector())
+    assert result == 6765
+    assert sum(sampler.samples.values()) > 0
+    assert all(stack[0] == "main" and set(stack[1:]) <= {"fib"} for stack in sampler.samples)
+    for line in sampler.collapsed():
+        stack, count = line.rsplit(" ", 1)
+        assert int(count) > 0 and stack.startswith("main")
+
+def test_flame_cli(tmp_path):
+    program = _write(tmp_path / "p.mc", microc_sampled)
+    target = tmp_path / "pilhas.txt"
+    result = subprocess.run(
+        [sys.executable, "-m", "MicroC", "--flame", str(target), program],
+        capture_output=True, text=True, timeout=30, cwd=_ROOT,
+    )
+    assert result.stdout == "10\n"
+    assert "amostras salvas em" in result.stderr
+    assert all(line.startswith("main") for line in target.read_text().splitlines())
+
+def test_profile_resolves_imports_from_the_file(tmp_path):
+    from MicroC.profiler import profile
+    _write(tmp_path / "lib" / "mat.mc", microc_lib)
+    main = _write(tmp_path / "main.mc", microc_main_import)
+    result, report = profile(microc_main_import, path=main, output=ListCollector())
+    assert result == 25
+    assert {stats.name: stats.calls for stats in report.functions}["sq"] == 2
+
+def test_flame_resolves_imports_from_the_file(tmp_path):
+    _write(tmp_path / "lib" / "mat.mc", microc_lib)
+    main = _write(tmp_path / "main.mc", microc_main_import)
+    result, sampler = sample(microc_main_import, path=main, output=ListCollector())
+    assert result == 25
+    target = tmp_path / "pilhas.txt"
+    proc = subprocess.run(
+        [sys.executable, "-m", "MicroC", "--flame", str(target), main],
+        capture_output=True, text=True, timeout=30, cwd=_ROOT,
+    )
+    assert proc.stdout == "2\n25\n", proc.stderr
+
+def test_cli_profilers_honor_lazy_and_reject_other_engines(tmp_path):
+    # Com --lazy o erro de sintaxe em uma função não usada não aparece
+    program = _write(tmp_path / "p.mc", "int unused() { return 1 +; }\nint main() { print(2); return 3; }")
+
+    def run(*options):
+        return subprocess.run(
+            [sys.executable, "-m", "MicroC", *options, program],
+            capture_output=True, text=True, timeout=30, cwd=_ROOT,
+        )
+
+    for mode in (["--profile"], ["--flame", str(tmp_path / "pilhas.txt")], ["--mem-report"]):
+        proc = run(*mode, "--lazy")
+        assert proc.stdout == "2\n3\n", proc.stderr
+    for options in (["--profile", "--engine", "stack"], ["--flame", "f.txt", "--engine", "jit"], ["--profile", "--time"]):
+        proc = run(*options)
+        assert proc.returncode == 2
+        assert "error:" in proc.stderr